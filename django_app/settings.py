@@ -225,6 +225,88 @@ KAKAO_JS_KEY = os.getenv("KAKAO_JS_KEY", "")
 FASTAPI_CHAT_URL = os.environ.get("FASTAPI_CHAT_URL")
 SERVICE_TOKEN    = os.environ.get("SERVICE_TOKEN")
 
+# FastAPI 업스트림 클라이언트 (scentpick.utils.upstream) - 커넥션 풀/타임아웃/재시도/서킷 브레이커
+FASTAPI_POOL_MAX_CONNECTIONS = int(os.environ.get("FASTAPI_POOL_MAX_CONNECTIONS", "100"))
+FASTAPI_POOL_MAX_KEEPALIVE   = int(os.environ.get("FASTAPI_POOL_MAX_KEEPALIVE", "20"))
+FASTAPI_CONNECT_TIMEOUT      = float(os.environ.get("FASTAPI_CONNECT_TIMEOUT", "3"))
+FASTAPI_POOL_TIMEOUT         = float(os.environ.get("FASTAPI_POOL_TIMEOUT", "5"))
+FASTAPI_CHAT_TIMEOUT         = float(os.environ.get("FASTAPI_CHAT_TIMEOUT", "60"))
+FASTAPI_STREAM_TIMEOUT       = float(os.environ.get("FASTAPI_STREAM_TIMEOUT", "120"))
+FASTAPI_RETRIES              = int(os.environ.get("FASTAPI_RETRIES", "2"))
+FASTAPI_RETRY_BACKOFF        = float(os.environ.get("FASTAPI_RETRY_BACKOFF", "0.2"))
+FASTAPI_BREAKER_THRESHOLD    = int(os.environ.get("FASTAPI_BREAKER_THRESHOLD", "5"))
+FASTAPI_BREAKER_RESET        = float(os.environ.get("FASTAPI_BREAKER_RESET", "30"))
+
+# 채팅 SSE 재개(Last-Event-ID)용 리플레이 버퍼 (scentpick.utils.stream_buffer, 워커 프로세스 메모리)
+CHAT_STREAM_REPLAY_TTL         = float(os.environ.get("CHAT_STREAM_REPLAY_TTL", "300"))
+CHAT_STREAM_REPLAY_MAX_STREAMS = int(os.environ.get("CHAT_STREAM_REPLAY_MAX_STREAMS", "1000"))
+CHAT_STREAM_REPLAY_MAX_FRAMES  = int(os.environ.get("CHAT_STREAM_REPLAY_MAX_FRAMES", "4000"))
+CHAT_STREAM_REPLAY_MAX_BYTES   = int(os.environ.get("CHAT_STREAM_REPLAY_MAX_BYTES", str(512 * 1024)))
+# 클라이언트가 끊긴 뒤 재접속을 기다리는 시간(초). 지나면 FastAPI 요청 취소 (0이면 즉시)
+CHAT_STREAM_RESUME_GRACE       = float(os.environ.get("CHAT_STREAM_RESUME_GRACE", "10"))
+# 프레임이 없을 때 SSE 주석 heartbeat 간격(초) - nginx 등 프록시 idle 타임아웃 방지
+CHAT_STREAM_HEARTBEAT          = float(os.environ.get("CHAT_STREAM_HEARTBEAT", "15"))
+# content 델타 프레임 합치기: N ms 또는 M 바이트 중 먼저 도달 시 한 프레임으로 전송 (ms가 0이면 비활성, 바이트 0이면 시간 기준만)
+CHAT_STREAM_COALESCE_MS        = float(os.environ.get("CHAT_STREAM_COALESCE_MS", "50"))
+CHAT_STREAM_COALESCE_BYTES     = int(os.environ.get("CHAT_STREAM_COALESCE_BYTES", "2048"))
+# done 프레임 perfume_list에 카드 정보(이미지/어코드/농도/용량/즐겨찾기·좋아요) 포함 (scentpick.utils.perfume_cards)
+CHAT_STREAM_INLINE_CARDS       = os.environ.get("CHAT_STREAM_INLINE_CARDS", "1") == "1"
+
+# 채팅 첨부 이미지 정규화 (scentpick.utils.chat_image) - 모델 입력용 긴 변 상한 / 썸네일 긴 변 / 출력 형식(WEBP|JPEG)
+CHAT_IMAGE_MAX_SIDE   = int(os.environ.get("CHAT_IMAGE_MAX_SIDE", "1600"))
+CHAT_IMAGE_THUMB_SIDE = int(os.environ.get("CHAT_IMAGE_THUMB_SIDE", "320"))
+CHAT_IMAGE_FORMAT     = os.environ.get("CHAT_IMAGE_FORMAT", "WEBP")
+CHAT_IMAGE_QUALITY    = int(os.environ.get("CHAT_IMAGE_QUALITY", "82"))
+
+# 오래된 대화 메시지 콜드 아카이브 (scentpick.utils.archive, manage.py archive_conversations)
+CHAT_ARCHIVE_BACKEND = os.environ.get("CHAT_ARCHIVE_BACKEND", "local")   # local | s3
+CHAT_ARCHIVE_DIR     = os.environ.get("CHAT_ARCHIVE_DIR", str(BASE_DIR / "archive"))
+CHAT_ARCHIVE_PREFIX  = os.environ.get("CHAT_ARCHIVE_PREFIX", "archive/messages")
+CHAT_ARCHIVE_DAYS    = int(os.environ.get("CHAT_ARCHIVE_DAYS", "90"))
+
+# 캐시 - 워커 간 공유가 필요한 상태(채팅 동시 실행 제한, idempotency 잠금)에 사용
+# CACHE_REDIS_URL이 없으면 프로세스 로컬 메모리 (개발/테스트용, 워커마다 따로 셈 - 시작 시 경고 출력, scentpick.apps)
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL")
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",   # redis 패키지 (requirements.txt)
+        "LOCATION": CACHE_REDIS_URL,
+    } if CACHE_REDIS_URL else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+
+# 채팅 동시 실행 제한 (scentpick.utils.concurrency) - 사용자별/전체 상한, 대기열 크기와 최대 대기(초)
+CHAT_CONCURRENCY_CACHE    = os.environ.get("CHAT_CONCURRENCY_CACHE", "default")
+CHAT_CONCURRENCY_PER_USER = int(os.environ.get("CHAT_CONCURRENCY_PER_USER", "2"))
+CHAT_CONCURRENCY_GLOBAL   = int(os.environ.get("CHAT_CONCURRENCY_GLOBAL", "64"))
+CHAT_QUEUE_MAX            = int(os.environ.get("CHAT_QUEUE_MAX", "128"))
+CHAT_QUEUE_PER_USER       = int(os.environ.get("CHAT_QUEUE_PER_USER", "2"))
+CHAT_QUEUE_TIMEOUT        = float(os.environ.get("CHAT_QUEUE_TIMEOUT", "10"))
+# 실행 슬롯 임대 TTL(초) - 스트림 중에는 계속 연장, 워커가 죽으면 이 시간 뒤 자동 반환
+CHAT_CONCURRENCY_SLOT_TTL = float(os.environ.get("CHAT_CONCURRENCY_SLOT_TTL", "300"))
+
+# 반복 질문 답변 캐시 (scentpick.utils.answer_cache) - 기본 꺼짐, 워커 프로세스 메모리 (TTL 초 / 최대 항목 수, LRU)
+CHAT_ANSWER_CACHE_ENABLED     = os.environ.get("CHAT_ANSWER_CACHE_ENABLED", "0") == "1"
+CHAT_ANSWER_CACHE_TTL         = float(os.environ.get("CHAT_ANSWER_CACHE_TTL", "3600"))
+CHAT_ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("CHAT_ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+# 향수 카탈로그 버전 (scentpick.utils.catalog_version) - 시그널 없이 바뀐 행을 updated_at 워터마크로 확인하는 간격(초, 0이면 끔)
+PERFUME_CATALOG_WATERMARK_INTERVAL = float(os.environ.get("PERFUME_CATALOG_WATERMARK_INTERVAL", "60"))
+# 필터 facet 캐시 보관 시간(초) - 버전이 바뀌면 새 키를 쓰므로 이전 버전 항목이 남는 시간
+PERFUME_FACETS_TTL = int(os.environ.get("PERFUME_FACETS_TTL", str(24 * 3600)))
+# /perfumes/ 필터를 프로세스 내 비트맵 엔진으로 처리 (scentpick.utils.filter_engine, 0이면 ORM 쿼리)
+PERFUME_FILTER_ENGINE = os.environ.get("PERFUME_FILTER_ENGINE", "1") == "1"
+# 그리드 페이지 번호 위젯의 전체 건수 캐시(초) - ORM 경로에서 (카탈로그 버전, 필터)별 COUNT(*) 재사용
+PERFUME_GRID_COUNT_TTL = int(os.environ.get("PERFUME_GRID_COUNT_TTL", "300"))
+# 검색 역색인(scentpick.utils.search_index)에 넣는 설명 앞부분 글자 수 - 설명 2-gram이 인덱스 메모리 대부분 (0이면 설명 제외)
+PERFUME_SEARCH_DESCRIPTION_CHARS = int(os.environ.get("PERFUME_SEARCH_DESCRIPTION_CHARS", "1000"))
+# 프로세스 내 인덱스(filter_engine / fuzzy) 증분 반영 상한 - 워터마크 이후 바뀐 행이 이만큼 이상이면 전체 다시 빌드
+PERFUME_INDEX_REFRESH_MAX_ROWS = int(os.environ.get("PERFUME_INDEX_REFRESH_MAX_ROWS", "5000"))
+# 오타 허용 검색 (scentpick.utils.fuzzy) - 정확 검색 결과가 없을 때 trigram 유사도(Dice) 하한 / 챗 향수명 해석 하한
+PERFUME_FUZZY_THRESHOLD = float(os.environ.get("PERFUME_FUZZY_THRESHOLD", "0.45"))
+PERFUME_FUZZY_RESOLVE_THRESHOLD = float(os.environ.get("PERFUME_FUZZY_RESOLVE_THRESHOLD", "0.55"))
+
 CSRF_TRUSTED_ORIGINS = [
     "https://scentpick.store",
     "https://www.scentpick.store",
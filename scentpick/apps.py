@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ScentpickConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'scentpick'
+
+    def ready(self):
+        from . import signals
+
+        # 채팅 동시 실행 제한(CHAT_CONCURRENCY_CACHE) / idempotency 잠금(default)은 캐시로 워커 간 공유
+        # → 로컬 메모리 캐시면 워커마다 따로 셈
+        for alias in sorted({"default", getattr(settings, "CHAT_CONCURRENCY_CACHE", "default")}):
+            backend = settings.CACHES.get(alias, {}).get("BACKEND", "")
+            if backend.endswith("LocMemCache"):
+                print(
+                    f"⚠️ 캐시 '{alias}'가 프로세스 로컬 메모리입니다: 채팅 동시 실행 제한과 "
+                    "idempotency 잠금이 워커마다 따로 적용됩니다 (CACHE_REDIS_URL 설정 필요)"
+                )
@@ -0,0 +1,61 @@
+"""
+오래된 대화 메시지 콜드 아카이브
+
+    python manage.py archive_conversations --days 90 --batch-size 50 [--limit 1000] [--dry-run]
+
+N일 동안 활동이 없는 대화의 메시지를 gzip JSONL 세그먼트(CHAT_ARCHIVE_BACKEND)로 옮기고 messages에서 삭제한다.
+대화 id 순으로 batch-size개씩 처리하며, 중간에 멈춰도 다시 실행하면 남은 대화/삭제부터 이어서 처리한다.
+아카이브된 대화는 조회(conversation_messages_api, chat)나 이어쓰기 시 자동으로 복원된다.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from scentpick.utils.archive import archive_conversation, candidates, get_store
+
+
+class Command(BaseCommand):
+    help = "N일 이상 지난 대화 메시지를 콜드 스토리지 세그먼트로 이동"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=getattr(settings, "CHAT_ARCHIVE_DAYS", 90))
+        parser.add_argument("--batch-size", type=int, default=50, help="한 번에 조회할 대화 수")
+        parser.add_argument("--delete-batch", type=int, default=1000, help="트랜잭션당 삭제할 메시지 수")
+        parser.add_argument("--limit", type=int, default=0, help="최대 처리 대화 수 (0이면 전체)")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        store = get_store()
+        last_id = 0
+        convs = rows = raw = segment = failed = 0
+        while True:
+            batch = list(candidates(opts["days"], after_id=last_id)[:opts["batch_size"]])
+            if not batch:
+                break
+            for conv in batch:
+                last_id = conv.id
+                if opts["dry_run"]:
+                    self.stdout.write(f"  [dry-run] Conv#{conv.id} (마지막 활동 {conv.last_message_at or conv.updated_at:%Y-%m-%d})")
+                else:
+                    try:
+                        result = archive_conversation(conv, store, delete_batch=opts["delete_batch"])
+                    except Exception as e:
+                        # 대화 하나가 실패해도 (세그먼트 불일치, 저장소 오류 등) 나머지는 계속 처리
+                        failed += 1
+                        self.stderr.write(f"❌ Conv#{conv.id} 아카이브 실패: {e}")
+                        continue
+                    rows += result["rows"]
+                    raw += result["raw_bytes"]
+                    segment += result["segment_bytes"]
+                convs += 1
+                if opts["limit"] and convs >= opts["limit"]:
+                    break
+            self.stdout.write(f"  ... 대화 {convs}건 / 메시지 {rows}건 (Conv id ≤ {last_id})")
+            if opts["limit"] and convs >= opts["limit"]:
+                break
+
+        ratio = f"{segment / raw:.1%}" if raw else "-"
+        if failed:
+            self.stdout.write(self.style.WARNING(f"실패 {failed}건 (다시 실행하면 이어서 처리)"))
+        self.stdout.write(self.style.SUCCESS(
+            f"대화 {convs}건, 메시지 {rows}건 아카이브: messages에서 약 {raw:,}B 회수 → 세그먼트 {segment:,}B (압축률 {ratio})"
+        ))
@@ -0,0 +1,22 @@
+"""
+대화 사이드바 요약 필드 백필
+
+    python manage.py backfill_conversation_summaries --batch-size 500
+
+Conversation.title(비어 있을 때만) / last_message_preview / message_count / last_message_at을
+메시지 테이블 기준으로 다시 계산한다. 여러 번 실행해도 결과는 같다.
+"""
+from django.core.management.base import BaseCommand
+
+from scentpick.utils.conversation_summary import backfill_summaries
+
+
+class Command(BaseCommand):
+    help = "Conversation 요약 필드(title/미리보기/메시지 수/마지막 메시지 시각) 백필"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        done = backfill_summaries(batch_size=opts["batch_size"], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"대화 {done}건 요약 갱신 완료"))
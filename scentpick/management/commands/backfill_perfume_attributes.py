@@ -0,0 +1,26 @@
+"""
+향수 정규화 속성 테이블 백필
+
+    python manage.py backfill_perfume_attributes --batch-size 1000
+
+perfume_accords / perfume_notes / perfume_sizes를 perfumes의 JSON 컬럼(main_accords, *_notes, sizes)
+기준으로 다시 쓴다. 저장 시그널을 거치지 않는 적재(bulk_create, queryset.update, 직접 SQL) 뒤에 실행.
+여러 번 실행해도 결과는 같다.
+"""
+from django.core.management.base import BaseCommand
+
+from scentpick.utils.catalog_version import bump
+from scentpick.utils.perfume_attributes import backfill_all
+
+
+class Command(BaseCommand):
+    help = "향수 어코드/노트/용량 정규화 테이블 백필 (JSON 컬럼 기준)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--pause", type=float, default=0.0, help="배치 사이 대기(초)")
+
+    def handle(self, *args, **opts):
+        done = backfill_all(batch_size=opts["batch_size"], pause=opts["pause"], stdout=self.stdout)
+        bump()   # facet 어코드 수도 정규화 테이블 기준이므로 다시 계산
+        self.stdout.write(self.style.SUCCESS(f"향수 {done}건 속성 동기화 완료"))
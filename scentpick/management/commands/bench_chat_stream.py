@@ -0,0 +1,126 @@
+"""
+채팅 스트림 프록시 동시 처리량 벤치마크
+
+    python manage.py bench_chat_stream --streams 500 --tokens 50 --interval 0.05
+
+느린 가짜 SSE 업스트림을 띄우고 같은 수의 동시 스트림을
+- sync : requests(stream=True) + 스트림당 스레드 1개 (기존 chat_stream_api 방식, --threads 상한)
+- async: httpx.AsyncClient + 이벤트 루프 1개 (현재 chat_stream_api 방식)
+두 방식으로 프록시해 완료 시간/최대 동시 스트림/첫 토큰 지연을 비교한다.
+"""
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import requests
+from django.core.management.base import BaseCommand
+
+from scentpick.utils.fake_backend import FakeChatBackend
+
+
+class _Gauge:
+    """동시 진행 중인 스트림 수와 최대값 추적"""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.current -= 1
+
+
+class Command(BaseCommand):
+    help = "chat_stream_api 프록시의 sync(스레드) vs async(이벤트 루프) 동시 스트림 처리량 비교"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--streams", type=int, default=200, help="동시 스트림 수")
+        parser.add_argument("--tokens", type=int, default=40, help="스트림당 프레임 수")
+        parser.add_argument("--interval", type=float, default=0.05, help="프레임 간격(초)")
+        parser.add_argument("--threads", type=int, default=40, help="sync 방식의 스레드 상한")
+        parser.add_argument("--mode", choices=["both", "sync", "async"], default="both")
+
+    def handle(self, *args, **opts):
+        upstream = FakeChatBackend(tokens=opts["tokens"], token_interval=opts["interval"])
+        url = upstream.start() + "/stream"
+        payload = {"user_id": 1, "query": "bench", "stream": True}
+        ideal = opts["tokens"] * opts["interval"]
+        self.stdout.write(
+            f"streams={opts['streams']} tokens={opts['tokens']} interval={opts['interval']}s "
+            f"(스트림 1개 이상적 소요 {ideal:.2f}s)"
+        )
+        try:
+            if opts["mode"] in ("both", "sync"):
+                self._report("sync ", *self._run_sync(url, payload, opts["streams"], opts["threads"]))
+            if opts["mode"] in ("both", "async"):
+                self._report("async", *asyncio.run(self._run_async(url, payload, opts["streams"])))
+        finally:
+            upstream.stop()
+
+    def _run_sync(self, url, payload, streams, threads):
+        gauge = _Gauge()
+
+        def one():
+            t0 = time.perf_counter()
+            ttft = None
+            with gauge:
+                with requests.post(url, json=payload, stream=True, timeout=120) as r:
+                    for line in r.iter_lines(decode_unicode=True):
+                        if line and ttft is None:
+                            ttft = time.perf_counter() - t0
+            return ttft
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(lambda _: self._safe(one), range(streams)))
+        return time.perf_counter() - start, gauge.peak, results
+
+    async def _run_async(self, url, payload, streams):
+        gauge = _Gauge()
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+
+        async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+            async def one():
+                t0 = time.perf_counter()
+                ttft = None
+                with gauge:
+                    async with client.stream("POST", url, json=payload) as r:
+                        async for line in r.aiter_lines():
+                            if line and ttft is None:
+                                ttft = time.perf_counter() - t0
+                return ttft
+
+            async def safe():
+                try:
+                    return await one()
+                except Exception:
+                    return None
+
+            start = time.perf_counter()
+            results = await asyncio.gather(*(safe() for _ in range(streams)))
+        return time.perf_counter() - start, gauge.peak, results
+
+    @staticmethod
+    def _safe(fn):
+        try:
+            return fn()
+        except Exception:
+            return None
+
+    def _report(self, label, elapsed, peak, ttfts):
+        ok = [t for t in ttfts if t is not None]
+        p50 = statistics.median(ok) if ok else float("nan")
+        p99 = sorted(ok)[int(len(ok) * 0.99) - 1] if ok else float("nan")
+        self.stdout.write(
+            f"[{label}] 완료 {len(ok)}/{len(ttfts)}  소요 {elapsed:.2f}s  최대 동시 스트림 {peak}  "
+            f"TTFT p50 {p50 * 1000:.0f}ms p99 {p99 * 1000:.0f}ms"
+        )
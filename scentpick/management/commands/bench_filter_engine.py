@@ -0,0 +1,92 @@
+"""
+/perfumes/ 필터 벤치마크 - ORM 쿼리(다중 OR + COUNT + 페이지) vs 비트맵 필터 엔진(scentpick.utils.filter_engine)
+
+    python manage.py bench_filter_engine --rows 100000 --repeat 20
+
+합성 카탈로그(rows개, 정규화 행 포함)를 트랜잭션 안에서 만들고 끝나면 롤백한다 (개발 DB(settings_dev)에서 실행할 것).
+필터 조합마다 "전체 건수 + 3번째 페이지 24개 id"를 두 방식으로 repeat번 실행해 p50/p99를 비교하고,
+엔진 빌드 시간과 향수 1개 속성 변경의 증분 반영 시간을 출력한다.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from scentpick.models import Perfume
+from scentpick.utils.filter_engine import FilterEngine, load_rows
+from scentpick.utils.perfume_attributes import sync_perfumes
+from scentpick.views import _perfume_filter_queryset
+from .bench_perfume_search import synthetic_perfumes, timed
+
+CASES = {
+    "필터 없음": {},
+    "브랜드": {"brand": ["Byredo", "Diptyque"]},
+    "성별+농도": {"gender": ["unisex"], "conc": ["EDP"]},
+    "어코드 2개": {"accord": ["우디", "머스크"]},
+    "5개 facet": {"brand": ["Byredo", "Le Labo", "Creed"], "gender": ["Female", "Unisex"], "conc": ["EDP", "Parfum"],
+                 "accord": ["우디", "시트러스"], "size": ["50", "100"]},
+}
+OFFSET, PAGE = 48, 24
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "/perfumes/ 필터: ORM vs 비트맵 필터 엔진 벤치마크 (합성 카탈로그, 끝나면 롤백)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                self._run(opts)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write("(합성 카탈로그 롤백 완료)")
+
+    def _run(self, opts):
+        start = time.perf_counter()
+        perfumes = list(synthetic_perfumes(opts["rows"], opts["seed"]))
+        for i in range(0, len(perfumes), 2000):
+            sync_perfumes(Perfume.objects.bulk_create(perfumes[i:i + 2000]))
+        self.stdout.write(f"카탈로그 {Perfume.objects.count()}건 준비 ({time.perf_counter() - start:.1f}s)")
+
+        engine = FilterEngine.build(load_rows(), version=1)
+        self.stdout.write(f"엔진 빌드: {engine.stats()}")
+
+        def orm(sel):
+            qs = _perfume_filter_queryset(sel.get("brand"), sel.get("size"), sel.get("gender"),
+                                          sel.get("conc"), sel.get("accord")).order_by("brand", "name")
+            return qs.count(), list(qs.values_list("id", flat=True)[OFFSET:OFFSET + PAGE])
+
+        def bitmap(sel):
+            result = engine.filter(**sel)
+            return result.count(), result[OFFSET:OFFSET + PAGE]
+
+        self.stdout.write(f"{'조합':<12}{'ORM p50/p99 (건수)':>28}{'엔진 p50/p99 (건수)':>30}{'배속':>9}")
+        speedups = []
+        for name, sel in CASES.items():
+            (n_old, page_old), old50, old99 = timed(lambda: orm(sel), opts["repeat"])
+            (n_new, page_new), new50, new99 = timed(lambda: bitmap(sel), opts["repeat"])
+            speedups.append(old50 / new50 if new50 else float("inf"))
+            same = "" if (n_old, page_old) == (n_new, page_new) else "  ⚠️ 결과 다름"
+            self.stdout.write(
+                f"{name:<12}{old50 * 1000:>11.2f}/{old99 * 1000:>7.2f}ms ({n_old:>6})"
+                f"{new50 * 1e6:>11.0f}/{new99 * 1e6:>7.0f}µs ({n_new:>6}){speedups[-1]:>8.0f}x{same}"
+            )
+        self.stdout.write(f"p50 배속 중앙값 {statistics.median(speedups):.0f}x")
+
+        # 증분 반영: 향수 1개의 어코드 변경
+        row = next(load_rows())
+        row["main_accords"] = ["레더"]
+        started = time.perf_counter()
+        clone = engine.copy()
+        if engine.can_apply([row], len(engine.ids)):
+            clone.apply([row])
+        self.stdout.write(f"증분 반영(1건, 복사 포함): {(time.perf_counter() - started) * 1000:.1f}ms")
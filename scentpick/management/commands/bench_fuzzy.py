@@ -0,0 +1,65 @@
+"""
+오타 허용 검색 벤치마크 (scentpick.utils.fuzzy)
+
+    python manage.py bench_fuzzy --rows 50000 --repeat 50
+
+합성 카탈로그(rows개)를 트랜잭션 안에서 만들고 끝나면 롤백한다 (개발 DB(settings_dev)에서 실행할 것).
+인덱스 빌드 시간/term·trigram 수를 출력하고, 오타 질의마다 검색을 repeat번 실행해 p50/p99(ms), 결과 수, 가장 비슷한 표기를 비교한다.
+끝으로 향수 1개 이름 변경의 증분 반영(복사 포함) 시간을 출력한다.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from scentpick.models import Perfume
+from scentpick.utils.fuzzy import FuzzyIndex, load_rows
+from .bench_perfume_search import synthetic_perfumes, timed
+
+QUERIES = ["Jo Malon", "Diptyqe", "딥디크", "조 말른", "Maison Margela", "Penhaligons", "탬버린스",
+           "Lavendar Musk", "Vetivr Noir 120", "Santal Wodd"]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "브랜드/이름 오타 허용 trigram 검색 벤치마크 (합성 카탈로그, 끝나면 롤백)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50000)
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--query", action="append", help="질의 (여러 번 지정 가능, 없으면 기본 목록)")
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                self._run(opts)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write("(합성 카탈로그 롤백 완료)")
+
+    def _run(self, opts):
+        perfumes = list(synthetic_perfumes(opts["rows"], opts["seed"]))
+        for i in range(0, len(perfumes), 2000):
+            Perfume.objects.bulk_create(perfumes[i:i + 2000])
+
+        index = FuzzyIndex.build(load_rows(), version=1)
+        self.stdout.write(f"인덱스 빌드: {index.stats()}")
+
+        worst = 0.0
+        for q in opts["query"] or QUERIES:
+            results, p50, p99 = timed(lambda: index.search(q), opts["repeat"])
+            worst = max(worst, p99)
+            self.stdout.write(f"{q:<18}{p50 * 1000:>8.2f}/{p99 * 1000:>6.2f}ms ({len(results):>5}) → {index.suggest(q)}")
+        self.stdout.write(f"최대 p99 {worst * 1000:.2f}ms")
+
+        # 증분 반영: 향수 1개 이름 변경
+        row = next(load_rows())
+        row["name"] = "Renamed Perfume"
+        started = time.perf_counter()
+        clone = index.copy()
+        clone.apply([row])
+        self.stdout.write(f"증분 반영(1건, 복사 포함): {(time.perf_counter() - started) * 1000:.1f}ms")
@@ -0,0 +1,117 @@
+"""
+향수 속성 필터 벤치마크 - 기존 JSONField __contains/__icontains 스캔 vs 정규화 테이블 인덱스 조인
+
+    python manage.py bench_perfume_filters --rows 10000 --rows 100000 --repeat 10
+
+rows마다 합성 카탈로그를 트랜잭션 안에서 만들고(정규화 행 포함) 끝나면 롤백한다 (개발 DB(settings_dev)에서 실행할 것).
+perfumes() 필터(어코드 / 용량 / 어코드+용량, 전체 건수 + 첫 24개), 계절 추천(query_perfumes_by_accords),
+월드컵 후보(filter_worldcup_candidates)의 DB 부분을 두 방식으로 repeat번 실행해 p50/p99와 결과 수를 비교한다.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import NotSupportedError, transaction
+from django.db.models import Q
+
+from scentpick.models import Perfume
+from scentpick.utils.perfume_attributes import accord_filter, size_filter, sync_perfumes
+from .bench_perfume_search import synthetic_perfumes, timed
+
+
+def _json_contains(field, value, text_q):
+    """기존 뷰의 방식: JSONField __contains, 지원하지 않는 백엔드(sqlite)면 TEXT icontains fallback"""
+    q = Q(**{f"{field}__contains": value})
+    try:
+        Perfume.objects.filter(q).exists()
+        return q
+    except NotSupportedError:
+        return text_q
+
+
+def legacy_cases(accords, size):
+    accord_q = Q()
+    for a in accords:
+        accord_q |= _json_contains("main_accords", [a], Q(main_accords__icontains=f'"{a}"'))
+    size_q = _json_contains("sizes", size, Q(sizes__icontains=str(size)))
+    one = accords[0]
+    worldcup_q = Q(gender__in=["Female", "Unisex"]) & _json_contains(
+        "main_accords", [one], Q(main_accords__icontains=f'"{one}"')
+    )
+    return {
+        "어코드 필터": Perfume.objects.filter(Q(main_accords__icontains=one)),
+        "용량 필터": Perfume.objects.filter(size_q),
+        "어코드+용량": Perfume.objects.filter(Q(main_accords__icontains=one)).filter(size_q),
+        "계절 추천": Perfume.objects.filter(accord_q),
+        "월드컵 후보": Perfume.objects.filter(worldcup_q),
+    }
+
+
+def indexed_cases(accords, size):
+    one = accords[0]
+    return {
+        "어코드 필터": Perfume.objects.filter(accord_filter([one])),
+        "용량 필터": Perfume.objects.filter(size_filter([size])),
+        "어코드+용량": Perfume.objects.filter(accord_filter([one])).filter(size_filter([size])),
+        "계절 추천": Perfume.objects.filter(accord_filter(accords)),
+        "월드컵 후보": Perfume.objects.filter(Q(gender__in=["Female", "Unisex"]) & accord_filter([one])),
+    }
+
+
+def run_case(name, qs):
+    """perfumes()는 전체 건수 + 정렬된 첫 페이지, 추천 쪽은 limit 조회"""
+    if name in ("계절 추천", "월드컵 후보"):
+        limit = 8 if name == "계절 추천" else 200
+        return lambda: len(list(qs[:limit]))
+    return lambda: (qs.count(), list(qs.order_by("brand", "name")[:24]))[0]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "향수 어코드/용량 필터: JSON 스캔 vs 정규화 테이블 벤치마크 (합성 카탈로그, 끝나면 롤백)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, action="append", help="카탈로그 크기 (여러 번 지정 가능, 기본 10000/100000)")
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **opts):
+        for rows in opts["rows"] or [10000, 100000]:
+            try:
+                with transaction.atomic():
+                    self._run(rows, opts)
+                    raise _Rollback
+            except _Rollback:
+                self.stdout.write("(합성 카탈로그 롤백 완료)\n")
+
+    def _run(self, rows, opts):
+        start = time.perf_counter()
+        batch = []
+        for p in synthetic_perfumes(rows, opts["seed"]):
+            batch.append(p)
+            if len(batch) == 2000:
+                sync_perfumes(Perfume.objects.bulk_create(batch))
+                batch = []
+        sync_perfumes(Perfume.objects.bulk_create(batch))
+        self.stdout.write(f"카탈로그 {Perfume.objects.count()}건 + 정규화 행 준비 ({time.perf_counter() - start:.1f}s)")
+
+        accords, size = ["우디", "시트러스", "머스크"], 100
+        legacy, indexed = legacy_cases(accords, size), indexed_cases(accords, size)
+        self.stdout.write(f"{'케이스':<12}{'JSON 스캔 p50/p99 (건수)':>30}{'인덱스 조인 p50/p99 (건수)':>32}{'배속':>8}")
+        speedups = []
+        for name in legacy:
+            n_old, old50, old99 = timed(run_case(name, legacy[name]), opts["repeat"])
+            n_new, new50, new99 = timed(run_case(name, indexed[name]), opts["repeat"])
+            speedups.append(old50 / new50 if new50 else float("inf"))
+            self.stdout.write(
+                f"{name:<12}{old50 * 1000:>12.1f}/{old99 * 1000:>7.1f}ms ({n_old:>6})"
+                f"{new50 * 1000:>12.1f}/{new99 * 1000:>7.1f}ms ({n_new:>6}){speedups[-1]:>7.1f}x"
+            )
+        self.stdout.write(f"rows={rows}: p50 배속 중앙값 {statistics.median(speedups):.1f}x")
+        self.stdout.write(
+            "참고: sqlite는 JSON 안의 한글을 \\uXXXX로 저장해 기존 한글 icontains가 0건일 수 있음 / "
+            "선택도가 높은(결과가 많은) 조건은 인덱스 조인보다 풀스캔이 빠를 수 있음"
+        )
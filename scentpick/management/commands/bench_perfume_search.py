@@ -0,0 +1,134 @@
+"""
+향수 검색 벤치마크 - 기존 7개 컬럼 icontains OR 쿼리 vs 역색인(scentpick.utils.search_index)
+
+    python manage.py bench_perfume_search --rows 50000 --repeat 20
+
+합성 카탈로그(rows개)를 트랜잭션 안에서 만들고 끝나면 롤백한다 (개발 DB(settings_dev)에서 실행할 것).
+질의마다 perfumes() 첫 페이지에 필요한 작업(전체 건수 + 24개 행)을 두 방식으로 repeat번 실행해
+p50/p99 지연과 결과 수를 비교하고, 인덱스 빌드 시간/term 수/postings 수/메모리(설명 포함·제외)를 출력한다.
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.test.utils import override_settings
+
+from scentpick.models import Perfume
+from scentpick.utils.search_index import SearchIndex, load_rows
+
+BRANDS = ["Diptyque", "Byredo", "Le Labo", "Jo Malone", "조 말론", "Chanel", "Dior", "Creed", "Aesop", "탬버린즈",
+          "Maison Margiela", "Tom Ford", "Hermes", "논픽션", "Acqua di Parma", "Penhaligon's", "Kilian", "Guerlain"]
+NAME_WORDS = ["Rose", "Oud", "Vanilla", "Santal", "Lavender", "Vetiver", "Musk", "Amber", "Neroli", "Fig", "Tea",
+              "Leather", "Iris", "Bergamot", "Cedar", "Noir", "Blanc", "Eau", "Nuit", "Jardin", "Sea", "Salt", "Wood"]
+ACCORDS = ["시트러스", "우디", "플로럴", "머스크", "바닐라", "파우더리", "스파이시", "아로마틱", "프루티", "그린",
+           "앰버", "레더", "아쿠아틱", "허벌", "발사믹", "스위트"]
+NOTES = ["레몬", "베르가못", "자몽", "라벤더", "장미", "자스민", "샌달우드", "시더우드", "베티버", "머스크",
+         "바닐라", "통카빈", "앰버", "파출리", "무화과", "녹차", "오렌지 블로섬", "아이리스", "가죽", "네롤리"]
+PHRASES = ["은은하게 남는", "상쾌한 첫인상의", "따뜻하고 포근한", "데일리로 쓰기 좋은", "비 온 뒤 숲 같은",
+           "깨끗한 비누 향의", "관능적인 저녁의", "여름 바다를 닮은", "잔향이 오래가는", "가볍게 뿌리기 좋은"]
+QUERIES = ["시트러스", "우디 머스크", "조 말론", "rose", "lav", "oud noir", "바닐라 향", "장미", "sea salt", "베티버"]
+
+
+def legacy_filter(q):
+    """perfumes()의 기존 검색 조건"""
+    return (
+        Q(name__icontains=q)
+        | Q(brand__icontains=q)
+        | Q(description__icontains=q)
+        | Q(main_accords__icontains=q)
+        | Q(top_notes__icontains=q)
+        | Q(middle_notes__icontains=q)
+        | Q(base_notes__icontains=q)
+    )
+
+
+def synthetic_perfumes(n, seed):
+    rnd = random.Random(seed)
+    for i in range(n):
+        accords = rnd.sample(ACCORDS, 4)
+        notes = rnd.sample(NOTES, 9)
+        yield Perfume(
+            brand=rnd.choice(BRANDS),
+            name=" ".join(rnd.sample(NAME_WORDS, 2)) + f" {i}",
+            description=" ".join(f"{rnd.choice(PHRASES)} {rnd.choice(notes)} 향" for _ in range(4)),
+            concentration=rnd.choice(["EDP", "EDT", "Parfum", "Cologne"]),
+            gender=rnd.choice(["Male", "Female", "Unisex"]),
+            sizes=rnd.sample([30, 50, 75, 100, 125], 2),
+            main_accords=accords,
+            top_notes=notes[:3],
+            middle_notes=notes[3:6],
+            base_notes=notes[6:],
+        )
+
+
+def timed(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return result, statistics.median(times), times[min(len(times) - 1, int(len(times) * 0.99))]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "향수 검색: 기존 icontains 쿼리 vs 역색인 벤치마크 (합성 카탈로그, 끝나면 롤백)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50000)
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--query", action="append", help="질의 (여러 번 지정 가능, 없으면 기본 목록)")
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                self._run(opts)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write("(합성 카탈로그 롤백 완료)")
+
+    def _run(self, opts):
+        start = time.perf_counter()
+        Perfume.objects.bulk_create(synthetic_perfumes(opts["rows"], opts["seed"]), batch_size=2000)
+        total = Perfume.objects.count()
+        self.stdout.write(f"카탈로그 {total}건 준비 ({time.perf_counter() - start:.1f}s)")
+
+        index = SearchIndex.build(load_rows())
+        self.stdout.write(f"인덱스 빌드: {index.stats()}")
+        with override_settings(PERFUME_SEARCH_DESCRIPTION_CHARS=0):
+            without = SearchIndex.build(load_rows())
+        self.stdout.write(
+            f"인덱스 메모리: 설명 포함 {index.memory_bytes / 2**20:.1f}MB / "
+            f"설명 제외 {without.memory_bytes / 2**20:.1f}MB (PERFUME_SEARCH_DESCRIPTION_CHARS)"
+        )
+
+        def legacy(q):
+            qs = Perfume.objects.filter(legacy_filter(q)).order_by("brand", "name")
+            return qs.count(), list(qs[:24])
+
+        def indexed(q):
+            ranked = index.search(q)
+            rows = Perfume.objects.in_bulk(ranked[:24])
+            return len(ranked), [rows[pid] for pid in ranked[:24] if pid in rows]
+
+        self.stdout.write(f"{'질의':<14}{'icontains p50/p99 (건수)':>32}{'역색인 p50/p99 (건수)':>30}{'배속':>8}")
+        speedups = []
+        for q in opts["query"] or QUERIES:
+            (n_old, _), old50, old99 = timed(lambda: legacy(q), opts["repeat"])
+            (n_new, _), new50, new99 = timed(lambda: indexed(q), opts["repeat"])
+            speedups.append(old50 / new50 if new50 else float("inf"))
+            self.stdout.write(
+                f"{q:<14}{old50 * 1000:>12.1f}/{old99 * 1000:>7.1f}ms ({n_old:>6})"
+                f"{new50 * 1000:>12.1f}/{new99 * 1000:>7.1f}ms ({n_new:>6}){speedups[-1]:>7.1f}x"
+            )
+        self.stdout.write(f"p50 배속 중앙값 {statistics.median(speedups):.1f}x")
+        self.stdout.write("건수 차이: 역색인은 한글 2-gram AND + 영문 단어(접두어) 매칭이라 부분 문자열 매칭과 다를 수 있음")
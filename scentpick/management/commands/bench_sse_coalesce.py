@@ -0,0 +1,65 @@
+"""
+SSE content 프레임 합치기(coalescing) 처리량 벤치마크
+
+    python manage.py bench_sse_coalesce --tokens 2000 --rate 400 --settings-grid 0:0,20:2048,50:2048,100:2048
+
+chat_stream_api와 같은 producer(_fill_stream_buffer) → 리플레이 버퍼 → consumer(_replay_frames) 파이프라인에
+토큰 단위 content 프레임을 흘려보내고, 설정(ms:bytes)별 출력 프레임 수/바이트/처리 시간을 비교한다.
+--rate 0이면 최대 속도(CPU 처리량), 아니면 초당 토큰 수로 업스트림 속도를 흉내낸다.
+"""
+import asyncio
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from scentpick import views
+from scentpick.utils.stream_buffer import ReplayRegistry
+
+
+class Command(BaseCommand):
+    help = "chat_stream_api SSE 프레임 합치기 설정별 처리량 비교"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tokens", type=int, default=2000, help="업스트림 content 프레임 수")
+        parser.add_argument("--rate", type=float, default=0, help="초당 토큰 수 (0이면 최대 속도)")
+        parser.add_argument(
+            "--settings-grid", default="0:0,20:2048,50:2048,100:2048",
+            help="비교할 CHAT_STREAM_COALESCE_MS:CHAT_STREAM_COALESCE_BYTES 목록",
+        )
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"tokens={opts['tokens']} rate={opts['rate'] or '최대'}")
+        for item in opts["settings_grid"].split(","):
+            ms, max_bytes = item.split(":")
+            with override_settings(CHAT_STREAM_COALESCE_MS=float(ms), CHAT_STREAM_COALESCE_BYTES=int(max_bytes)):
+                frames, nbytes, elapsed, ttft = asyncio.run(self._run(opts["tokens"], opts["rate"]))
+            self.stdout.write(
+                f"[{ms:>4}ms/{max_bytes:>5}B] 출력 프레임 {frames:5d}  바이트 {nbytes:7d}  "
+                f"소요 {elapsed * 1000:8.1f}ms  입력 {opts['tokens'] / elapsed:9.0f} tok/s  "
+                f"첫 프레임 {ttft * 1000:6.1f}ms"
+            )
+
+    async def _run(self, tokens, rate):
+        async def upstream():
+            for i in range(tokens):
+                yield f"data: {json.dumps({'content': f'tok{i % 10} '})}\n\n"
+                if rate:
+                    await asyncio.sleep(1 / rate)
+                elif i % 64 == 0:
+                    await asyncio.sleep(0)
+            yield f"data: {json.dumps({'done': True, 'perfume_list': []})}\n\n"
+
+        buffer = ReplayRegistry().create(user_id=0)
+        start = time.perf_counter()
+        buffer.task = asyncio.create_task(views._fill_stream_buffer(buffer, upstream()))
+        frames = nbytes = 0
+        ttft = None
+        async for chunk in views._replay_frames(buffer):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            frames += 1
+            nbytes += len(chunk.encode("utf-8"))
+        await buffer.task
+        return frames, nbytes, time.perf_counter() - start, ttft or 0.0
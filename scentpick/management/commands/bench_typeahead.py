@@ -0,0 +1,60 @@
+"""
+검색창 자동완성 벤치마크 (scentpick.utils.typeahead)
+
+    python manage.py bench_typeahead --rows 50000 --repeat 200
+
+합성 카탈로그(rows개, 노트 정규화 행 포함)를 트랜잭션 안에서 만들고 끝나면 롤백한다 (개발 DB(settings_dev)에서 실행할 것).
+인덱스 빌드 시간/키 수를 출력하고, 질의마다 top-8 조회를 repeat번 실행해 p50/p99(µs)와 결과 수를 비교한다.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from scentpick.models import Perfume
+from scentpick.utils.perfume_attributes import sync_perfumes
+from scentpick.utils.typeahead import TypeaheadIndex, load_items
+from .bench_perfume_search import synthetic_perfumes, timed
+
+QUERIES = ["ㅈ", "조", "조마", "조 말론", "ㅈㅁㄹ", "ㅂㄹ", "b", "by", "lav", "rose no", "berg", "베르", "샌달", "ㅅㄷㅇㄷ"]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "검색창 자동완성 prefix 인덱스 벤치마크 (합성 카탈로그, 끝나면 롤백)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50000)
+        parser.add_argument("--repeat", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--query", action="append", help="질의 (여러 번 지정 가능, 없으면 기본 목록)")
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                self._run(opts)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write("(합성 카탈로그 롤백 완료)")
+
+    def _run(self, opts):
+        perfumes = list(synthetic_perfumes(opts["rows"], opts["seed"]))
+        for i in range(0, len(perfumes), 2000):
+            sync_perfumes(Perfume.objects.bulk_create(perfumes[i:i + 2000]))
+
+        start = time.perf_counter()
+        items = load_items()
+        loaded = time.perf_counter() - start
+        index = TypeaheadIndex.build(items)
+        self.stdout.write(f"항목 로드 {loaded:.1f}s / 인덱스 빌드: {index.stats()}")
+
+        worst = 0.0
+        for q in opts["query"] or QUERIES:
+            results, p50, p99 = timed(lambda: index.search(q, 8), opts["repeat"])
+            worst = max(worst, p99)
+            top = ", ".join(r["label"] for r in results[:3])
+            self.stdout.write(f"{q:<10}{p50 * 1e6:>8.0f}/{p99 * 1e6:>6.0f}µs ({len(results)}) {top}")
+        self.stdout.write(f"최대 p99 {worst * 1e6:.0f}µs")
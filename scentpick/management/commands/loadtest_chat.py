@@ -0,0 +1,221 @@
+"""
+채팅 경로 부하 테스트 (프로세스 내 ASGI 앱 직접 호출)
+
+    python manage.py loadtest_chat --users 50 --turns 3 --mode stream --tokens 40 --token-interval 0.02
+    python manage.py loadtest_chat --backend-url http://127.0.0.1:8001/chat   # run_fake_fastapi 등 외부 백엔드
+
+가짜 FastAPI(FakeChatBackend)를 띄우고 django_app.asgi 애플리케이션에 N명의 동시 사용자가
+각자 turns번 채팅을 보낸다 (사용자마다 로그인 세션 + CSRF 토큰, 대화 id 이어가기).
+첫 토큰 지연(TTFT), 토큰/초, 응답 완료 지연 p50/p99, 오류율을 출력한다.
+테스트 사용자(loadtest-N)는 현재 DB에 만들어지므로 개발 DB(settings_dev)에서 실행할 것.
+"""
+import asyncio
+import json
+import time
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.middleware.csrf import _get_new_csrf_string
+from django.test import Client
+from django.urls import reverse
+
+from scentpick import views
+from .run_fake_fastapi import add_backend_arguments, backend_from_options
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))]
+
+
+class Result:
+    def __init__(self):
+        self.status = None
+        self.ttft = None
+        self.latency = None
+        self.tokens = 0
+        self.error = None
+        self.done = False
+        self.conversation_id = None
+
+    @property
+    def ok(self):
+        return self.status == 200 and self.error is None and self.done
+
+
+async def call_asgi(app, method, path, headers, body, on_chunk):
+    """ASGI 앱에 요청 1개 - 응답 body 조각마다 on_chunk(bytes) 호출, 상태 코드 반환"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+        "client": ("127.0.0.1", 50000), "server": ("localhost", 80),
+    }
+    status = {}
+    received = False
+    never = asyncio.Event()
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await never.wait()  # 클라이언트는 끝까지 연결 유지
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body"):
+            on_chunk(message["body"])
+
+    await app(scope, receive, send)
+    return status.get("code")
+
+
+class Command(BaseCommand):
+    help = "가짜 FastAPI + ASGI 앱으로 채팅 동시 사용자 부하 테스트"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20, help="동시 사용자 수")
+        parser.add_argument("--turns", type=int, default=3, help="사용자당 연속 메시지 수")
+        parser.add_argument("--mode", choices=["stream", "submit"], default="stream")
+        parser.add_argument("--backend-url", default=None, help="외부 가짜/실제 FastAPI 주소 (없으면 내장 가짜 백엔드)")
+        add_backend_arguments(parser)
+
+    def handle(self, *args, **opts):
+        sessions = self._login_users(opts["users"])
+
+        backend = None
+        url = opts["backend_url"]
+        if not url:
+            backend = backend_from_options(opts)
+            url = backend.start()
+        views.FASTAPI_CHAT_URL = url
+        self.stdout.write(
+            f"users={opts['users']} turns={opts['turns']} mode={opts['mode']} backend={url} "
+            f"(tokens={opts['tokens']} interval={opts['token_interval']}s latency={opts['latency']}s "
+            f"fail={opts['fail_rate']} drop={opts['drop_rate']})"
+        )
+        try:
+            results, elapsed = asyncio.run(self._run(sessions, opts))
+        finally:
+            if backend:
+                backend.stop()
+        self._report(results, elapsed, backend)
+
+    def _login_users(self, n):
+        sessions = []
+        for i in range(n):
+            user, created = User.objects.get_or_create(username=f"loadtest-{i}")
+            if created:
+                user.set_unusable_password()
+                user.save()
+            client = Client()
+            client.force_login(user)
+            sessions.append((client.cookies["sessionid"].value, _get_new_csrf_string()))
+        return sessions
+
+    async def _run(self, sessions, opts):
+        app = get_asgi_application()
+        path = reverse("scentpick:chat_stream_api" if opts["mode"] == "stream" else "scentpick:chat_submit_api")
+
+        async def one_turn(session_id, csrf, turn, conversation_id):
+            result = Result()
+            headers = [
+                ("host", "localhost"),
+                ("cookie", f"sessionid={session_id}; csrftoken={csrf}"),
+                ("x-csrftoken", csrf),
+            ]
+            data = {"content": f"부하 테스트 {turn}번째 질문"}
+            if conversation_id:
+                data["conversation_id"] = conversation_id
+            if opts["mode"] == "stream":
+                headers.append(("content-type", "application/x-www-form-urlencoded"))
+                body = urlencode(data).encode()
+            else:
+                headers.append(("content-type", "application/json"))
+                body = json.dumps(data).encode()
+
+            start = time.perf_counter()
+            pending = b""
+            raw = bytearray()
+
+            def on_chunk(chunk):
+                nonlocal pending
+                raw.extend(chunk)
+                if opts["mode"] != "stream":
+                    return
+                pending += chunk
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    if not line.startswith(b"data: "):
+                        continue
+                    frame = json.loads(line[6:])
+                    if frame.get("content"):
+                        if result.ttft is None:
+                            result.ttft = time.perf_counter() - start
+                        result.tokens += len(frame["content"].split())
+                    if frame.get("error"):
+                        result.error = frame["error"]
+                    if frame.get("done"):
+                        result.done = True
+                        result.conversation_id = frame.get("conversation_id")
+
+            try:
+                result.status = await call_asgi(app, "POST", path, headers, body, on_chunk)
+            except Exception as e:  # 앱 예외도 오류로 집계
+                result.error = repr(e)
+            result.latency = time.perf_counter() - start
+
+            if opts["mode"] == "submit" and result.status == 200:
+                data = json.loads(bytes(raw))
+                result.ttft = result.latency
+                result.tokens = len(data.get("final_answer", "").split())
+                result.done = bool(data.get("success"))
+                result.conversation_id = data.get("conversation_id")
+            elif result.status != 200 and result.error is None:
+                result.error = f"HTTP {result.status}"
+            return result
+
+        async def user(session_id, csrf):
+            results = []
+            conversation_id = None
+            for turn in range(opts["turns"]):
+                r = await one_turn(session_id, csrf, turn, conversation_id)
+                conversation_id = r.conversation_id or conversation_id
+                results.append(r)
+            return results
+
+        start = time.perf_counter()
+        per_user = await asyncio.gather(*(user(sid, csrf) for sid, csrf in sessions))
+        return [r for rs in per_user for r in rs], time.perf_counter() - start
+
+    def _report(self, results, elapsed, backend):
+        ok = [r for r in results if r.ok]
+        ttfts = [r.ttft for r in ok if r.ttft is not None]
+        latencies = [r.latency for r in ok]
+        tokens = sum(r.tokens for r in ok)
+        stream_rates = [r.tokens / (r.latency - r.ttft) for r in ok if r.ttft is not None and r.latency > r.ttft]
+        errors = len(results) - len(ok)
+
+        self.stdout.write(f"요청 {len(results)}건 / 성공 {len(ok)}건 / 오류율 {errors / len(results):.1%}  (소요 {elapsed:.2f}s)")
+        self.stdout.write(f"TTFT      p50 {percentile(ttfts, 50) * 1000:8.1f}ms  p99 {percentile(ttfts, 99) * 1000:8.1f}ms")
+        self.stdout.write(f"응답 완료 p50 {percentile(latencies, 50) * 1000:8.1f}ms  p99 {percentile(latencies, 99) * 1000:8.1f}ms")
+        self.stdout.write(
+            f"토큰/초   전체 {tokens / elapsed:8.1f}  "
+            f"스트림당 평균 {(sum(stream_rates) / len(stream_rates)) if stream_rates else float('nan'):8.1f}"
+        )
+        kinds = {}
+        for r in results:
+            if not r.ok:
+                key = (r.error or "done 프레임 없음")[:80]
+                kinds[key] = kinds.get(key, 0) + 1
+        for key, count in sorted(kinds.items(), key=lambda kv: -kv[1])[:5]:
+            self.stdout.write(f"  오류 {count:4d}건: {key}")
+        if backend:
+            self.stdout.write(f"backend: {backend.stats}")
@@ -0,0 +1,26 @@
+"""
+messages.state(LangGraph 스냅샷)를 message_states 테이블로 압축 이동
+
+    python manage.py offload_message_states --batch-size 200 --pause 0.05
+
+FastAPI가 새 메시지의 state를 계속 인라인으로 쓰므로 cron 등으로 주기 실행한다.
+배치마다 짧은 트랜잭션만 사용하므로 서비스 중에 돌려도 된다. 여러 번 실행해도 안전하다.
+"""
+from django.core.management.base import BaseCommand
+
+from scentpick.utils.message_state import offload_all
+
+
+class Command(BaseCommand):
+    help = "messages.state → message_states(zlib) 배치 이동"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--pause", type=float, default=0.0, help="배치 사이 대기(초) - DB 부하 조절")
+
+    def handle(self, *args, **opts):
+        moved, raw, stored = offload_all(opts["batch_size"], opts["pause"], stdout=self.stdout)
+        ratio = f"{stored / raw:.1%}" if raw else "-"
+        self.stdout.write(self.style.SUCCESS(
+            f"state {moved}건 이동: {raw:,}B → {stored:,}B (압축률 {ratio})"
+        ))
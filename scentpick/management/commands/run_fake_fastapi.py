@@ -0,0 +1,57 @@
+"""
+로컬용 가짜 FastAPI 챗봇 백엔드 실행
+
+    python manage.py run_fake_fastapi --port 8001 --tokens 60 --token-interval 0.03 --latency 0.5 --fail-rate 0.02
+    FASTAPI_CHAT_URL=http://127.0.0.1:8001/chat python manage.py runserver
+
+chat_submit_api(JSON)와 chat_stream_api(/stream SSE)가 쓰는 응답 형식을 그대로 흉내낸다.
+"""
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from scentpick.utils.fake_backend import FakeChatBackend
+
+
+def add_backend_arguments(parser):
+    parser.add_argument("--tokens", type=int, default=40, help="응답당 토큰(단어) 수")
+    parser.add_argument("--token-interval", type=float, default=0.05, help="토큰 간격(초)")
+    parser.add_argument("--latency", type=float, default=0.2, help="첫 토큰 전 지연(초)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="HTTP 500 응답 비율 (0~1)")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="스트림 중간 끊김 비율 (0~1)")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def backend_from_options(opts, **kwargs):
+    return FakeChatBackend(
+        tokens=opts["tokens"],
+        token_interval=opts["token_interval"],
+        latency=opts["latency"],
+        fail_rate=opts["fail_rate"],
+        drop_rate=opts["drop_rate"],
+        seed=opts["seed"],
+        **kwargs,
+    )
+
+
+class Command(BaseCommand):
+    help = "성능 측정용 가짜 FastAPI 챗봇 백엔드 실행"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        add_backend_arguments(parser)
+
+    def handle(self, *args, **opts):
+        backend = backend_from_options(opts, host=opts["host"], port=opts["port"])
+
+        async def main():
+            server = await backend.serve()
+            self.stdout.write(f"fake FastAPI: FASTAPI_CHAT_URL={backend.url} (Ctrl+C로 종료)")
+            async with server:
+                await server.serve_forever()
+
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            self.stdout.write(f"종료: {backend.stats}")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scentpick', '0003_message_chat_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='chat_image_variants',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scentpick', '0005_conversation_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageState',
+            fields=[
+                ('message', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='state_blob', serialize=False, to='scentpick.message')),
+                ('codec', models.CharField(default='zlib', max_length=10)),
+                ('data', models.BinaryField()),
+                ('raw_size', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'message_states',
+            },
+        ),
+    ]
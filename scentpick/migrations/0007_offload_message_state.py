@@ -0,0 +1,68 @@
+# 기존 messages.state → message_states(zlib) 이동
+# atomic = False: 배치마다 개별 트랜잭션으로 커밋 (대용량 테이블 장시간 잠금 방지)
+# 이후 새로 쌓이는 state는 manage.py offload_message_states로 주기 이동
+
+import json
+import zlib
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 200
+
+
+def forwards(apps, schema_editor):
+    Message = apps.get_model("scentpick", "Message")
+    MessageState = apps.get_model("scentpick", "MessageState")
+    last_id = 0
+    while True:
+        rows = list(
+            Message.objects.filter(id__gt=last_id, state__isnull=False)
+            .order_by("id")
+            .values_list("id", "state")[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        blobs = []
+        for message_id, state in rows:
+            raw = json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            blobs.append(MessageState(message_id=message_id, codec="zlib", data=zlib.compress(raw, 6), raw_size=len(raw)))
+        ids = [r[0] for r in rows]
+        with transaction.atomic():
+            if schema_editor.connection.features.supports_update_conflicts_with_target:
+                MessageState.objects.bulk_create(
+                    blobs, update_conflicts=True, unique_fields=["message"], update_fields=["codec", "data", "raw_size"]
+                )
+            else:
+                # MySQL: unique_fields 지정 upsert 미지원 → 기존 행 삭제 후 INSERT
+                MessageState.objects.filter(message_id__in=ids).delete()
+                MessageState.objects.bulk_create(blobs)
+            Message.objects.filter(id__in=ids).update(state=None)
+        last_id = ids[-1]
+
+
+def backwards(apps, schema_editor):
+    Message = apps.get_model("scentpick", "Message")
+    MessageState = apps.get_model("scentpick", "MessageState")
+    last_id = 0
+    while True:
+        blobs = list(MessageState.objects.filter(message_id__gt=last_id).order_by("message_id")[:BATCH_SIZE])
+        if not blobs:
+            return
+        with transaction.atomic():
+            for b in blobs:
+                state = json.loads(zlib.decompress(bytes(b.data)).decode("utf-8"))
+                Message.objects.filter(id=b.message_id).update(state=state)
+            MessageState.objects.filter(message_id__in=[b.message_id for b in blobs]).delete()
+        last_id = blobs[-1].message_id
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('scentpick', '0006_message_state'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
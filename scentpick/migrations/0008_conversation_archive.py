@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scentpick', '0007_offload_message_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='archive_key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='rehydrated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
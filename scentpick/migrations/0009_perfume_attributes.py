@@ -0,0 +1,55 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scentpick', '0008_conversation_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Accord',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50)),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('perfume', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accord_rows', to='scentpick.perfume')),
+            ],
+            options={
+                'db_table': 'perfume_accords',
+                'indexes': [models.Index(fields=['name', 'perfume'], name='accord_name_perfume_idx')],
+                'constraints': [models.UniqueConstraint(fields=('perfume', 'name'), name='uq_accord_perfume_name')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Note',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('layer', models.CharField(choices=[('top', 'top'), ('middle', 'middle'), ('base', 'base')], max_length=6)),
+                ('name', models.CharField(max_length=100)),
+                ('perfume', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='note_rows', to='scentpick.perfume')),
+            ],
+            options={
+                'db_table': 'perfume_notes',
+                'indexes': [models.Index(fields=['name', 'layer', 'perfume'], name='note_name_layer_perfume_idx')],
+                'constraints': [models.UniqueConstraint(fields=('perfume', 'layer', 'name'), name='uq_note_perfume_layer_name')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PerfumeSize',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('ml', models.PositiveIntegerField()),
+                ('perfume', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='size_rows', to='scentpick.perfume')),
+            ],
+            options={
+                'db_table': 'perfume_sizes',
+                'indexes': [models.Index(fields=['ml', 'perfume'], name='size_ml_perfume_idx')],
+                'constraints': [models.UniqueConstraint(fields=('perfume', 'ml'), name='uq_size_perfume_ml')],
+            },
+        ),
+    ]
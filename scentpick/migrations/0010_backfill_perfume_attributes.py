@@ -0,0 +1,85 @@
+# 기존 perfumes JSON 컬럼 → perfume_accords / perfume_notes / perfume_sizes
+# atomic = False: 배치마다 개별 트랜잭션으로 커밋 (대용량 카탈로그 장시간 잠금 방지)
+# 이후 시그널을 거치지 않은 변경(bulk_create 등)은 manage.py backfill_perfume_attributes로 다시 동기화
+# 파서는 이 마이그레이션 시점의 복사본 (scentpick.utils.facets / perfume_attributes) - 앱 코드가 바뀌어도 새 DB migrate 유지
+
+import re
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+NOTE_LAYERS = (("top_notes", "top"), ("middle_notes", "middle"), ("base_notes", "base"))
+SIZE_RE = re.compile(r"\d+")
+
+
+def _parse_accords(raw):
+    """리스트 또는 "['우디', '머스크']" 같은 문자열 → 이름 리스트"""
+    if not raw:
+        return []
+    if isinstance(raw, list):
+        parts = [str(p).strip() for p in raw if p]
+    else:
+        cleaned = str(raw).strip("[]").replace("'", "").replace('"', "")
+        parts = [p.strip() for p in cleaned.split(",") if p.strip()]
+    return [p for p in parts if p and p not in ["/", "-", "_"]]
+
+
+def _parse_sizes(raw):
+    """[30, 50] / ["50ml"] / "30, 100" → 중복 없는 int 리스트 (순서 유지)"""
+    if raw is None:
+        return []
+    values = raw if isinstance(raw, (list, tuple)) else SIZE_RE.findall(str(raw))
+    sizes = []
+    for v in values:
+        m = SIZE_RE.search(str(v))
+        if m and 0 < int(m.group()) < 100000 and int(m.group()) not in sizes:
+            sizes.append(int(m.group()))
+    return sizes
+
+
+def _names(raw, max_length):
+    return list(dict.fromkeys(name[:max_length] for name in _parse_accords(raw)))
+
+
+def forwards(apps, schema_editor):
+    Perfume = apps.get_model("scentpick", "Perfume")
+    Accord = apps.get_model("scentpick", "Accord")
+    Note = apps.get_model("scentpick", "Note")
+    PerfumeSize = apps.get_model("scentpick", "PerfumeSize")
+    last_id = 0
+    while True:
+        rows = list(
+            Perfume.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "main_accords", "top_notes", "middle_notes", "base_notes", "sizes")[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        accords, notes, sizes = [], [], []
+        for pid, main_accords, top, middle, base, size_list in rows:
+            accords += [Accord(perfume_id=pid, name=n, position=i) for i, n in enumerate(_names(main_accords, 50))]
+            for (_, layer), raw in zip(NOTE_LAYERS, (top, middle, base)):
+                notes += [Note(perfume_id=pid, layer=layer, name=n) for n in _names(raw, 100)]
+            sizes += [PerfumeSize(perfume_id=pid, ml=ml) for ml in _parse_sizes(size_list)]
+        with transaction.atomic():
+            Accord.objects.bulk_create(accords, ignore_conflicts=True)
+            Note.objects.bulk_create(notes, ignore_conflicts=True)
+            PerfumeSize.objects.bulk_create(sizes, ignore_conflicts=True)
+        last_id = rows[-1][0]
+
+
+def backwards(apps, schema_editor):
+    for name in ("Accord", "Note", "PerfumeSize"):
+        apps.get_model("scentpick", name).objects.all().delete()
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('scentpick', '0009_perfume_attributes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
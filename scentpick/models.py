@@ -80,6 +80,81 @@ class NoteImage(models.Model):
         return self.note_name or f"Image#{self.pk}"
 
 
+# -----------------------------
+# Perfume 속성 정규화 테이블
+# main_accords / *_notes / sizes JSON 컬럼을 행으로 펼친 사본 (필터는 인덱스 조인으로)
+# JSON 컬럼이 원본 - Perfume 저장 시그널과 backfill_perfume_attributes가 동기화 (scentpick.utils.perfume_attributes)
+# -----------------------------
+class Accord(models.Model):
+    """
+    향수별 메인 어코드 (perfume_accords)
+    """
+    id = models.BigAutoField(primary_key=True)
+    perfume = models.ForeignKey(Perfume, on_delete=models.CASCADE, related_name="accord_rows")
+    name = models.CharField(max_length=50)
+    position = models.PositiveSmallIntegerField(default=0)         # main_accords 안의 순서 (0 = 가장 강한 어코드)
+
+    class Meta:
+        db_table = "perfume_accords"
+        indexes = [
+            models.Index(fields=["name", "perfume"], name="accord_name_perfume_idx"),  # 어코드 필터
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["perfume", "name"], name="uq_accord_perfume_name"),
+        ]
+
+    def __str__(self):
+        return f"P#{self.perfume_id} {self.name}"
+
+
+class Note(models.Model):
+    """
+    향수별 노트 (perfume_notes) - top/middle/base 구분
+    """
+    class Layer(models.TextChoices):
+        TOP = "top", "top"
+        MIDDLE = "middle", "middle"
+        BASE = "base", "base"
+
+    id = models.BigAutoField(primary_key=True)
+    perfume = models.ForeignKey(Perfume, on_delete=models.CASCADE, related_name="note_rows")
+    layer = models.CharField(max_length=6, choices=Layer.choices)
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        db_table = "perfume_notes"
+        indexes = [
+            models.Index(fields=["name", "layer", "perfume"], name="note_name_layer_perfume_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["perfume", "layer", "name"], name="uq_note_perfume_layer_name"),
+        ]
+
+    def __str__(self):
+        return f"P#{self.perfume_id} {self.layer}:{self.name}"
+
+
+class PerfumeSize(models.Model):
+    """
+    향수별 용량(ml) (perfume_sizes)
+    """
+    id = models.BigAutoField(primary_key=True)
+    perfume = models.ForeignKey(Perfume, on_delete=models.CASCADE, related_name="size_rows")
+    ml = models.PositiveIntegerField()
+
+    class Meta:
+        db_table = "perfume_sizes"
+        indexes = [
+            models.Index(fields=["ml", "perfume"], name="size_ml_perfume_idx"),   # 용량 필터
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["perfume", "ml"], name="uq_size_perfume_ml"),
+        ]
+
+    def __str__(self):
+        return f"P#{self.perfume_id} {self.ml}ml"
+
+
 # -----------------------------
 # Conversations & messages
 # -----------------------------
@@ -94,11 +169,22 @@ class Conversation(models.Model):
     started_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # 사이드바용 요약 (scentpick.utils.conversation_summary에서 갱신)
+    last_message_preview = models.CharField(max_length=120, blank=True, null=True)
+    message_count = models.PositiveIntegerField(default=0)
+    last_message_at = models.DateTimeField(blank=True, null=True)
+
+    # 콜드 아카이브 스텁 (scentpick.utils.archive) - archive_key가 있으면 메시지는 세그먼트에 있음
+    archive_key = models.CharField(max_length=255, blank=True, null=True)
+    archived_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    rehydrated_at = models.DateTimeField(blank=True, null=True)
+
     class Meta:
         db_table = "conversations"
         indexes = [
             models.Index(fields=["user"]),
             models.Index(fields=["updated_at"]),
+            models.Index(fields=["user", "-updated_at"], name="conv_user_updated_idx"),  # 사이드바 목록
             # 🔸 external_thread_id는 UniqueConstraint로 커버되므로 별도 Index 제거하는 걸 권장
             # models.Index(fields=["external_thread_id"]),
         ]
@@ -113,6 +199,19 @@ class Conversation(models.Model):
         return f"Conv#{self.pk}"
 
 
+class MessageQuerySet(models.QuerySet):
+    def with_state(self):
+        """state/metadata까지 한 번에 로드 (기본 쿼리셋은 지연 로딩)"""
+        return self.defer(None)
+
+
+class MessageManager(models.Manager.from_queryset(MessageQuerySet)):
+    # 대용량 JSON(state: LangGraph 스냅샷, metadata)은 기본적으로 SELECT하지 않음
+    # conv.messages 같은 역참조 매니저도 이 매니저를 따름
+    def get_queryset(self):
+        return super().get_queryset().defer("state", "metadata")
+
+
 class Message(models.Model):
     class Role(models.TextChoices):
         SYSTEM = "system", "system"
@@ -126,6 +225,7 @@ class Message(models.Model):
     content = models.TextField()
     model = models.CharField(max_length=120, blank=True, null=True)
 
+    # FastAPI가 인라인으로 쓰고, offload_message_states가 MessageState(압축)로 옮긴 뒤 NULL로 비움
     state = models.JSONField(blank=True, null=True, help_text="LangGraph state snapshot")
     idempotency_key = models.CharField(max_length=64, blank=True, null=True, db_index=True)
     tool_name = models.CharField(max_length=120, blank=True, null=True)
@@ -134,6 +234,10 @@ class Message(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     chat_image = models.CharField(max_length=500, blank=True, null=True)
+    # {"urls": {"original", "image", "thumb"}, "width", "height"} - scentpick.utils.chat_image
+    chat_image_variants = models.JSONField(blank=True, null=True)
+
+    objects = MessageManager()
 
     class Meta:
         db_table = "messages"
@@ -145,6 +249,32 @@ class Message(models.Model):
     def __str__(self):
         return f"{self.role}@{self.conversation_id}"
 
+    def load_state(self):
+        """LangGraph state 스냅샷 (분리 테이블 우선, 아직 옮기지 않은 행은 인라인 컬럼). 명시적으로 부를 때만 조회"""
+        from .utils.message_state import decode_state
+        try:
+            return decode_state(self.state_blob)
+        except MessageState.DoesNotExist:
+            return self.state
+
+
+class MessageState(models.Model):
+    """
+    Message.state 분리 저장 테이블 (message_states)
+    zlib 압축 JSON - 메시지 목록 쿼리에서는 읽지 않음
+    """
+    message = models.OneToOneField(Message, on_delete=models.CASCADE, primary_key=True, related_name="state_blob")
+    codec = models.CharField(max_length=10, default="zlib")
+    data = models.BinaryField()
+    raw_size = models.PositiveIntegerField(default=0)      # 압축 전 JSON 바이트
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "message_states"
+
+    def __str__(self):
+        return f"state@{self.message_id}"
+
 # -----------------------------
 # Favorites
 # -----------------------------
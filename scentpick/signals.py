@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Message, Perfume
+from .utils.conversation_summary import apply_message
+from .utils.catalog_version import bump as bump_catalog_version
+from .utils.perfume_attributes import sync_perfume
+
+
+@receiver(post_save, sender=Message)
+def update_conversation_summary(sender, instance: Message, created: bool, **kwargs):
+    if created:
+        apply_message(instance)
+
+
+@receiver(post_save, sender=Perfume)
+def sync_perfume_attributes(sender, instance: Perfume, update_fields=None, **kwargs):
+    # JSON 컬럼 → Accord / Note / PerfumeSize 행 (같은 트랜잭션). 삭제는 FK CASCADE
+    sync_perfume(instance, update_fields)
+
+
+@receiver(post_save, sender=Perfume)
+@receiver(post_delete, sender=Perfume)
+def invalidate_catalog(sender, **kwargs):
+    # 검색 인덱스 / facet 캐시 무효화. 커밋 전에 다른 워커가 다시 읽으면 변경이 빠지므로 커밋 후에 버전 증가
+    transaction.on_commit(bump_catalog_version)
@@ -1,3 +1,1643 @@
-from django.test import TestCase
+import asyncio
+import base64
+import importlib
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import boto3
+import httpx
+from botocore.response import StreamingBody
+from botocore.stub import ANY, Stubber
+from PIL import Image
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import views
+from .models import Perfume, Accord, Note, PerfumeSize, Conversation, Message, MessageState, RecRun, RecCandidate, Favorite, FeedbackEvent
+from .utils.transcript import build_transcript
+from .utils.upstream import CircuitBreaker, UpstreamClient, UpstreamUnavailable
+from .utils.stream_buffer import ReplayRegistry, StreamGone, get_registry
+from .utils.archive import archive_conversation, candidates, get_store, rehydrate
+from .utils.coalesce import FrameCoalescer
+from .utils.chat_image import normalize_image
+from .utils.fake_backend import FakeChatBackend
+from .utils import idempotency
+from .utils.concurrency import ConcurrencyLimiter, ConcurrencyLimited
+from .utils import answer_cache
+from .utils.answer_cache import AnswerCache
+from .utils.perfume_cards import build_cards, enrich_perfume_list
+from .utils.search_index import SearchIndex, get_search_index
+from .utils.catalog_version import bump as bump_catalog_version, check_watermark
+from .utils.facets import get_facets
+from .utils.perfume_attributes import backfill_all, note_filter
+from .utils import filter_engine as filter_engine_module
+from .utils.filter_engine import FilterEngine, get_filter_engine
+from .utils.typeahead import TypeaheadIndex, get_typeahead_index
+from .utils.fuzzy import FuzzyIndex, get_fuzzy_index, resolve_perfume
+from uauth.models import UserDetail
+
+
+def make_perfume(i, **kwargs):
+    defaults = {
+        "brand": f"Brand{i % 7}",
+        "name": f"Perfume {i}",
+        "description": "",
+        "concentration": "EDP",
+        "main_accords": ["우디"],
+        "sizes": [50, 100],
+    }
+    defaults.update(kwargs)
+    return Perfume.objects.create(**defaults)
+
+
+def make_conversation(user, turns, perfumes=()):
+    """user/assistant 메시지 turns쌍 + 각 턴마다 RecRun/RecCandidate 생성"""
+    conv = Conversation.objects.create(user=user)
+    base = timezone.now() - timedelta(hours=1)
+    for t in range(turns):
+        q = Message.objects.create(conversation=conv, role="user", content=f"질문 {t}")
+        a = Message.objects.create(conversation=conv, role="assistant", content=f"답변 {t}")
+        Message.objects.filter(pk=q.pk).update(created_at=base + timedelta(seconds=2 * t))
+        Message.objects.filter(pk=a.pk).update(created_at=base + timedelta(seconds=2 * t + 1))
+        if perfumes:
+            run = RecRun.objects.create(user=user, conversation=conv, request_msg=q, query_text=q.content)
+            RecRun.objects.filter(pk=run.pk).update(created_at=base + timedelta(seconds=2 * t, milliseconds=500))
+            for rank, p in enumerate(perfumes[t % len(perfumes):][:2] or perfumes[:2], start=1):
+                RecCandidate.objects.create(run_rec=run, perfume=p, rank=rank, score=1.0 / rank)
+    return conv
+
+
+class TranscriptTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("tester", password="pw12345!")
+        cls.perfumes = [make_perfume(i) for i in range(4)]
+
+    def test_query_count_independent_of_length(self):
+        short = make_conversation(self.user, 2, self.perfumes)
+        long = make_conversation(self.user, 40, self.perfumes)
+        with self.assertNumQueries(3):
+            build_transcript(short)
+        with self.assertNumQueries(3):
+            items = build_transcript(long)
+        self.assertEqual(len(items), 80)
+
+    def test_assistant_gets_latest_preceding_run(self):
+        conv = make_conversation(self.user, 3, self.perfumes)
+        items = build_transcript(conv)
+        runs = list(RecRun.objects.filter(conversation=conv).order_by("created_at"))
+        for turn, run in enumerate(runs):
+            user_item, assistant_item = items[2 * turn], items[2 * turn + 1]
+            self.assertEqual(user_item["perfume_list"], [])
+            expected = [c.perfume_id for c in run.candidates.order_by("rank")]
+            self.assertEqual([p["id"] for p in assistant_item["perfume_list"]], expected)
+
+    def test_messages_api(self):
+        conv = make_conversation(self.user, 2, self.perfumes)
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse("scentpick:conversation_messages_api", args=[conv.id]))
+        self.assertEqual(resp.status_code, 200)
+        items = resp.json()["items"]
+        self.assertEqual([m["role"] for m in items], ["user", "assistant"] * 2)
+        self.assertNotIn("perfume_list", items[0])
+        self.assertEqual(len(items[1]["perfume_list"]), 2)
+
+
+class MessagePaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("pager", password="pw12345!")
+        cls.conv = make_conversation(cls.user, 25, [make_perfume(i) for i in range(3)])
+        # 동일 created_at 메시지도 (created_at, id)로 구분되는지 확인
+        same = timezone.now()
+        for i in range(3):
+            m = Message.objects.create(conversation=cls.conv, role="user", content=f"동시 {i}")
+            Message.objects.filter(pk=m.pk).update(created_at=same)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse("scentpick:conversation_messages_api", args=[self.conv.id])
+
+    def test_pages_walk_backwards_without_gaps(self):
+        seen = []
+        before = None
+        while True:
+            params = {"limit": 7}
+            if before:
+                params["before"] = before
+            data = self.client.get(self.url, params).json()
+            self.assertLessEqual(len(data["items"]), 7)
+            seen = [m["content"] for m in data["items"]] + seen
+            before = data["before"]
+            self.assertEqual(data["has_more"], before is not None)
+            if not before:
+                break
+        expected = list(self.conv.messages.order_by("created_at", "id").values_list("content", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_first_page_is_newest(self):
+        data = self.client.get(self.url, {"limit": 3}).json()
+        self.assertEqual([m["content"] for m in data["items"]], ["동시 0", "동시 1", "동시 2"])
+
+    def test_bad_cursor(self):
+        resp = self.client.get(self.url, {"before": "not-a-cursor"})
+        self.assertEqual(resp.status_code, 400)
+
+
+class ConversationSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("summary", password="pw12345!")
+
+    def test_signal_updates_summary_incrementally(self):
+        conv = make_conversation(self.user, 2)
+        conv.refresh_from_db()
+        self.assertEqual(conv.message_count, 4)
+        self.assertEqual(conv.title, "질문 0")          # 첫 user 메시지
+        self.assertEqual(conv.last_message_preview, "답변 1")
+        self.assertIsNotNone(conv.last_message_at)
+
+    def test_sidebar_is_single_query(self):
+        for i in range(5):
+            conv = make_conversation(self.user, 1)
+            if i == 0:
+                # 요약이 비어 있던(외부에서 쓴) 대화 → 백필로 채움
+                Conversation.objects.filter(pk=conv.pk).update(title=None, message_count=0, last_message_preview=None)
+        call_command("backfill_conversation_summaries", batch_size=2, stdout=io.StringIO())
+
+        self.client.force_login(self.user)
+        url = reverse("scentpick:conversations_api")
+        self.client.get(url)  # 세션/유저 로드 쿼리 수 기준
+        with self.assertNumQueries(3):  # 세션 + 유저 + 대화 목록
+            items = self.client.get(url).json()["items"]
+        self.assertEqual(len(items), 5)
+        self.assertTrue(all(it["title"] == "질문 0" and it["message_count"] == 2 for it in items))
+
+
+class MessageStateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("stateful", password="pw12345!")
+        cls.conv = make_conversation(cls.user, 2)
+        cls.snapshot = {"messages": [{"type": "human", "content": "향수 추천 " * 200}], "next": ["recommend"]}
+        Message.objects.filter(conversation=cls.conv).update(state=cls.snapshot, metadata={"k": "v"})
+
+    def test_views_do_not_select_state(self):
+        self.client.force_login(self.user)
+        url = reverse("scentpick:conversation_messages_api", args=[self.conv.id])
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(len(self.client.get(url).json()["items"]), 4)
+        message_sql = [q["sql"] for q in ctx.captured_queries if 'FROM "messages"' in q["sql"]]
+        self.assertTrue(message_sql)
+        self.assertFalse(any('"messages"."state"' in sql or '"messages"."metadata"' in sql for sql in message_sql))
+
+    def test_offload_moves_and_compresses(self):
+        out = io.StringIO()
+        call_command("offload_message_states", batch_size=3, stdout=out)
+        self.assertIn("4건", out.getvalue())
+        self.assertFalse(Message.objects.filter(conversation=self.conv, state__isnull=False).exists())
+        for m in Message.objects.filter(conversation=self.conv):
+            self.assertEqual(m.load_state(), self.snapshot)
+            self.assertLess(len(m.state_blob.data), m.state_blob.raw_size)
+        # 재실행해도 옮길 것이 없음
+        call_command("offload_message_states", stdout=io.StringIO())
+        self.assertEqual(MessageState.objects.filter(message__conversation=self.conv).count(), 4)
+
+    def test_offload_without_upsert_target(self):
+        # MySQL 백엔드: ON DUPLICATE KEY UPDATE는 대상 컬럼(unique_fields)을 받지 않음
+        first = Message.objects.filter(conversation=self.conv).order_by("id").first()
+        MessageState.objects.create(message=first, data=b"stale", raw_size=5)
+        migration = importlib.import_module("scentpick.migrations.0007_offload_message_state")
+        with mock.patch.object(connection.features, "supports_update_conflicts_with_target", False):
+            migration.forwards(django_apps, mock.Mock(connection=connection))
+            Message.objects.filter(id=first.id).update(state=self.snapshot)
+            call_command("offload_message_states", batch_size=3, stdout=io.StringIO())
+        self.assertEqual(MessageState.objects.filter(message__conversation=self.conv).count(), 4)
+        for m in Message.objects.filter(conversation=self.conv):
+            self.assertEqual(m.load_state(), self.snapshot)
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("archiver", password="pw12345!")
+        cls.perfume = make_perfume(1)
+        cls.old = make_conversation(cls.user, 3, [cls.perfume])
+        cls.recent = make_conversation(cls.user, 1)
+        Message.objects.filter(conversation=cls.old).update(state={"step": 1})
+        long_ago = timezone.now() - timedelta(days=120)
+        Conversation.objects.filter(pk=cls.old.pk).update(updated_at=long_ago, last_message_at=long_ago)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.archive_dir = tmp.name
+        patcher = override_settings(CHAT_ARCHIVE_BACKEND="local", CHAT_ARCHIVE_DIR=tmp.name)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def test_archive_and_rehydrate_on_read(self):
+        before = list(self.old.messages.order_by("created_at", "id").values("id", "content", "created_at"))
+        self.client.force_login(self.user)
+        url = reverse("scentpick:conversation_messages_api", args=[self.old.id])
+        expected = self.client.get(url).json()["items"]
+
+        out = io.StringIO()
+        call_command("archive_conversations", days=90, batch_size=1, stdout=out)
+        self.assertIn("메시지 6건", out.getvalue())
+        self.old.refresh_from_db()
+        self.assertTrue(self.old.archive_key)
+        self.assertFalse(self.old.messages.exists())
+        self.assertEqual(self.old.message_count, 6)  # 사이드바 요약은 그대로
+        self.assertTrue(self.recent.messages.exists())
+        segment = os.path.join(self.archive_dir, *self.old.archive_key.split("/"))
+        self.assertTrue(os.path.exists(segment))
+
+        # 조회 시 복원 (같은 id/시각/추천 연결)
+        self.assertEqual(self.client.get(url).json()["items"], expected)
+        after = list(self.old.messages.order_by("created_at", "id").values("id", "content", "created_at"))
+        self.assertEqual(after, before)
+        self.assertEqual(self.old.messages.first().load_state(), {"step": 1})
+        self.assertFalse(os.path.exists(segment))
+        self.old.refresh_from_db()
+        self.assertIsNone(self.old.archive_key)
+
+        # 방금 복원한 대화는 다시 아카이브하지 않음
+        call_command("archive_conversations", days=90, stdout=io.StringIO())
+        self.assertTrue(self.old.messages.exists())
+
+    def test_candidates_use_last_message_at_and_skip_failures(self):
+        # updated_at만 오래된 대화(최근 메시지 있음)는 대상 아님
+        Conversation.objects.filter(pk=self.recent.pk).update(updated_at=timezone.now() - timedelta(days=120))
+        self.assertEqual(list(candidates(90)), [self.old])
+        # 세그먼트가 없는 미완료 대화는 실패로 기록하고 나머지는 계속 처리
+        broken = make_conversation(self.user, 1)
+        Conversation.objects.filter(pk=broken.pk).update(
+            archive_key="archive/messages/missing.jsonl.gz", archived_at=timezone.now()
+        )
+        out, err = io.StringIO(), io.StringIO()
+        call_command("archive_conversations", days=90, stdout=out, stderr=err)
+        self.assertIn(f"Conv#{broken.id}", err.getvalue())
+        self.assertIn("실패 1건", out.getvalue())
+        self.assertFalse(self.old.messages.exists())
+        self.assertTrue(broken.messages.exists())
+
+    def test_rehydrate_during_archive_stops_deletes(self):
+        store = get_store()
+        ids = list(self.old.messages.values_list("id", flat=True))
+        real_delete = QuerySet.delete
+        calls = []
+
+        def delete_then_rehydrate(qs, *args, **kwargs):
+            result = real_delete(qs, *args, **kwargs)
+            if qs.model is Message and not calls:
+                # 첫 배치 삭제 직후 다른 요청이 대화를 복원
+                calls.append(1)
+                rehydrate(Conversation.objects.get(pk=self.old.pk), store)
+            return result
+
+        with mock.patch.object(QuerySet, "delete", delete_then_rehydrate), redirect_stdout(io.StringIO()):
+            result = archive_conversation(self.old, store, delete_batch=2)
+        self.assertEqual(result["rows"], 2)
+        self.assertEqual(sorted(self.old.messages.values_list("id", flat=True)), sorted(ids))
+        self.old.refresh_from_db()
+        self.assertIsNone(self.old.archive_key)
+
+
+def sse_frames(body):
+    """SSE 응답 본문 → data 프레임(JSON) 리스트"""
+    return [json.loads(line[6:]) for line in body.split("\n") if line.startswith("data: ")]
+
+
+def sse_ids(body):
+    return [line[4:] for line in body.split("\n") if line.startswith("id: ")]
+
+
+def fake_upstream(lines, calls=None):
+    """주어진 SSE 라인들을 돌려주는 httpx.MockTransport 기반 UpstreamClient"""
+    def handler(request):
+        if calls is not None:
+            calls.append(request)
+        body = "".join(f"{line}\n\n" for line in lines)
+        return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+    return UpstreamClient(async_transport=httpx.MockTransport(handler))
+
+
+class ChatStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("streamer", password="pw12345!")
+
+    async def _stream_body(self, headers=None, **data):
+        await self.async_client.aforce_login(self.user)
+        resp = await self.async_client.post(reverse("scentpick:chat_stream_api"), data, headers=headers)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.is_async)
+        chunks = [c async for c in resp.streaming_content]
+        return b"".join(chunks).decode("utf-8")
+
+    async def _stream(self, **data):
+        return sse_frames(await self._stream_body(**data))
+
+    @override_settings(CHAT_STREAM_COALESCE_MS=0, CHAT_STREAM_COALESCE_BYTES=0)
+    async def test_resume_with_last_event_id(self):
+        lines = ['data: {"content": "a"}', 'data: {"content": "b"}', 'data: {"content": "c"}']
+        calls = []
+        with mock.patch.object(views, "FASTAPI_CHAT_URL", "http://fastapi.test/chat"), \
+             mock.patch.object(views, "get_upstream", lambda: fake_upstream(lines, calls)):
+            body = await self._stream_body(content="추천")
+            ids = sse_ids(body)
+            self.assertEqual(len(ids), 4)  # 3 content + done
+            resumed = await self._stream_body(headers={"Last-Event-ID": ids[0]})
+        self.assertEqual(len(calls), 1)  # 재개는 업스트림을 다시 호출하지 않음
+        self.assertEqual(sse_ids(resumed), ids[1:])
+        self.assertEqual([f.get("content") for f in sse_frames(resumed)[:2]], ["b", "c"])
+
+    async def test_resume_unknown_stream(self):
+        frames = sse_frames(await self._stream_body(headers={"Last-Event-ID": "deadbeef:3"}))
+        self.assertTrue(frames[0]["resume_failed"])
+
+    async def test_proxies_upstream_stream(self):
+        lines = [
+            'data: {"content": "안녕"}',
+            'data: {"content": "하세요"}',
+            'data: {"done": true, "conversation_id": 7, "perfume_list": []}',
+        ]
+        with mock.patch.object(views, "FASTAPI_CHAT_URL", "http://fastapi.test/chat"), \
+             mock.patch.object(views, "get_upstream", lambda: fake_upstream(lines)):
+            frames = await self._stream(content="추천해줘")
+        # content 델타는 한 프레임으로 합쳐지고, 제어 프레임은 그대로 통과
+        self.assertEqual(frames[0], {"content": "안녕하세요"})
+        self.assertEqual(frames[1]["conversation_id"], 7)
+        self.assertTrue(frames[-1]["done"])
+
+    async def test_mock_reply_without_backend(self):
+        with mock.patch.object(views, "FASTAPI_CHAT_URL", None), \
+             mock.patch.object(views.asyncio, "sleep", mock.AsyncMock()):
+            frames = await self._stream(content="테스트")
+        self.assertTrue(frames[-1]["done"])
+        self.assertIn("테스트", "".join(f.get("content", "") for f in frames))
+
+    async def test_empty_request(self):
+        frames = await self._stream(content="")
+        self.assertIn("error", frames[0])
+
+
+def make_image_bytes(size, fmt="JPEG", exif=None):
+    buf = io.BytesIO()
+    Image.new("RGB", size, (200, 120, 40)).save(buf, format=fmt, **({"exif": exif} if exif else {}))
+    return buf.getvalue()
+
+
+class ChatImageNormalizeTests(TestCase):
+    def test_bounds_size_and_strips_exif(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6            # Orientation: 90도 회전 필요
+        exif[0x010F] = "PhoneMaker"
+        raw = make_image_bytes((3000, 2000), exif=exif.tobytes())
+        result = normalize_image(io.BytesIO(raw), max_side=1600, thumb_side=320)
+
+        image = Image.open(io.BytesIO(result["image"]))
+        self.assertEqual(image.format, "WEBP")
+        self.assertEqual(image.size, (1067, 1600))  # 회전 반영 후 긴 변 1600
+        self.assertFalse(image.getexif())
+        self.assertLess(len(result["image"]), len(raw))
+        thumb = Image.open(io.BytesIO(result["thumb"]))
+        self.assertEqual(max(thumb.size), 320)
+
+    def test_rejects_non_image(self):
+        with self.assertRaises(ValueError):
+            normalize_image(io.BytesIO(b"not an image"))
+
+
+def fake_s3():
+    """네트워크 없이 서명만 하는 로컬 S3 클라이언트 (API 호출은 Stubber로 응답)"""
+    return boto3.client(
+        "s3", region_name="ap-northeast-2",
+        aws_access_key_id="test", aws_secret_access_key="test",
+    )
+
+
+@override_settings(AWS_STORAGE_BUCKET_NAME="test-bucket", AWS_S3_REGION_NAME="ap-northeast-2")
+class ChatImageUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("uploader", password="pw12345!")
+
+    def setUp(self):
+        self.s3 = fake_s3()
+        patcher = mock.patch.object(views, "s3_client", self.s3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_presigned_post_policy(self):
+        self.client.force_login(self.user)
+        resp = self.client.post(
+            reverse("scentpick:chat_image_upload_url_api"),
+            {"filename": "a.png", "content_type": "image/png", "conversation_id": 12},
+            content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertTrue(data["key"].startswith(f"chat_images/{self.user.id}/12/"))
+        self.assertTrue(data["key"].endswith(".png"))
+        self.assertEqual(data["fields"]["key"], data["key"])
+        policy = json.loads(base64.b64decode(data["fields"]["policy"]))
+        self.assertIn({"Content-Type": "image/png"}, policy["conditions"])
+        self.assertIn(["content-length-range", 1, views.CHAT_IMAGE_MAX_BYTES], policy["conditions"])
+
+    def test_rejects_non_image(self):
+        self.client.force_login(self.user)
+        resp = self.client.post(
+            reverse("scentpick:chat_image_upload_url_api"),
+            {"filename": "a.html", "content_type": "text/html"},
+            content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 400)
+
+    async def _stream(self, **data):
+        await self.async_client.aforce_login(self.user)
+        resp = await self.async_client.post(reverse("scentpick:chat_stream_api"), data)
+        return sse_frames(b"".join([c async for c in resp.streaming_content]).decode("utf-8"))
+
+    async def test_stream_uses_uploaded_key(self):
+        key = f"chat_images/{self.user.id}/new/20250101_000000_abc.png"
+        base = "https://test-bucket.s3.ap-northeast-2.amazonaws.com"
+        original = make_image_bytes((2400, 1200), "PNG")
+        conv = await Conversation.objects.acreate(user=self.user)
+        message = await Message.objects.acreate(conversation=conv, role="user", content="이미지 기반 추천 요청")
+        calls = []
+        stubber = Stubber(self.s3)
+        stubber.add_response(
+            "head_object", {"ContentLength": len(original), "ContentType": "image/png"},
+            {"Bucket": "test-bucket", "Key": key},
+        )
+        stubber.add_response(
+            "get_object",
+            {"Body": StreamingBody(io.BytesIO(original), len(original))},
+            {"Bucket": "test-bucket", "Key": key},
+        )
+        for name in ("image", "thumb"):
+            stubber.add_response("put_object", {}, {
+                "Bucket": "test-bucket", "Key": key.replace(".png", f".{name}.webp"),
+                "Body": ANY, "ContentType": "image/webp", "CacheControl": ANY,
+            })
+        lines = [f'data: {{"done": true, "conversation_id": {conv.id}}}']
+        with stubber, \
+             mock.patch.object(self.s3, "upload_fileobj") as upload, \
+             mock.patch.object(views, "FASTAPI_CHAT_URL", "http://fastapi.test/chat"), \
+             mock.patch.object(views, "get_upstream", lambda: fake_upstream(lines, calls)):
+            frames = await self._stream(image_key=key)
+            # 모델에는 변환을 기다리지 않고 원본 URL 전달, 히스토리도 변환 전까지는 원본
+            self.assertEqual(json.loads(calls[0].content)["image_url"], f"{base}/{key}")
+            while views._background_tasks:
+                await asyncio.gather(*list(views._background_tasks))
+            stubber.assert_no_pending_responses()
+        upload.assert_not_called()  # 앱 서버는 이미지 본문을 다시 올리지 않음
+        self.assertTrue(frames[-1]["done"])
+        await message.arefresh_from_db()
+        self.assertEqual(message.chat_image, f"{base}/{key.replace('.png', '.image.webp')}")
+        self.assertEqual(message.chat_image_variants["urls"]["thumb"], f"{base}/{key.replace('.png', '.thumb.webp')}")
+
+    async def test_stream_rejects_foreign_key(self):
+        await self.async_client.aforce_login(self.user)
+        resp = await self.async_client.post(
+            reverse("scentpick:chat_stream_api"), {"content": "x", "image_key": "chat_images/999999/new/x.png"}
+        )
+        self.assertEqual(resp.status_code, 400)
+
+    async def test_stream_checks_uploaded_object(self):
+        key = f"chat_images/{self.user.id}/new/20250101_000000_abc.png"
+        await self.async_client.aforce_login(self.user)
+        cases = [
+            ({"ContentLength": views.CHAT_IMAGE_MAX_BYTES + 1, "ContentType": "image/png"}, "5MB"),
+            ({"ContentLength": 10, "ContentType": "text/html"}, "형식"),
+            ({"ContentLength": 10, "ContentType": "image/jpeg"}, "형식"),      # 키 확장자(.png)와 불일치
+        ]
+        upstream = mock.Mock()
+        for head, message in cases:
+            stubber = Stubber(self.s3)
+            stubber.add_response("head_object", head, {"Bucket": "test-bucket", "Key": key})
+            with stubber, mock.patch.object(views, "get_upstream", upstream):
+                resp = await self.async_client.post(reverse("scentpick:chat_stream_api"), {"image_key": key})
+            self.assertEqual(resp.status_code, 400)
+            self.assertIn(message, json.loads(resp.content)["error"])
+        stubber = Stubber(self.s3)
+        stubber.add_client_error("head_object", "404", http_status_code=404)
+        with stubber:
+            resp = await self.async_client.post(reverse("scentpick:chat_stream_api"), {"image_key": key})
+        self.assertEqual(resp.status_code, 400)
+        upstream.assert_not_called()
+
+
+class IdempotencyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("idem", password="pw12345!")
+        cls.perfume = make_perfume(1)
+        cls.conv = make_conversation(cls.user, 1, [cls.perfume])
+        Message.objects.filter(conversation=cls.conv, role="user").update(idempotency_key="done-key-0001")
+
+    async def _post(self, url, headers=None, **data):
+        await self.async_client.aforce_login(self.user)
+        return await self.async_client.post(reverse(url), data, headers=headers)
+
+    async def _body(self, resp):
+        return b"".join([c async for c in resp.streaming_content]).decode("utf-8")
+
+    async def test_duplicate_stream_generates_once(self):
+        calls = []
+        lines = ['data: {"content": "한 번만"}', 'data: {"done": true, "conversation_id": 5}']
+        with mock.patch.object(views, "FASTAPI_CHAT_URL", "http://fastapi.test/chat"), \
+             mock.patch.object(views, "get_upstream", lambda: fake_upstream(lines, calls)):
+            first = await self._post("scentpick:chat_stream_api", content="추천", idempotency_key="dup-key-0001")
+            second = await self._post("scentpick:chat_stream_api", content="추천", idempotency_key="dup-key-0001")
+            first_body, second_body = await self._body(first), await self._body(second)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(json.loads(calls[0].content)["idempotency_key"], "dup-key-0001")
+        self.assertEqual(sse_frames(first_body), sse_frames(second_body))
+
+    async def test_stream_blocked_by_lock_held_on_other_worker(self):
+        upstream = mock.Mock()
+        idempotency.acquire(self.user.id, "busy-key-0002")   # 다른 워커가 생성 중 (이 워커 버퍼 없음)
+        with mock.patch.object(views, "get_upstream", upstream):
+            resp = await self._post("scentpick:chat_stream_api", content="추천", idempotency_key="busy-key-0002")
+        upstream.assert_not_called()
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(resp["Retry-After"], "1")
+        idempotency.release(self.user.id, "busy-key-0002")
+
+    async def test_stream_rejects_malformed_key(self):
+        upstream = mock.Mock()
+        with mock.patch.object(views, "get_upstream", upstream):
+            resp = await self._post("scentpick:chat_stream_api", headers={"Idempotency-Key": "!"}, content="추천")
+        upstream.assert_not_called()
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("error", json.loads(resp.content))
+
+    async def test_stream_releases_lock_when_done(self):
+        lines = ['data: {"content": "끝"}', 'data: {"done": true, "conversation_id": 5}']
+        with mock.patch.object(views, "FASTAPI_CHAT_URL", "http://fastapi.test/chat"), \
+             mock.patch.object(views, "get_upstream", lambda: fake_upstream(lines)):
+            resp = await self._post("scentpick:chat_stream_api", content="추천", idempotency_key="free-key-0001")
+            await self._body(resp)
+            await get_registry().find(self.user.id, "free-key-0001").task
+        self.assertTrue(idempotency.acquire(self.user.id, "free-key-0001"))
+        idempotency.release(self.user.id, "free-key-0001")
+
+    async def test_finished_turn_replayed_from_db(self):
+        upstream = mock.Mock()
+        with mock.patch.object(views, "get_upstream", upstream):
+            resp = await self._post(
+                "scentpick:chat_stream_api", headers={"Idempotency-Key": "done-key-0001"}, content="질문 0"
+            )
+            frames = sse_frames(await self._body(resp))
+        upstream.assert_not_called()
+        self.assertEqual(frames[0], {"content": "답변 0"})
+        self.assertTrue(frames[-1]["replayed"])
+        self.assertEqual(frames[-1]["conversation_id"], self.conv.id)
+        self.assertEqual([p["id"] for p in frames[-1]["perfume_list"]], [self.perfume.id])
+
+    def test_submit_replays_and_blocks_in_flight(self):
+        self.client.force_login(self.user)
+        url = reverse("scentpick:chat_submit_api")
+        upstream = mock.Mock()
+        with mock.patch.object(views, "get_upstream", upstream):
+            data = self.client.post(
+                url, {"content": "질문 0", "idempotency_key": "done-key-0001"}, content_type="application/json"
+            ).json()
+            self.assertTrue(data["replayed"])
+            self.assertEqual(data["final_answer"], "답변 0")
+
+            self.assertTrue(idempotency.acquire(self.user.id, "busy-key-0001"))
+            resp = self.client.post(
+                url, {"content": "x", "idempotency_key": "busy-key-0001"}, content_type="application/json"
+            )
+            self.assertEqual(resp.status_code, 409)
+            idempotency.release(self.user.id, "busy-key-0001")
+
+            bad = self.client.post(url, {"content": "x", "idempotency_key": "!"}, content_type="application/json")
+            self.assertEqual(bad.status_code, 400)
+        upstream.assert_not_called()
+
+
+class FakeBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("faker", password="pw12345!")
+
+    def setUp(self):
+        self.backend = FakeChatBackend(tokens=5, token_interval=0, latency=0)
+        self.url = self.backend.start()
+        self.addCleanup(self.backend.stop)
+
+    @override_settings(CHAT_STREAM_COALESCE_MS=0, CHAT_STREAM_COALESCE_BYTES=0)
+    async def test_stream_contract_through_view(self):
+        await self.async_client.aforce_login(self.user)
+        with mock.patch.object(views, "FASTAPI_CHAT_URL", self.url), \
+             mock.patch.object(views, "get_upstream", lambda client=UpstreamClient(): client):
+            resp = await self.async_client.post(reverse("scentpick:chat_stream_api"), {"content": "추천"})
+            frames = sse_frames(b"".join([c async for c in resp.streaming_content]).decode("utf-8"))
+        self.assertEqual(len([f for f in frames if "content" in f]), 5)
+        self.assertTrue(frames[-1]["done"])
+        self.assertEqual(self.backend.stats["streams"], 1)
+
+    def test_json_contract_and_failure_injection(self):
+        client = UpstreamClient(retries=0)
+        data = client.post_json(self.url, {"user_id": 1, "query": "x", "conversation_id": 9})
+        self.assertEqual(data["conversation_id"], 9)
+        self.assertEqual(len(data["final_answer"].split()), 5)
+        self.backend.fail_rate = 1.0
+        with self.assertRaises(httpx.HTTPStatusError):
+            client.post_json(self.url, {"user_id": 1, "query": "x"})
+
+
+class SessionWriteTests(TestCase):
+    """채팅 턴당 세션 DB 쓰기는 최대 1번 (대화가 바뀔 때만)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("sessioner", password="pw12345!")
+        cls.conv = make_conversation(cls.user, 1)
+
+    def _count_session_saves(self):
+        return mock.patch.object(Session, "save", autospec=True, side_effect=Session.save)
+
+    async def _turn(self):
+        lines = [
+            f'data: {{"conversation_id": {self.conv.id}}}',
+            f'data: {{"content": "a", "conversation_id": {self.conv.id}}}',
+            f'data: {{"done": true, "conversation_id": {self.conv.id}, "perfume_list": []}}',
+        ]
+        with mock.patch.object(views, "FASTAPI_CHAT_URL", "http://fastapi.test/chat"), \
+             mock.patch.object(views, "get_upstream", lambda: fake_upstream(lines)), \
+             self._count_session_saves() as save:
+            resp = await self.async_client.post(reverse("scentpick:chat_stream_api"), {"content": "추천"})
+            [c async for c in resp.streaming_content]
+            await asyncio.sleep(0)  # producer 태스크 마무리
+        return save.call_count
+
+    async def test_stream_writes_session_once_per_new_conversation(self):
+        await self.async_client.aforce_login(self.user)
+        self.assertEqual(await self._turn(), 1)
+        self.assertEqual(await self._turn(), 0)  # 같은 대화 이어가기 → 쓰기 없음
+        session = await self.async_client.asession()
+        self.assertEqual(await session.aget("conversation_id"), self.conv.id)
+
+    def test_chat_page_view_does_not_rewrite_session(self):
+        self.client.force_login(self.user)
+        url = reverse("scentpick:chat") + f"?conversation_id={self.conv.id}"
+        with self._count_session_saves() as save:
+            self.client.get(url)
+            self.client.get(url)
+            self.client.get(url)
+        self.assertEqual(save.call_count, 1)
+
+
+def make_limiter(cache=None, **kwargs):
+    """테스트마다 독립된 LocMemCache를 공유 저장소로 쓰는 ConcurrencyLimiter"""
+    kwargs.setdefault("poll_interval", 0.01)
+    kwargs.setdefault("max_poll_interval", 0.02)
+    return ConcurrencyLimiter(cache or LocMemCache(f"limiter-{os.urandom(4).hex()}", {}), **kwargs)
+
+
+class ConcurrencyLimiterTests(TestCase):
+    def test_per_user_cap_does_not_block_other_users(self):
+        limiter = make_limiter(per_user=1, global_limit=4, queue_timeout=0.05)
+        lease = limiter.acquire(1)
+        with self.assertRaises(ConcurrencyLimited) as ctx:
+            limiter.acquire(1)
+        self.assertEqual(ctx.exception.reason, "timeout")
+        limiter.acquire(2).release()
+        lease.release()
+        limiter.acquire(1).release()
+        self.assertEqual(limiter.metrics()["rejected_timeout"], 1)
+        self.assertEqual(limiter.metrics()["in_flight"], 0)
+
+    def test_full_queue_rejects_immediately(self):
+        limiter = make_limiter(global_limit=1, queue_max=0, queue_timeout=30)
+        lease = limiter.acquire(1)
+        with self.assertRaises(ConcurrencyLimited) as ctx:
+            limiter.acquire(2)
+        self.assertEqual(ctx.exception.reason, "queue_full")
+        self.assertEqual(ctx.exception.retry_after, 30)
+        lease.release()
+        metrics = limiter.metrics()
+        self.assertEqual((metrics["rejected_queue_full"], metrics["queued"], metrics["waiting"]), (1, 0, 0))
+
+    def test_workers_share_slots_through_cache(self):
+        shared = LocMemCache(f"limiter-{os.urandom(4).hex()}", {})
+        worker_a = make_limiter(shared, global_limit=1, queue_max=0)
+        worker_b = make_limiter(shared, global_limit=1, queue_max=0)
+        lease = worker_a.acquire(1)
+        self.assertEqual(worker_b.metrics()["in_flight"], 1)
+        with self.assertRaises(ConcurrencyLimited):
+            worker_b.acquire(2)
+        lease.release()
+        worker_b.acquire(2).release()
+
+    async def test_waiters_are_admitted_in_arrival_order(self):
+        limiter = make_limiter(global_limit=1, queue_timeout=5)
+        lease = await limiter.aacquire(1)
+        order = []
+
+        async def wait(user_id):
+            got = await limiter.aacquire(user_id)
+            order.append(user_id)
+            await asyncio.sleep(0.03)
+            got.release()
+
+        first = asyncio.create_task(wait(2))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(wait(3))
+        await asyncio.sleep(0.05)
+        self.assertEqual(limiter.metrics()["queued"], 2)
+        lease.release()
+        await asyncio.gather(first, second)
+        self.assertEqual(order, [2, 3])
+        self.assertEqual(limiter.metrics()["admitted_after_wait"], 2)
+
+    async def test_stream_api_returns_429_and_releases_slots(self):
+        user = await User.objects.acreate_user("limited", password="pw12345!")
+        await self.async_client.aforce_login(user)
+        limiter = make_limiter(per_user=1, queue_per_user=0)
+        lines = ['data: {"content": "a"}', 'data: {"done": true, "conversation_id": 1, "perfume_list": []}']
+        with mock.patch.object(views, "get_limiter", lambda: limiter), \
+             mock.patch.object(views, "FASTAPI_CHAT_URL", "http://fastapi.test/chat"), \
+             mock.patch.object(views, "get_upstream", lambda: fake_upstream(lines)):
+            held = await limiter.aacquire(user.id)
+            resp = await self.async_client.post(reverse("scentpick:chat_stream_api"), {"content": "추천"})
+            self.assertEqual(resp.status_code, 429)
+            self.assertEqual(resp["Retry-After"], str(limiter.retry_after))
+            self.assertEqual(resp.json()["reason"], "user_queue_full")
+            held.release()
+
+            resp = await self.async_client.post(reverse("scentpick:chat_stream_api"), {"content": "추천"})
+            self.assertEqual(resp.status_code, 200)
+            [c async for c in resp.streaming_content]
+            await asyncio.sleep(0.05)  # producer 태스크가 슬롯 반환
+        self.assertEqual(limiter.metrics()["in_flight"], 0)
+
+
+class AnswerCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("cached", password="pw12345!")
+        UserDetail.objects.update_or_create(user=cls.user, defaults={"gender": "female", "birth_year": timezone.now().year - 25})
+        cls.perfume = make_perfume(1)
+
+    def setUp(self):
+        answer_cache.get_answer_cache().clear()
+
+    def test_ttl_lru_and_metrics(self):
+        now = [0.0]
+        cache = AnswerCache(ttl=10, max_entries=2, clock=lambda: now[0])
+        cache.put("a", "A", [], elapsed=2.0)
+        cache.put("b", "B", [], elapsed=3.0)
+        self.assertEqual(cache.get("a")["final_answer"], "A")   # a가 최근 사용 → b가 밀려남
+        cache.put("c", "C", [])
+        self.assertIsNone(cache.get("b"))
+        now[0] = 11
+        self.assertIsNone(cache.get("a"))
+        metrics = cache.metrics()
+        self.assertEqual((metrics["hits"], metrics["misses"], metrics["evictions"], metrics["expired"]), (1, 2, 1, 1))
+        self.assertEqual(metrics["saved_seconds"], 2.0)
+        self.assertEqual(metrics["hit_ratio"], 0.333)
+
+    def test_key_normalizes_text_but_not_profile(self):
+        key = answer_cache.cache_key
+        self.assertEqual(key("여름에 좋은 시트러스 향수 추천!", "female", "20s"), key("  여름에 좋은  시트러스 향수 추천", "female", "20s"))
+        self.assertNotEqual(key("여름 향수", "female", "20s"), key("여름 향수", "male", "20s"))
+        self.assertNotEqual(key("여름 향수", "female", "20s"), key("여름 향수", "female", "30s"))
+
+    def _submit(self, content, **extra):
+        return self.client.post(
+            reverse("scentpick:chat_submit_api"), {"content": content, **extra}, content_type="application/json"
+        )
+
+    @override_settings(CHAT_ANSWER_CACHE_ENABLED=True)
+    def test_submit_replays_cached_answer_as_new_conversation(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            perfumes = [{"id": self.perfume.id, "brand": self.perfume.brand, "name": self.perfume.name}]
+            return httpx.Response(200, json={"conversation_id": 999, "final_answer": "시트러스 추천", "perfume_list": perfumes})
+
+        self.client.force_login(self.user)
+        hits = answer_cache.get_answer_cache().metrics()["hits"]
+        with mock.patch.object(views, "FASTAPI_CHAT_URL", "http://fastapi.test/chat"), \
+             mock.patch.object(views, "get_upstream", lambda: UpstreamClient(transport=httpx.MockTransport(handler))):
+            first = self._submit("여름에 좋은 시트러스 향수 추천").json()
+            second = self._submit("여름에 좋은 시트러스 향수 추천?").json()
+            self._submit("여름에 좋은 시트러스 향수 추천", conversation_id=first["conversation_id"])  # 이어지는 대화는 캐시 안 함
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(second["cached"])
+        self.assertEqual(second["final_answer"], "시트러스 추천")
+
+        conv = Conversation.objects.get(id=second["conversation_id"], user=self.user)
+        items = build_transcript(conv)
+        self.assertEqual([i["role"] for i in items], ["user", "assistant"])
+        self.assertEqual([p["id"] for p in items[1]["perfume_list"]], [self.perfume.id])
+        self.assertEqual(conv.message_count, 2)
+        self.assertEqual(answer_cache.get_answer_cache().metrics()["hits"], hits + 1)
+
+    @override_settings(CHAT_ANSWER_CACHE_ENABLED=True, CHAT_STREAM_COALESCE_MS=0, CHAT_STREAM_COALESCE_BYTES=0)
+    async def test_stream_replays_cached_answer(self):
+        lines = [
+            'data: {"content": "상쾌한 "}',
+            'data: {"content": "시트러스"}',
+            f'data: {{"done": true, "conversation_id": 5, "perfume_list": [{{"id": {self.perfume.id}}}]}}',
+        ]
+        calls = []
+        await self.async_client.aforce_login(self.user)
+        with mock.patch.object(views, "FASTAPI_CHAT_URL", "http://fastapi.test/chat"), \
+             mock.patch.object(views, "get_upstream", lambda: fake_upstream(lines, calls)):
+            resp = await self.async_client.post(reverse("scentpick:chat_stream_api"), {"content": "시트러스 추천"})
+            [c async for c in resp.streaming_content]
+            await asyncio.sleep(0.05)  # producer 태스크가 캐시에 저장
+            await self.async_client.post(reverse("scentpick:chat_new_api"))  # 새 대화에서 같은 질문
+            resp = await self.async_client.post(reverse("scentpick:chat_stream_api"), {"content": "시트러스 추천"})
+            frames = sse_frames(b"".join([c async for c in resp.streaming_content]).decode("utf-8"))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual("".join(f.get("content", "") for f in frames), "상쾌한 시트러스")
+        self.assertTrue(frames[-1]["cached"])
+        self.assertEqual([p["id"] for p in frames[-1]["perfume_list"]], [self.perfume.id])
+        self.assertIn("image_url", frames[-1]["perfume_list"][0])   # 재생할 때도 카드 정보 포함
+        self.assertTrue(await Conversation.objects.filter(id=frames[-1]["conversation_id"], user=self.user).aexists())
+
+
+class PerfumeCardsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("carder", password="pw12345!")
+        cls.perfumes = [make_perfume(i, sizes=[30, 50]) for i in range(10)]
+        Favorite.objects.create(user=cls.user, perfume=cls.perfumes[2])
+        FeedbackEvent.objects.create(user=cls.user, perfume=cls.perfumes[3], source="detail", action="dislike")
+
+    def setUp(self):
+        bump_catalog_version()
+        get_fuzzy_index(wait=True)   # id 없는 perfume_list 항목의 향수명 해석
+
+    def test_cards_use_fixed_number_of_queries(self):
+        ids = [p.id for p in reversed(self.perfumes)]
+        with CaptureQueriesContext(connection) as ctx:
+            cards = build_cards(ids + [999999], self.user)
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertEqual([c["id"] for c in cards], ids)   # 요청 순서 유지, 없는 id 제외
+        by_id = {c["id"]: c for c in cards}
+        self.assertTrue(by_id[self.perfumes[2].id]["is_favorite"])
+        self.assertEqual(by_id[self.perfumes[3].id]["feedback_status"], "dislike")
+        self.assertEqual(by_id[self.perfumes[0].id]["sizes"], [30, 50])
+        self.assertTrue(by_id[self.perfumes[0].id]["image_url"].endswith(f"/{self.perfumes[0].id}.jpg"))
+
+    def test_api(self):
+        url = reverse("scentpick:perfume_cards_api")
+        ids = f"{self.perfumes[1].id},{self.perfumes[2].id}"
+        self.assertEqual(self.client.get(url, {"ids": ids}).status_code, 302)   # 로그인 필요
+        self.client.force_login(self.user)
+        cards = self.client.get(url, {"ids": ids}).json()["cards"]
+        self.assertEqual([c["main_accords"] for c in cards], [["우디"], ["우디"]])
+        self.assertTrue(cards[1]["is_favorite"])
+        self.assertEqual(self.client.get(url, {"ids": "1,abc"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"ids": ",".join(map(str, range(1, 60)))}).status_code, 400)
+
+    @override_settings(CHAT_STREAM_COALESCE_MS=0, CHAT_STREAM_COALESCE_BYTES=0)
+    async def test_stream_done_frame_inlines_cards(self):
+        perfume = self.perfumes[2]
+        lines = [
+            'data: {"content": "추천"}',
+            f'data: {{"done": true, "conversation_id": 3, "perfume_list": [{{"id": {perfume.id}, "rank": 1}}, {{"name": "외부"}}]}}',
+        ]
+        await self.async_client.aforce_login(self.user)
+        with mock.patch.object(views, "FASTAPI_CHAT_URL", "http://fastapi.test/chat"), \
+             mock.patch.object(views, "get_upstream", lambda: fake_upstream(lines)):
+            resp = await self.async_client.post(reverse("scentpick:chat_stream_api"), {"content": "추천"})
+            frames = sse_frames(b"".join([c async for c in resp.streaming_content]).decode("utf-8"))
+        items = next(f for f in frames if f.get("perfume_list"))["perfume_list"]
+        self.assertEqual(items[0]["rank"], 1)
+        self.assertTrue(items[0]["is_favorite"])
+        self.assertEqual(items[0]["concentration"], "EDP")
+        self.assertEqual(items[1], {"name": "외부"})
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("searcher", password="pw12345!")
+        cls.jo = make_perfume(1, brand="조 말론", name="Wood Sage & Sea Salt", main_accords=["아로마틱"])
+        cls.lav = make_perfume(2, brand="Byredo", name="Lavender Kiss", main_accords=["시트러스"])
+        cls.desc = make_perfume(3, brand="Diptyque", name="Philosykos", description="은은한 라벤더와 시트러스 향")
+        cls.citrus = make_perfume(4, brand="Acqua", name="시트러스 블렌드", top_notes=["레몬"])
+
+    def setUp(self):
+        bump_catalog_version()   # TestCase 트랜잭션에서는 on_commit 시그널이 실행되지 않음
+        get_search_index(wait=True)
+        get_filter_engine(wait=True)
+        get_fuzzy_index(wait=True)
+
+    def test_hangul_ngrams_ignore_spacing(self):
+        index = get_search_index()
+        self.assertEqual(index.search("조말론"), [self.jo.id])
+        self.assertEqual(index.search("조 말론 우드"), [])          # AND: 모든 term 포함
+        self.assertEqual(index.search("레"), [self.citrus.id])     # 1글자는 이름/노트 1-gram
+
+    def test_relevance_and_prefix(self):
+        index = get_search_index()
+        # 이름 > 어코드 > 설명 순
+        self.assertEqual(index.search("시트러스"), [self.citrus.id, self.lav.id, self.desc.id])
+        self.assertEqual(index.search("lav"), [self.lav.id])       # 입력 중인 영문 단어는 접두어
+        self.assertEqual(index.search("wood sa"), [self.jo.id])
+
+    def test_rebuilds_after_perfume_change(self):
+        self.assertEqual(get_search_index().search("vetiver"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            created = make_perfume(5, name="Vetiver Extraordinaire")
+        self.assertEqual(get_search_index(wait=True).search("vetiver"), [created.id])
+
+    def test_build_from_dicts(self):
+        index = SearchIndex.build([{"id": 9, "name": "Rose", "brand": "X", "main_accords": ["플로럴"]}])
+        self.assertEqual(index.search("플로럴"), [9])
+        self.assertEqual(index.stats()["documents"], 1)
+
+    def test_description_cap_bounds_memory(self):
+        rows = [{"id": 1, "name": "Rose", "brand": "X", "description": "은은한 장미와 머스크, 비 온 뒤의 정원 " * 20}]
+        full = SearchIndex.build(rows)
+        with override_settings(PERFUME_SEARCH_DESCRIPTION_CHARS=0):
+            capped = SearchIndex.build(rows)
+        self.assertEqual(full.search("정원"), [1])
+        self.assertEqual(capped.search("정원"), [])
+        self.assertLess(capped.memory_bytes, full.memory_bytes)
+
+    def test_perfumes_view_uses_index_with_filters(self):
+        self.client.force_login(self.user)
+        url = reverse("scentpick:perfumes")
+        resp = self.client.get(url, {"q": "시트러스", "ajax": "1"})
+        self.assertEqual([p.id for p in resp.context["page_obj"]], [self.citrus.id, self.lav.id, self.desc.id])
+        resp = self.client.get(url, {"q": "시트러스", "brand": "Byredo", "ajax": "1"})
+        self.assertEqual([p.id for p in resp.context["page_obj"]], [self.lav.id])
+
+
+@override_settings(PERFUME_CATALOG_WATERMARK_INTERVAL=0)
+class FacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("facets", password="pw12345!")
+        make_perfume(1, brand="Byredo", gender="Unisex", main_accords=["우디", "머스크"])
+        make_perfume(2, brand="Byredo", gender="Female", main_accords="['우디', '플로럴']")
+        make_perfume(3, brand="Diptyque", gender="", main_accords=["우디"])
+
+    def setUp(self):
+        bump_catalog_version()
+        get_filter_engine(wait=True)
+
+    def test_counts(self):
+        facets = get_facets()
+        self.assertEqual(facets["brands"], [{"value": "Byredo", "count": 2}, {"value": "Diptyque", "count": 1}])
+        self.assertEqual(facets["genders"], [{"value": "Female", "count": 1}, {"value": "Unisex", "count": 1}])
+        self.assertEqual(
+            facets["accords"],
+            [{"value": "머스크", "count": 1}, {"value": "우디", "count": 3}, {"value": "플로럴", "count": 1}],
+        )
+
+    def test_cached_until_catalog_changes(self):
+        get_facets()
+        with self.assertNumQueries(0):
+            get_facets()
+        make_perfume(4, brand="Aesop")
+        self.assertEqual(len(get_facets()["brands"]), 2)    # 버전이 그대로면 캐시
+        bump_catalog_version()
+        self.assertEqual(len(get_facets()["brands"]), 3)
+
+    def test_watermark_detects_bulk_update(self):
+        check_watermark(force=True)
+        get_facets()
+        Perfume.objects.filter(brand="Diptyque").update(brand="Aesop", updated_at=timezone.now() + timedelta(seconds=1))
+        check_watermark(force=True)
+        self.assertEqual([b["value"] for b in get_facets()["brands"]], ["Aesop", "Byredo"])
+
+    def test_perfumes_page_shows_counts(self):
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse("scentpick:perfumes"))
+        self.assertContains(resp, 'value="Byredo"')
+        self.assertContains(resp, "(2)")
+        self.assertContains(resp, 'data-count="3"')
+
+
+class PerfumeAttributeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("attrs", password="pw12345!")
+        cls.woody = make_perfume(
+            1, gender="Male", main_accords=["우디", "머스크"], sizes=["50ml", 100],
+            top_notes=["베르가못"], base_notes="['샌달우드', '머스크']",
+        )
+        cls.citrus = make_perfume(2, gender="Female", main_accords="['시트러스', '우디']", sizes=[30])
+
+    def setUp(self):
+        bump_catalog_version()
+        get_filter_engine(wait=True)
+
+    def test_rows_synced_on_save(self):
+        self.assertEqual(
+            list(self.woody.accord_rows.order_by("position").values_list("name", flat=True)), ["우디", "머스크"]
+        )
+        self.assertEqual(
+            sorted(self.woody.note_rows.values_list("layer", "name")),
+            [("base", "머스크"), ("base", "샌달우드"), ("top", "베르가못")],
+        )
+        self.assertEqual(sorted(self.woody.size_rows.values_list("ml", flat=True)), [50, 100])
+        self.assertEqual(list(self.citrus.accord_rows.values_list("name", flat=True).order_by("position")), ["시트러스", "우디"])
+
+    def test_resync_only_when_json_fields_change(self):
+        with self.assertNumQueries(1):
+            self.woody.save(update_fields=["description"])
+        self.woody.main_accords = ["앰버"]
+        self.woody.save()
+        self.assertEqual(list(self.woody.accord_rows.values_list("name", flat=True)), ["앰버"])
+
+    def test_backfill_after_bulk_update(self):
+        Perfume.objects.filter(pk=self.citrus.pk).update(sizes=[75])
+        self.assertFalse(PerfumeSize.objects.filter(ml=75).exists())
+        self.assertEqual(backfill_all(batch_size=1), 2)
+        self.assertEqual(list(self.citrus.size_rows.values_list("ml", flat=True)), [75])
+        self.assertEqual(Accord.objects.count(), 4)
+
+    def test_filters_use_normalized_tables(self):
+        self.client.force_login(self.user)
+        url = reverse("scentpick:perfumes")
+        resp = self.client.get(url, {"accord": "우디", "ajax": "1"})
+        self.assertEqual({p.id for p in resp.context["page_obj"]}, {self.woody.id, self.citrus.id})
+        resp = self.client.get(url, {"accord": "우디", "size": ["100", "x"], "ajax": "1"})
+        self.assertEqual([p.id for p in resp.context["page_obj"]], [self.woody.id])
+
+        self.assertEqual([p.id for p in views.query_perfumes_by_accords(["시트러스"], gender="Male")], [])
+        self.assertEqual({p.id for p in views.query_perfumes_by_accords(["시트러스", "머스크"])}, {self.woody.id, self.citrus.id})
+        items = views.filter_worldcup_candidates("여성", "우디", "day")
+        self.assertEqual([i["id"] for i in items], [self.citrus.id])
+
+
+class FilterEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("bitmaps", password="pw12345!")
+        cls.perfumes = [
+            make_perfume(
+                i, brand=["Aesop", "Byredo", "Creed"][i % 3], gender=["Male", "Female", "Unisex"][i % 3],
+                concentration=["EDP", "EDT"][i % 2], main_accords=[["우디"], ["시트러스", "우디"], ["머스크"]][i % 3],
+                sizes=[[50], [50, 100]][i % 2],
+            )
+            for i in range(1, 31)
+        ]
+
+    def setUp(self):
+        bump_catalog_version()
+        self.engine = get_filter_engine(wait=True)
+
+    def expected(self, **filters):
+        return list(Perfume.objects.filter(**filters).order_by("brand", "name", "id").values_list("id", flat=True))
+
+    def test_filters_match_orm(self):
+        result = self.engine.filter(brand=["Byredo", "Creed"], gender=["female"], conc=["ed"], accord=["우디"], size=["100"])
+        expected = self.expected(brand="Byredo", gender="Female", sizes__icontains="100")
+        self.assertEqual(result.count(), len(expected))
+        self.assertEqual(result[0:50], expected)
+        everything = self.engine.filter()
+        self.assertEqual(everything.count(), 30)
+        self.assertEqual(everything[24:30], self.expected()[24:30])    # 두 번째 페이지
+
+    def test_keep_filters_search_results(self):
+        bits = self.engine.filter_bits(accord=["머스크"])
+        ids = [p.id for p in reversed(self.perfumes)]
+        self.assertEqual(self.engine.keep(bits, ids), [p.id for p in reversed(self.perfumes) if p.main_accords == ["머스크"]])
+
+    def test_incremental_refresh_keeps_positions(self):
+        target = self.perfumes[0]
+        target.main_accords = ["레더"]
+        with self.captureOnCommitCallbacks(execute=True):
+            target.save()
+        refreshed = get_filter_engine()
+        self.assertIs(refreshed.ids, self.engine.ids)      # 다시 빌드하지 않고 비트만 갱신
+        self.assertEqual(refreshed.filter(accord=["레더"])[0:10], [target.id])
+        self.assertNotIn(target.id, refreshed.filter(accord=["우디"])[0:30])
+        self.assertIn(target.id, self.engine.filter(accord=["우디"])[0:30])   # 이전 엔진은 그대로
+
+    @override_settings(PERFUME_INDEX_REFRESH_MAX_ROWS=1)
+    def test_refresh_over_row_limit_rebuilds(self):
+        # 워터마크 행(updated_at ≥ 워터마크)만으로 상한에 닿음 → 증분 대신 전체 다시 빌드
+        bump_catalog_version()
+        engine = get_filter_engine(wait=True)
+        self.assertIsNot(engine.ids, self.engine.ids)
+        self.assertEqual(engine.ids, self.engine.ids)
+
+    def test_new_perfume_rebuilds(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            created = make_perfume(99, brand="Aaa")
+        engine = get_filter_engine(wait=True)
+        self.assertEqual(engine.filter(brand=["Aaa"])[0:1], [created.id])
+        self.assertEqual(engine.filter()[0:1], [created.id])   # (brand, name) 순서 첫 번째
+
+    def test_after_reseeks_deleted_cursor_in_db_order(self):
+        everything = self.engine.filter_bits()
+        first, has_more = self.engine.after(everything, None, 5)
+        self.assertTrue(has_more)
+        cursor_perfume = Perfume.objects.get(id=first[-1])
+        cursor = (cursor_perfume.brand, cursor_perfume.name, cursor_perfume.id)
+        Perfume.objects.filter(id__in=first[-2:]).delete()    # 스크롤 도중 커서 향수와 그 앞 향수가 삭제됨
+        bump_catalog_version()
+        engine = get_filter_engine(wait=True)
+        with self.assertNumQueries(1):                        # 위치는 DB 콜레이션 순서로 다시 찾음
+            ids, _ = engine.after(engine.filter_bits(), cursor, 5)
+        self.assertEqual(ids, self.expected()[3:8])           # 건너뛰거나 반복하지 않음
+        last = Perfume.objects.order_by("-brand", "-name", "-id").first()
+        self.assertEqual(engine.after(engine.filter_bits(), (last.brand, last.name, last.id + 1000), 5), ([], False))
+
+    def test_build_from_dicts(self):
+        engine = FilterEngine.build([
+            {"id": 5, "brand": "B", "name": "x", "gender": "Unisex", "concentration": "EDP",
+             "main_accords": "['우디']", "sizes": ["30ml"], "updated_at": None},
+        ])
+        self.assertEqual(engine.filter(size=["30"], accord=["우디"])[0:1], [5])
+        self.assertEqual(engine.filter(gender=["male"]).count(), 0)
+
+    def test_note_filter_matches_note_table(self):
+        self.addCleanup(setattr, filter_engine_module._engine, "current", None)   # 롤백된 노트가 엔진에 남지 않게
+        for p in self.perfumes[:4]:
+            p.top_notes = ["베르가못"]
+            p.save()
+        self.perfumes[5].base_notes = ["머스크", "베르가못"]
+        self.perfumes[5].save()
+        bump_catalog_version()
+        engine = get_filter_engine(wait=True)
+        expected = list(
+            Perfume.objects.filter(note_filter(["베르가못"])).order_by("brand", "name", "id").values_list("id", flat=True)
+        )
+        self.assertEqual(len(expected), 5)
+        self.assertEqual(engine.filter(note=["베르가못"])[0:50], expected)
+
+        self.client.force_login(self.user)
+        params = {"note": "베르가못", "accord": "우디", "ajax": "1"}
+        resp = self.client.get(reverse("scentpick:perfumes"), params)
+        with override_settings(PERFUME_FILTER_ENGINE=False):
+            orm = self.client.get(reverse("scentpick:perfumes"), params)
+        ids = [p.id for p in resp.context["page_obj"]]
+        self.assertEqual(ids, [p.id for p in orm.context["page_obj"]])
+        self.assertTrue(ids)
+        self.assertTrue(set(ids) < set(expected))
+
+    def test_view_matches_orm_path(self):
+        self.client.force_login(self.user)
+        url = reverse("scentpick:perfumes")
+        params = {"accord": "우디", "conc": "EDT", "page": "2", "ajax": "1"}
+        with self.assertNumQueries(3):   # 세션/사용자 + 페이지 행 (건수/필터는 엔진)
+            resp = self.client.get(url, params)
+        with override_settings(PERFUME_FILTER_ENGINE=False):
+            orm = self.client.get(url, params)
+        self.assertEqual(
+            [p.id for p in resp.context["page_obj"]], [p.id for p in orm.context["page_obj"]]
+        )
+        self.assertEqual(resp.context["page_obj"].paginator.count, orm.context["page_obj"].paginator.count)
+
+
+class GridPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("scroller", password="pw12345!")
+        for i in range(1, 61):
+            make_perfume(i, main_accords=["우디"] if i % 2 else ["머스크"])
+
+    def setUp(self):
+        bump_catalog_version()
+        get_filter_engine(wait=True)
+        self.client.force_login(self.user)
+        self.url = reverse("scentpick:perfumes")
+
+    def scroll_all(self, **params):
+        seen, cursor, pages = [], "", 0
+        while True:
+            resp = self.client.get(self.url, {**params, "ajax": "1", "after": cursor})
+            self.assertEqual(resp.status_code, 200)
+            seen += [p.id for p in resp.context["perfumes"]]
+            pages += 1
+            cursor = resp.context["next_cursor"]
+            if not cursor:
+                return seen, pages
+
+    def expected(self, **filters):
+        return list(Perfume.objects.filter(**filters).order_by("brand", "name", "id").values_list("id", flat=True))
+
+    def test_scroll_covers_catalog_once(self):
+        seen, pages = self.scroll_all(accord="우디")
+        self.assertEqual(seen, self.expected(id__in=Accord.objects.filter(name="우디").values("perfume_id")))
+        self.assertEqual(pages, 2)
+        with override_settings(PERFUME_FILTER_ENGINE=False):
+            self.assertEqual(self.scroll_all()[0], self.expected())
+
+    def test_orm_scroll_has_no_offset_or_count(self):
+        first = self.client.get(self.url, {"ajax": "1", "page": "1"})
+        cursor = first.context["next_cursor"]
+        self.assertEqual(cursor, self.client.get(self.url, {"ajax": "1", "after": ""}).context["next_cursor"])
+        with override_settings(PERFUME_FILTER_ENGINE=False), CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.url, {"ajax": "1", "after": cursor})
+        self.assertEqual([p.id for p in resp.context["perfumes"]], self.expected()[24:48])
+        sql = " ".join(q["sql"].upper() for q in ctx.captured_queries)
+        self.assertNotIn("OFFSET", sql)
+        self.assertNotIn("COUNT(", sql)
+
+    @override_settings(PERFUME_FILTER_ENGINE=False)
+    def test_orm_page_count_is_cached(self):
+        self.client.get(self.url, {"ajax": "1", "brand": "Brand1"})
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.url, {"ajax": "1", "brand": "Brand1", "page": "1"})
+        self.assertFalse(any("COUNT(" in q["sql"].upper() for q in ctx.captured_queries))
+        self.assertContains(resp, f"총 {len(self.expected(brand='Brand1'))}개")
+
+    def test_search_scroll_and_bad_cursor(self):
+        bump_catalog_version()
+        get_search_index(wait=True)
+        seen, _ = self.scroll_all(q="perfume")
+        self.assertEqual(sorted(seen), sorted(self.expected()))
+        self.assertEqual(len(seen), len(set(seen)))
+        resp = self.client.get(self.url, {"ajax": "1", "after": "not-a-cursor"})
+        self.assertEqual(resp.status_code, 400)
+
+
+class TypeaheadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("typer", password="pw12345!")
+        cls.wood = make_perfume(1, brand="조 말론", name="Wood Sage & Sea Salt", top_notes=["베르가못"])
+        cls.blossom = make_perfume(2, brand="조 말론", name="자몽 블라썸", top_notes=["자몽"])
+        cls.gypsy = make_perfume(3, brand="Byredo", name="Gypsy Water", top_notes=["Bergamot"])
+        Favorite.objects.create(user=cls.user, perfume=cls.blossom)
+
+    def setUp(self):
+        bump_catalog_version()
+        get_typeahead_index(wait=True)
+        self.url = reverse("scentpick:perfume_typeahead_api")
+        self.client.force_login(self.user)
+
+    def labels(self, q, **params):
+        resp = self.client.get(self.url, {"q": q, **params})
+        self.assertEqual(resp.status_code, 200)
+        return [(r["type"], r["label"]) for r in resp.json()["results"]]
+
+    def test_chosung_and_partial_syllables(self):
+        expected = [("brand", "조 말론"), ("perfume", "자몽 블라썸"), ("perfume", "Wood Sage & Sea Salt")]
+        self.assertEqual(self.labels("ㅈㅁㄹ"), expected)    # 브랜드 + '브랜드 이름' 키 (즐겨찾기 순)
+        self.assertEqual(self.labels("조마")[0], ("brand", "조 말론"))          # 입력 중인 '말'
+        self.assertIn(("perfume", "자몽 블라썸"), self.labels("ㅈㅁ"))
+        self.assertEqual(self.labels("블라"), [("perfume", "자몽 블라썸")])      # 단어 중간 시작
+
+    def test_cross_language_notes(self):
+        results = self.client.get(self.url, {"q": "berg"}).json()["results"]
+        notes = [r for r in results if r["type"] == "note"]
+        self.assertEqual({(r["label"], r["alias"]) for r in notes}, {("베르가못", "Bergamot"), ("Bergamot", "베르가못")})
+        self.assertIn(("note", "Bergamot"), self.labels("베르"))
+        # 노트 선택 → /perfumes/?note= (perfume_notes 필터)
+        bergamot = next(r for r in notes if r["label"] == "베르가못")
+        get_filter_engine(wait=True)
+        resp = self.client.get(f"{bergamot['url']}&ajax=1")
+        self.assertEqual([p.id for p in resp.context["page_obj"]], [self.wood.id])
+
+    def test_ranking_and_links(self):
+        results = self.client.get(self.url, {"q": "조", "limit": 2}).json()["results"]
+        self.assertEqual([r["label"] for r in results], ["조 말론", "자몽 블라썸"])   # 브랜드 → 즐겨찾기 많은 향수
+        self.assertEqual(results[1]["url"], reverse("scentpick:product_detail", args=[self.blossom.id]))
+        self.assertIn("brand=%EC%A1%B0+%EB%A7%90%EB%A1%A0", results[0]["url"])
+
+    def test_empty_and_bad_params(self):
+        self.assertEqual(self.labels(" "), [])
+        self.assertEqual(self.client.get(self.url, {"q": "a", "limit": "x"}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url, {"q": "조"}).status_code, 302)   # 로그인 필요
+
+    def test_index_from_items(self):
+        index = TypeaheadIndex.build([
+            ("perfume", "닭 한 마리", ["닭 한 마리"], 0, {"label": "닭 한 마리"}),
+        ])
+        self.assertEqual(index.search("달ㄱ"), [{"label": "닭 한 마리"}])    # 겹받침 입력 중
+        self.assertEqual(index.search("ㄷㅎㅁㄹ"), [{"label": "닭 한 마리"}])
+        self.assertEqual(index.search("x"), [])
+
+
+class FuzzyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("fuzzer", password="pw12345!")
+        cls.wood = make_perfume(1, brand="Jo Malone London", name="Wood Sage & Sea Salt")
+        cls.peony = make_perfume(2, brand="Jo Malone London", name="Peony & Blush Suede")
+        cls.doson = make_perfume(3, brand="딥티크", name="도손")
+        cls.gypsy = make_perfume(4, brand="Byredo", name="Gypsy Water")
+
+    def setUp(self):
+        bump_catalog_version()
+        get_search_index(wait=True)
+        get_filter_engine(wait=True)
+        self.index = get_fuzzy_index(wait=True)
+
+    def test_misspelled_brand_and_name(self):
+        self.assertEqual(set(self.index.search("Jo Malon")), {self.wood.id, self.peony.id})
+        self.assertEqual(self.index.search("딥디크"), [self.doson.id])     # 자모 trigram: 딥디크 ≈ 딥티크
+        self.assertEqual(self.index.search("gipsy water")[0], self.gypsy.id)
+        self.assertEqual(self.index.suggest("딥디크"), "딥티크")
+        self.assertEqual(self.index.search("vetiver"), [])
+        self.assertEqual(self.index.search("jo"), [])                     # 너무 짧은 질의
+
+    def test_candidate_cap_and_threshold(self):
+        index = FuzzyIndex.build([
+            {"id": i, "brand": "Brand", "name": f"Rose {i:03d}", "updated_at": None} for i in range(300)
+        ])
+        with mock.patch("scentpick.utils.fuzzy.MAX_CANDIDATES", 5):
+            self.assertEqual(len(index.match("rose 01", threshold=0.3)), 5)
+        self.assertEqual(index.match("rose 010", threshold=1.0)[0][1], index.term_ids["rose010"])
+
+    def test_perfumes_search_falls_back_to_fuzzy(self):
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse("scentpick:perfumes"), {"q": "딥디크", "ajax": "1"})
+        self.assertEqual([p.id for p in resp.context["page_obj"]], [self.doson.id])
+        self.assertEqual(resp.context["fuzzy_suggestion"], "딥티크")
+        self.assertContains(resp, "딥티크</strong>(으)로 찾은 결과")
+        resp = self.client.get(reverse("scentpick:perfumes"), {"q": "Jo Malon", "ajax": "1"})   # 접두어 검색으로 찾음
+        self.assertIsNone(resp.context["fuzzy_suggestion"])               # 정확 검색 결과가 있으면 그대로
+
+    def test_incremental_refresh(self):
+        self.doson.name = "오르페옹"
+        self.doson.save()
+        created = make_perfume(5, brand="Le Labo", name="Santal 33")
+        bump_catalog_version()
+        with mock.patch("scentpick.utils.fuzzy._index.rebuild") as rebuild:
+            index = get_fuzzy_index()
+        rebuild.assert_not_called()
+        self.assertIsNot(index, self.index)
+        self.assertEqual(index.search("santa 33"), [created.id])
+        self.assertEqual(index.search("오르페온"), [self.doson.id])
+        self.assertEqual(index.search("도손"), [])
+        self.assertEqual(self.index.search("도손"), [self.doson.id])       # 조회 중이던 인덱스는 그대로
+
+    def test_resolve_chat_perfume_names(self):
+        self.assertEqual(resolve_perfume("gypsy water", "BYREDO"), (self.gypsy.id, "exact"))
+        self.assertEqual(resolve_perfume("Wood Sage and Sea Salt", "Jo Malone"), (self.wood.id, "fuzzy"))
+        self.assertIsNone(resolve_perfume("Jo Malon"))                    # 브랜드만 맞으면 해석 안 함
+        self.assertIsNone(resolve_perfume("Baccarat Rouge 540"))
+        items = enrich_perfume_list([{"name": "도손", "brand": "딥디크", "rank": 1}, {"name": "외부"}], self.user)
+        self.assertEqual((items[0]["id"], items[0]["resolved"], items[0]["rank"]), (self.doson.id, "fuzzy", 1))
+        self.assertEqual(items[1], {"name": "외부"})
+
+
+class UpstreamClientTests(TestCase):
+    URL = "http://fastapi.test/chat"
+
+    def test_retries_connect_errors_then_succeeds(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) < 3:
+                raise httpx.ConnectError("refused", request=request)
+            return httpx.Response(200, json={"final_answer": "ok"})
+
+        client = UpstreamClient(retries=2, backoff=0, transport=httpx.MockTransport(handler))
+        self.assertEqual(client.post_json(self.URL, {"query": "q"})["final_answer"], "ok")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(client.metrics()["retries"], 2)
+        self.assertEqual(client.metrics()["breaker_state"], "closed")
+
+    def test_pool_timeout_not_retried_or_counted(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            raise httpx.PoolTimeout("pool full", request=request)
+
+        breaker = CircuitBreaker(threshold=1)
+        client = UpstreamClient(retries=2, backoff=0, breaker=breaker, transport=httpx.MockTransport(handler))
+        for _ in range(2):
+            with self.assertRaises(httpx.PoolTimeout):
+                client.post_json(self.URL, {})
+        self.assertEqual(len(calls), 2)                  # 재시도 없음
+        metrics = client.metrics()
+        self.assertEqual(metrics["pool_timeouts"], 2)
+        self.assertEqual(metrics["failures"], 0)
+        self.assertEqual(metrics["breaker_state"], "closed")
+
+    def test_breaker_opens_and_fails_fast(self):
+        now = [0.0]
+        calls = []
+        down = [True]
+
+        def handler(request):
+            calls.append(request)
+            if down[0]:
+                raise httpx.ConnectError("refused", request=request)
+            return httpx.Response(200, json={})
+
+        breaker = CircuitBreaker(threshold=2, reset_timeout=10, clock=lambda: now[0])
+        client = UpstreamClient(retries=0, breaker=breaker, transport=httpx.MockTransport(handler))
+        for _ in range(2):
+            with self.assertRaises(httpx.ConnectError):
+                client.post_json(self.URL, {})
+        with self.assertRaises(UpstreamUnavailable):
+            client.post_json(self.URL, {})
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(client.metrics()["breaker_state"], "open")
+
+        # reset_timeout 이후 probe 1개 통과 → 성공하면 closed
+        now[0] = 11
+        down[0] = False
+        client.post_json(self.URL, {})
+        self.assertEqual(breaker.state, "closed")
+
+    def test_submit_api_returns_503_when_breaker_open(self):
+        user = User.objects.create_user("submitter", password="pw12345!")
+        breaker = CircuitBreaker(threshold=1)
+        breaker.record_failure()
+        self.client.force_login(user)
+        with mock.patch.object(views, "FASTAPI_CHAT_URL", self.URL), \
+             mock.patch.object(views, "get_upstream", lambda: UpstreamClient(breaker=breaker)):
+            resp = self.client.post(
+                reverse("scentpick:chat_submit_api"), {"query": "q"}, content_type="application/json"
+            )
+        self.assertEqual(resp.status_code, 503)
+
+    def test_metrics_api_requires_staff(self):
+        user = User.objects.create_user("viewer", password="pw12345!")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse("scentpick:metrics_api")).status_code, 403)
+        user.is_staff = True
+        user.save()
+        data = self.client.get(reverse("scentpick:metrics_api")).json()
+        self.assertIn("pool_saturation", data["upstream"])
+        self.assertIn("breaker_state", data["upstream"])
+        self.assertIn("queued", data["chat_concurrency"])
+        self.assertIn("Perfume search index", data["indexes"])
+
+
+class ReplayBufferTests(TestCase):
+    async def _collect(self, buf, after):
+        return [seq async for seq, _ in buf.subscribe(after)]
+
+    async def test_size_bound_drops_oldest_frames(self):
+        buf = ReplayRegistry(max_bytes=30).create(user_id=1)
+        for i in range(10):
+            buf.append(f"data: {i}\n\n")  # 9 bytes
+        buf.close()
+        self.assertEqual(await self._collect(buf, 8), [9, 10])
+        with self.assertRaises(StreamGone):
+            await self._collect(buf, 0)
+
+    def test_ttl_and_lru_eviction(self):
+        now = [0.0]
+        registry = ReplayRegistry(ttl=10, max_streams=2, clock=lambda: now[0])
+        a = registry.create(user_id=1)
+        now[0] = 5
+        b = registry.create(user_id=1)
+        registry.create(user_id=1)
+        self.assertEqual(len(registry), 2)  # LRU로 a 제거
+        with self.assertRaises(StreamGone):
+            registry.get(a.stream_id, 1)
+        with self.assertRaises(StreamGone):
+            registry.get(b.stream_id, 2)  # 다른 사용자
+        now[0] = 30
+        with self.assertRaises(StreamGone):
+            registry.get(b.stream_id, 1)  # TTL 만료
+
+    async def test_lru_never_cancels_live_streams(self):
+        registry = ReplayRegistry(max_streams=1)
+        forever = asyncio.Event()
+        a = registry.create(user_id=1)
+        a.task = asyncio.create_task(forever.wait())
+        a.attach()
+        b = registry.create(user_id=2)
+        b.task = asyncio.create_task(forever.wait())
+        b.attach()
+        await asyncio.sleep(0)
+        self.assertEqual(len(registry), 2)           # 둘 다 생성 중 → 상한을 잠시 넘김
+        self.assertFalse(a.task.cancelled() or b.task.cancelled())
+        self.assertIs(registry.get(a.stream_id, 1), a)
+
+        a.task.cancel()                              # a 생성 끝 → 다음 정리에서 a만 제거
+        await asyncio.gather(a.task, return_exceptions=True)
+        a.close()
+        registry.create(user_id=3)
+        with self.assertRaises(StreamGone):
+            registry.get(a.stream_id, 1)
+        self.assertIs(registry.get(b.stream_id, 2), b)
+        self.assertFalse(b.task.done())
+
+        b.detach(grace=60)                           # 재접속 대기 중에도 취소하지 않음
+        registry.create(user_id=4)
+        self.assertFalse(b.task.done())
+        b._cancel_handle.cancel()
+        b._cancel_handle = None                      # grace 만료 후에도 남은 producer → 정리 대상
+        registry.create(user_id=5)
+        await asyncio.sleep(0)
+        self.assertTrue(b.task.cancelled())
+
+
+class StreamDisconnectTests(TestCase):
+    def _source(self, state, frames=100, delay=0.01):
+        async def gen():
+            try:
+                for i in range(frames):
+                    yield f"data: {i}\n\n"
+                    await asyncio.sleep(delay)
+                state["finished"] = True
+            finally:
+                state["closed"] = True
+        return gen()
+
+    def _start(self, state, **kwargs):
+        buf = ReplayRegistry().create(user_id=1)
+        buf.task = asyncio.create_task(views._fill_stream_buffer(buf, self._source(state, **kwargs)))
+        return buf
+
+    @override_settings(CHAT_STREAM_RESUME_GRACE=0)
+    async def test_disconnect_cancels_upstream(self):
+        state = {}
+        buf = self._start(state)
+        consumer = views._replay_frames(buf)
+        await consumer.__anext__()
+        await consumer.aclose()  # 클라이언트 연결 끊김
+        with self.assertRaises(asyncio.CancelledError):
+            await buf.task
+        self.assertTrue(buf.cancelled)
+        self.assertTrue(state["closed"])
+        self.assertNotIn("finished", state)
+
+    @override_settings(CHAT_STREAM_RESUME_GRACE=5)
+    async def test_reconnect_within_grace_keeps_generating(self):
+        state = {}
+        buf = self._start(state, frames=5)
+        consumer = views._replay_frames(buf)
+        await consumer.__anext__()
+        await consumer.aclose()
+        resumed = [f async for f in views._replay_frames(buf, after=1)]
+        await buf.task
+        self.assertFalse(buf.cancelled)
+        self.assertTrue(state["finished"])
+        self.assertEqual(len(resumed), 4)
+
+    @override_settings(CHAT_STREAM_HEARTBEAT=0.02)
+    async def test_heartbeat_during_pause(self):
+        state = {}
+        buf = self._start(state, frames=2, delay=0.1)
+        frames = [f async for f in views._replay_frames(buf)]
+        self.assertIn(": ping\n\n", frames)
+        self.assertEqual(len([f for f in frames if f.startswith("id: ")]), 2)
+
+
+class FrameCoalescerTests(TestCase):
+    def _frame(self, **data):
+        return f"data: {json.dumps(data)}\n\n"
+
+    async def test_merges_until_interval(self):
+        out = []
+        c = FrameCoalescer(out.append, interval=0.02, max_bytes=0)
+        for tok in ["a", "b", "c"]:
+            c.push(self._frame(content=tok))
+        self.assertEqual(out, [])
+        await asyncio.sleep(0.05)
+        self.assertEqual(sse_frames("".join(out)), [{"content": "abc"}])
+
+    async def test_byte_limit_flushes_early(self):
+        out = []
+        c = FrameCoalescer(out.append, interval=10, max_bytes=4)
+        for tok in ["ab", "cd", "e"]:
+            c.push(self._frame(content=tok))
+        self.assertEqual(sse_frames("".join(out)), [{"content": "abcd"}])
+        c.flush()
+        self.assertEqual(sse_frames("".join(out))[-1], {"content": "e"})
+
+    async def test_zero_interval_passes_through(self):
+        out = []
+        c = FrameCoalescer(out.append, interval=0, max_bytes=2048)
+        for tok in ["a", "b"]:
+            c.push(self._frame(content=tok))
+        self.assertEqual(sse_frames("".join(out)), [{"content": "a"}, {"content": "b"}])
+
+    async def test_control_frames_pass_through_in_order(self):
+        out = []
+        c = FrameCoalescer(out.append, interval=10, max_bytes=0)
+        c.push(self._frame(content="x"))
+        c.push(self._frame(conversation_id=3))
+        c.push(self._frame(content="y"))
+        c.push(self._frame(done=True, perfume_list=[]))
+        self.assertEqual(sse_frames("".join(out)), [
+            {"content": "x"}, {"conversation_id": 3}, {"content": "y"}, {"done": True, "perfume_list": []},
+        ])
+        self.assertEqual((c.frames_in, c.frames_out), (4, 4))
@@ -17,10 +17,14 @@ urlpatterns = [
     path('mypage/password/', views.password_change_view, name='password_change'),
     path("api/chat", views.chat_submit_api, name="chat_submit_api"),
     path("api/chat/stream", views.chat_stream_api, name="chat_stream_api"),
+    path("api/chat/upload-url", views.chat_image_upload_url_api, name="chat_image_upload_url_api"),
     # Chat sidebar + history APIs
     path("api/conversations", views.conversations_api, name="conversations_api"),
     path("api/conversations/<int:conv_id>/messages", views.conversation_messages_api, name="conversation_messages_api"),
     path("api/chat/new", views.chat_new_api, name="chat_new_api"),
+    path("api/metrics", views.metrics_api, name="metrics_api"),
+    path("api/perfumes/cards", views.perfume_cards_api, name="perfume_cards_api"),
+    path("api/perfumes/typeahead", views.perfume_typeahead_api, name="perfume_typeahead_api"),
     # Feedback APIs
     path('scentpick/api/delete-feedback/', views.delete_feedback_api, name='delete_feedback_api'),
     path('scentpick/api/update-feedback/', views.update_feedback_api, name='update_feedback_api'),
@@ -0,0 +1,166 @@
+# scentpick/utils/answer_cache.py
+# 반복되는 카탈로그 질문용 답변 캐시 (CHAT_ANSWER_CACHE_ENABLED로 켜는 opt-in)
+# - 키: 정규화한 질문 + 추천에 쓰이는 프로필(성별, 나이대) → 같은 키면 FastAPI/LLM 호출 없이 저장된 답변 재생
+# - 새 대화의 첫 질문(이미지 없음)만 대상: 이어지는 대화는 이전 맥락에 따라 답이 달라짐
+# - 적중 시에도 대화/메시지/추천 기록(RecRun)은 Django가 직접 남겨 사이드바·기록 화면은 그대로
+# - TTL + 항목 수 상한(LRU), 워커 프로세스 메모리 (워커마다 따로 채워짐)
+# 적중률과 절약한 업스트림 시간(저장 당시 응답 시간의 합)은 metrics()로 확인
+
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from ..models import Conversation, Message, Perfume, RecCandidate, RecRun
+
+SPLIT_RE = re.compile(r"\S+\s*")
+FRAME_WORDS = 8   # 재생 시 content 프레임당 단어 수
+
+
+def normalize_query(text):
+    """대소문자/전각/문장부호/공백 차이만 무시 (내용은 그대로 비교)"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return " ".join(re.sub(r"[^\w]+", " ", text).split())
+
+
+def profile_fields(user):
+    """추천에 쓰이는 프로필: (성별, 나이대). 프로필이 없으면 빈 값"""
+    detail = getattr(user, "detail", None)
+    if detail is None:
+        return "", ""
+    gender = (detail.gender or "").strip().lower()
+    age_band = ""
+    if detail.birth_year:
+        age = time.localtime().tm_year - detail.birth_year
+        age_band = f"{max(0, age) // 10 * 10}s"
+    return gender, age_band
+
+
+def cache_key(query, gender="", age_band=""):
+    raw = json.dumps([normalize_query(query), gender, age_band], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    def __init__(self, ttl=3600.0, max_entries=1000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()   # key → (저장 시각, answer, 업스트림 소요 초)
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0, "saved_seconds": 0.0}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """적중하면 {"final_answer", "perfume_list"} (LRU 갱신), 없거나 만료면 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            self._stats["saved_seconds"] += entry[2]
+            return entry[1]
+
+    def put(self, key, final_answer, perfume_list, elapsed=0.0):
+        with self._lock:
+            self._entries[key] = (
+                self.clock(),
+                {"final_answer": final_answer, "perfume_list": perfume_list or []},
+                elapsed,
+            )
+            self._entries.move_to_end(key)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else None
+        stats["saved_seconds"] = round(stats["saved_seconds"], 3)
+        stats["max_entries"] = self.max_entries
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """settings 기반 프로세스 공용 AnswerCache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnswerCache(
+                ttl=getattr(settings, "CHAT_ANSWER_CACHE_TTL", 3600.0),
+                max_entries=getattr(settings, "CHAT_ANSWER_CACHE_MAX_ENTRIES", 1000),
+            )
+        return _cache
+
+
+def lookup_key(user, query, conversation_id=None, has_image=False):
+    """캐시 대상이면 키, 아니면 None (꺼져 있음 / 이어지는 대화 / 이미지 첨부)"""
+    if not getattr(settings, "CHAT_ANSWER_CACHE_ENABLED", False):
+        return None
+    if conversation_id or has_image or not normalize_query(query):
+        return None
+    return cache_key(query, *profile_fields(user))
+
+
+def record_turn(user_id, query, answer, idempotency_key=None):
+    """
+    캐시 적중 턴을 새 대화로 기록 (FastAPI가 남기던 것과 같은 모양: user/assistant 메시지 + RecRun/RecCandidate)
+    반환: conversation_id
+    """
+    with transaction.atomic():
+        conv = Conversation.objects.create(user_id=user_id)
+        question = Message.objects.create(
+            conversation=conv, role=Message.Role.USER, content=query, idempotency_key=idempotency_key,
+        )
+        Message.objects.create(
+            conversation=conv, role=Message.Role.ASSISTANT, content=answer["final_answer"],
+            model="answer-cache", metadata={"cached": True},
+        )
+        items = [p for p in answer["perfume_list"] if isinstance(p, dict) and isinstance(p.get("id"), int)]
+        if items:
+            run = RecRun.objects.create(
+                user_id=user_id, conversation=conv, request_msg=question, query_text=query, agent="answer-cache",
+            )
+            known = set(Perfume.objects.filter(id__in=[p["id"] for p in items]).values_list("id", flat=True))
+            RecCandidate.objects.bulk_create([
+                RecCandidate(run_rec=run, perfume_id=p["id"], rank=p.get("rank") or i, score=p.get("score") or 0.0)
+                for i, p in enumerate(items, start=1) if p["id"] in known
+            ])
+    return conv.id
+
+
+async def replay_frames(answer, conversation_id):
+    """캐시된 답변 → 스트림과 같은 모양의 SSE 프레임 (지연 없이 몇 단어씩)"""
+    words = SPLIT_RE.findall(answer["final_answer"])
+    for i in range(0, len(words), FRAME_WORDS):
+        yield f"data: {json.dumps({'content': ''.join(words[i:i + FRAME_WORDS])})}\n\n"
+    done = {
+        "done": True,
+        "cached": True,
+        "conversation_id": conversation_id,
+        "perfume_list": answer["perfume_list"],
+    }
+    yield f"data: {json.dumps(done)}\n\n"
@@ -0,0 +1,236 @@
+# scentpick/utils/archive.py
+# 오래된 대화 메시지 콜드 스토리지 아카이브
+# - N일 동안 건드리지 않은 대화의 메시지를 gzip JSONL 세그먼트(대화당 1개, 월별 경로)로 옮기고 messages에서 삭제
+# - Conversation에는 archive_key/archived_at 스텁만 남김 (제목/요약/메시지 수는 그대로 → 사이드바 영향 없음)
+# - 조회/이어쓰기 시 rehydrate로 같은 id로 복원 (RecRun.request_msg 연결도 복원)
+# - 저장소: CHAT_ARCHIVE_BACKEND = "local"(CHAT_ARCHIVE_DIR) | "s3"(AWS_STORAGE_BUCKET_NAME, CHAT_ARCHIVE_PREFIX)
+# 단계마다 다시 실행해도 안전 (세그먼트 덮어쓰기 → 스텁 기록 → 배치 삭제)
+# 동시 복원과는 Conversation 행 잠금(select_for_update)으로 직렬화
+# - 아카이브: 세그먼트 기록+스텁, 배치 삭제마다 행을 잠그고 스텁(archive_key)이 그대로인지 확인 → 복원됐으면 중단
+# - 복원: 세그먼트 삭제 전에 행을 잠그고 다른 아카이브 실행이 같은 키로 스텁을 다시 기록했는지 확인
+
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Q, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import Conversation, Message, MessageState, RecRun
+from .message_state import encode_state
+
+SEGMENT_VERSION = 1
+MESSAGE_FIELDS = [
+    "id", "role", "content", "model", "idempotency_key", "tool_name",
+    "metadata", "created_at", "chat_image", "chat_image_variants",
+]
+
+
+# ---------- 저장소 ----------
+class LocalArchiveStore:
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)  # 중간에 죽어도 반쪽 세그먼트가 남지 않음
+
+    def get(self, key):
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3ArchiveStore:
+    def __init__(self, client, bucket):
+        self.client = client
+        self.bucket = bucket
+
+    def put(self, key, data):
+        self.client.put_object(
+            Bucket=self.bucket, Key=key, Body=data,
+            ContentType="application/x-ndjson", ContentEncoding="gzip", StorageClass="STANDARD_IA",
+        )
+
+    def get(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+def get_store():
+    backend = getattr(settings, "CHAT_ARCHIVE_BACKEND", "local")
+    if backend == "s3":
+        import boto3
+        client = boto3.client(
+            "s3",
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            region_name=settings.AWS_S3_REGION_NAME,
+        )
+        return S3ArchiveStore(client, settings.AWS_STORAGE_BUCKET_NAME)
+    return LocalArchiveStore(getattr(settings, "CHAT_ARCHIVE_DIR", os.path.join(settings.BASE_DIR, "archive")))
+
+
+def segment_key(conv):
+    """월별 파티션: <prefix>/<YYYY-MM>/conv-<id>.jsonl.gz (마지막 활동 월 기준)"""
+    prefix = getattr(settings, "CHAT_ARCHIVE_PREFIX", "archive/messages")
+    last = conv.last_message_at or conv.updated_at
+    return f"{prefix}/{last:%Y-%m}/conv-{conv.id}.jsonl.gz"
+
+
+# ---------- 세그먼트 직렬화 ----------
+def _dumps(obj):
+    return json.dumps(obj, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_segment(conv, messages, run_links):
+    """헤더 1줄 + 메시지당 1줄 gzip JSONL. 반환: (세그먼트 bytes, 압축 전 바이트)"""
+    lines = [_dumps({"version": SEGMENT_VERSION, "conversation_id": conv.id, "messages": len(messages)})]
+    for m in messages:
+        row = {f: getattr(m, f) for f in MESSAGE_FIELDS}
+        row["created_at"] = m.created_at.isoformat()  # DjangoJSONEncoder는 ms로 자름 → 커서 순서 보존 위해 전체 정밀도
+        row["state"] = m.load_state()
+        row["rec_runs"] = run_links.get(m.id, [])
+        lines.append(_dumps(row))
+    raw = ("\n".join(lines) + "\n").encode("utf-8")
+    return gzip.compress(raw, 6), len(raw)
+
+
+def read_segment(data):
+    lines = gzip.decompress(data).decode("utf-8").splitlines()
+    header = json.loads(lines[0])
+    if header.get("version") != SEGMENT_VERSION:
+        raise ValueError(f"알 수 없는 아카이브 세그먼트 버전: {header.get('version')}")
+    return header, [json.loads(line) for line in lines[1:] if line]
+
+
+# ---------- 아카이브 ----------
+def candidates(days, after_id=0):
+    """아카이브 대상 (마지막 활동/복원 후 days일 경과) + 이전 실행에서 삭제가 끝나지 않은 대화"""
+    cutoff = timezone.now() - timedelta(days=days)
+    # 마지막 활동 = last_message_at (없으면 updated_at) - 세그먼트 월 파티션(segment_key)과 같은 기준
+    stale = Q(archived_at__isnull=True, last_activity__lt=cutoff) & (
+        Q(rehydrated_at__isnull=True) | Q(rehydrated_at__lt=cutoff)
+    )
+    unfinished = Q(archived_at__isnull=False, messages__isnull=False)
+    return (
+        Conversation.objects.alias(last_activity=Coalesce("last_message_at", "updated_at"))
+        .filter(stale | unfinished, id__gt=after_id, messages__isnull=False)
+        .distinct()
+        .order_by("id")
+    )
+
+
+def archive_conversation(conv, store, delete_batch=1000):
+    """대화 하나 아카이브. 반환: {"rows", "raw_bytes", "segment_bytes"}"""
+    messages = list(
+        Message.objects.with_state().filter(conversation=conv).select_related("state_blob").order_by("created_at", "id")
+    )
+    if not messages:
+        return {"rows": 0, "raw_bytes": 0, "segment_bytes": 0}
+
+    run_links = {}
+    for run_id, msg_id in RecRun.objects.filter(request_msg__in=[m.id for m in messages]).values_list("id", "request_msg_id"):
+        run_links.setdefault(msg_id, []).append(run_id)
+
+    key = conv.archive_key or segment_key(conv)
+    if conv.archive_key:
+        # 이전 실행이 스텁까지 기록하고 삭제 중 중단됨 → 남은 행이 세그먼트에 있는지만 확인하고 이어서 삭제
+        _, archived = read_segment(store.get(key))
+        archived_ids = {row["id"] for row in archived}
+        if any(m.id not in archived_ids for m in messages):
+            raise RuntimeError(f"Conv#{conv.id}: 세그먼트에 없는 메시지가 있어 아카이브를 중단합니다.")
+        segment_bytes, raw_bytes = 0, 0
+    else:
+        data, raw_bytes = build_segment(conv, messages, run_links)
+        with transaction.atomic():
+            if Conversation.objects.select_for_update().filter(id=conv.id, archive_key__isnull=True).first() is None:
+                return {"rows": 0, "raw_bytes": 0, "segment_bytes": 0}  # 다른 실행이 먼저 아카이브함
+            store.put(key, data)
+            Conversation.objects.filter(id=conv.id).update(archive_key=key, archived_at=timezone.now())
+        segment_bytes = len(data)
+
+    ids = [m.id for m in messages]
+    deleted = 0
+    for i in range(0, len(ids), delete_batch):
+        with transaction.atomic():
+            if Conversation.objects.select_for_update().filter(id=conv.id, archive_key=key).first() is None:
+                # 삭제 도중 복원됨 → 복원된 메시지를 지우지 않도록 중단
+                print(f"⚠️ Conv#{conv.id}: 아카이브 중 복원되어 삭제를 중단합니다 ({deleted}/{len(ids)})")
+                break
+            # message_states는 CASCADE, rec_runs.request_msg는 SET_NULL (복원 시 다시 연결)
+            Message.objects.filter(id__in=ids[i:i + delete_batch]).delete()
+            deleted += len(ids[i:i + delete_batch])
+    return {"rows": deleted, "raw_bytes": raw_bytes, "segment_bytes": segment_bytes}
+
+
+# ---------- 복원 ----------
+def rehydrate(conv, store=None):
+    """아카이브된 대화를 messages로 복원 (같은 id). 아카이브가 아니면 아무것도 하지 않음. 복원한 행 수 반환"""
+    if not conv.archive_key:
+        return 0
+    store = store or get_store()
+    key = conv.archive_key
+    _, rows = read_segment(store.get(key))
+
+    with transaction.atomic():
+        locked = Conversation.objects.select_for_update().filter(id=conv.id, archive_key=key).first()
+        if locked is None:
+            return 0  # 다른 요청이 먼저 복원함
+        Message.objects.bulk_create([
+            Message(conversation_id=conv.id, **{f: row.get(f) for f in MESSAGE_FIELDS if f != "created_at"})
+            for row in rows
+        ], ignore_conflicts=True)
+        # created_at은 auto_now_add라 INSERT 시 현재 시각으로 덮이므로 원래 값으로 되돌림
+        for i in range(0, len(rows), 500):
+            chunk = rows[i:i + 500]
+            Message.objects.filter(id__in=[r["id"] for r in chunk]).update(created_at=Case(
+                *[When(id=r["id"], then=Value(parse_datetime(r["created_at"]))) for r in chunk],
+                output_field=DateTimeField(),
+            ))
+        states = [(row["id"], row["state"]) for row in rows if row.get("state") is not None]
+        if states:
+            blobs = []
+            for msg_id, state in states:
+                data, raw_size = encode_state(state)
+                blobs.append(MessageState(message_id=msg_id, data=data, raw_size=raw_size))
+            MessageState.objects.bulk_create(blobs, ignore_conflicts=True)
+        for row in rows:
+            if row.get("rec_runs"):
+                RecRun.objects.filter(id__in=row["rec_runs"], request_msg__isnull=True).update(request_msg_id=row["id"])
+        Conversation.objects.filter(id=conv.id).update(archive_key=None, archived_at=None, rehydrated_at=timezone.now())
+
+    conv.archive_key = None
+    conv.archived_at = None
+    with transaction.atomic():
+        # 그 사이 아카이브 실행이 같은 키로 세그먼트/스텁을 다시 기록했으면 그 세그먼트는 지우지 않음
+        if Conversation.objects.select_for_update().filter(id=conv.id, archive_key=key).first() is None:
+            store.delete(key)
+    return len(rows)
+
+
+def ensure_rehydrated(conversation_id, user_id):
+    """뷰용: 사용자의 대화가 아카이브돼 있으면 복원 (아니면 쿼리 1번)"""
+    conv = Conversation.objects.filter(id=conversation_id, user_id=user_id, archive_key__isnull=False).first()
+    if conv is not None:
+        rehydrate(conv)
@@ -0,0 +1,55 @@
+# scentpick/utils/catalog_version.py
+# 향수 카탈로그 버전 (검색 인덱스 / 필터 facet 캐시 무효화 기준)
+# - Perfume 저장/삭제 시그널이 커밋 후 bump() → 캐시의 버전 키 증가 (공유 캐시면 모든 워커에 반영)
+# - 시그널을 거치지 않는 변경(bulk_create / queryset.update / 직접 SQL)은 updated_at 워터마크로 감지:
+#   워커마다 PERFUME_CATALOG_WATERMARK_INTERVAL초에 한 번 Max(updated_at)(인덱스 조회 1번)을 확인해 바뀌었으면 bump
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+
+from ..models import Perfume
+
+VERSION_KEY = "perfume-catalog:version"
+WATERMARK_KEY = "perfume-catalog:watermark"
+
+_checked_at = 0.0
+_check_lock = threading.Lock()
+
+
+def bump():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 2, None)
+
+
+def watermark():
+    latest = Perfume.objects.aggregate(latest=Max("updated_at"))["latest"]
+    return latest.isoformat() if latest else None
+
+
+def check_watermark(force=False):
+    """updated_at 워터마크가 바뀌었으면 bump. 처음 본 값은 기록만"""
+    global _checked_at
+    interval = getattr(settings, "PERFUME_CATALOG_WATERMARK_INTERVAL", 60.0)
+    if not force and (not interval or time.monotonic() - _checked_at < interval):
+        return
+    with _check_lock:
+        if not force and time.monotonic() - _checked_at < interval:
+            return
+        _checked_at = time.monotonic()
+        mark = watermark()
+        previous = cache.get(WATERMARK_KEY)
+        cache.set(WATERMARK_KEY, mark, None)
+        if previous is not None and previous != mark:
+            bump()
+
+
+def current_version():
+    check_watermark()
+    cache.add(VERSION_KEY, 1, None)
+    return cache.get(VERSION_KEY, 1)
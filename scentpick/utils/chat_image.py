@@ -0,0 +1,146 @@
+# scentpick/utils/chat_image.py
+# 채팅 첨부 이미지 정규화 파이프라인 (uauth.utils의 Pillow 헬퍼 재사용)
+# - 한 번만 디코드 → EXIF 회전 반영 후 메타데이터(EXIF/GPS) 제거
+# - 모델 입력용: 긴 변 max_side 이하로 축소한 WebP(또는 JPEG)
+# - 히스토리 렌더링용: 긴 변 thumb_side 이하 썸네일
+# - S3 입출력 포함 전부 동기 함수 → 뷰에서는 sync_to_async(thread_sensitive=False)로 호출
+# 원본은 그대로 보관하고 모델에는 원본 URL을 바로 넘김. 정규화본/썸네일은 요청과 별개인 백그라운드 태스크에서 만들고,
+# 준비되면 Message.chat_image를 정규화본으로 바꾸고 chat_image_variants에 전체 URL 기록 (그 전까지 히스토리는 원본)
+
+import io
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+
+from uauth.utils import _ensure_pillow, _open_image, _to_rgb
+
+# 압축 폭탄 방지용 디코드 픽셀 상한 (약 50MP)
+MAX_PIXELS = 50_000_000
+
+CONTENT_TYPES = {"WEBP": "image/webp", "JPEG": "image/jpeg"}
+EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg"}
+
+
+def _encode(img, fmt, quality):
+    buf = io.BytesIO()
+    if fmt == "WEBP":
+        img.save(buf, format="WEBP", quality=quality, method=4)
+    else:
+        img.save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def normalize_image(file_obj, max_side=1600, thumb_side=320, fmt="WEBP", quality=82):
+    """
+    업로드 이미지 → {"image": bytes, "thumb": bytes, "width", "height", "format"}
+    저장 시 exif를 넘기지 않으므로 결과물에는 메타데이터가 남지 않는다.
+    이미지가 아니거나 너무 크면 ValueError
+    """
+    _ensure_pillow()
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    fmt = fmt.upper()
+    if fmt not in CONTENT_TYPES:
+        raise ValueError(f"지원하지 않는 출력 형식입니다: {fmt}")
+
+    try:
+        img = _open_image(file_obj)
+        if img.width * img.height > MAX_PIXELS:
+            raise ValueError("이미지 해상도가 너무 큽니다.")
+        img.draft("RGB", (max_side, max_side))  # JPEG은 축소 디코드 (메모리/시간 절약)
+        img = ImageOps.exif_transpose(img)
+        img = _to_rgb(img)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError("이미지를 읽을 수 없습니다.") from e
+
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+    main = _encode(img, fmt, quality)
+
+    thumb = img.copy()
+    thumb.thumbnail((thumb_side, thumb_side), Image.LANCZOS)
+    small = _encode(thumb, fmt, quality)
+
+    return {"image": main, "thumb": small, "width": img.width, "height": img.height, "format": fmt}
+
+
+def object_url(key):
+    return f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.{settings.AWS_S3_REGION_NAME}.amazonaws.com/{key}"
+
+
+def variant_key(original_key, name, fmt):
+    """chat_images/1/5/20250101_a.png → chat_images/1/5/20250101_a.<name>.webp"""
+    base = original_key.rsplit(".", 1)[0] if "." in original_key.rsplit("/", 1)[-1] else original_key
+    return f"{base}.{name}.{EXTENSIONS[fmt]}"
+
+
+def output_format():
+    return getattr(settings, "CHAT_IMAGE_FORMAT", "WEBP").upper()
+
+
+def variant_keys(original_key):
+    """store_variants가 쓰게 될 전체 키 (실패 시 정리용)"""
+    fmt = output_format()
+    return [original_key] + [variant_key(original_key, name, fmt) for name in ("image", "thumb")]
+
+
+def check_upload(s3, key, max_bytes, content_types):
+    """
+    presigned POST로 올라온 원본을 쓰기 전에 head_object로 확인 (본문은 내려받지 않음)
+    - 존재 여부, 크기(1B ~ max_bytes), Content-Type(content_types의 키)과 키 확장자 일치
+    반환: (크기, Content-Type). 어긋나면 ValueError
+    """
+    try:
+        head = s3.head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)
+    except ClientError as e:
+        raise ValueError("업로드된 이미지를 찾을 수 없습니다.") from e
+    size = head.get("ContentLength") or 0
+    content_type = (head.get("ContentType") or "").lower()
+    if not 0 < size <= max_bytes:
+        raise ValueError(f"이미지 크기는 {max_bytes // (1024 * 1024)}MB 이하여야 합니다.")
+    if content_type not in content_types or not key.lower().endswith(f".{content_types[content_type]}"):
+        raise ValueError("이미지 형식은 JPG/PNG/GIF/WEBP 만 지원합니다")
+    return size, content_type
+
+
+def upload_original(s3, key, data, content_type=None):
+    """multipart 업로드 경로: 받은 원본 그대로 S3에 저장 (정규화는 store_variants에서 따로)"""
+    s3.upload_fileobj(
+        io.BytesIO(data), settings.AWS_STORAGE_BUCKET_NAME, key,
+        ExtraArgs={"ContentType": content_type or "application/octet-stream"},
+    )
+
+
+def store_variants(s3, original_key, data=None):
+    """
+    원본(original_key)을 기준으로 정규화본/썸네일을 만들어 S3에 올리고 URL 정보를 반환 (백그라운드 태스크에서 호출)
+    - data가 있으면 그 바이트로 처리 (multipart 업로드 경로, 이미 받은 본문)
+    - 없으면 이미 버킷에 있는 원본을 내려받아 처리 (presigned POST 경로)
+    반환: {"urls": {"original", "image", "thumb"}, "width", "height"}. 이미지가 아니면 ValueError
+    """
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    fmt = output_format()
+
+    if data is None:
+        data = s3.get_object(Bucket=bucket, Key=original_key)["Body"].read()
+
+    result = normalize_image(
+        io.BytesIO(data),
+        max_side=getattr(settings, "CHAT_IMAGE_MAX_SIDE", 1600),
+        thumb_side=getattr(settings, "CHAT_IMAGE_THUMB_SIDE", 320),
+        fmt=fmt,
+        quality=getattr(settings, "CHAT_IMAGE_QUALITY", 82),
+    )
+
+    urls = {"original": object_url(original_key)}
+    for name in ("image", "thumb"):
+        key = variant_key(original_key, name, fmt)
+        s3.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=result[name],
+            ContentType=CONTENT_TYPES[fmt],
+            CacheControl="public, max-age=31536000, immutable",
+        )
+        urls[name] = object_url(key)
+
+    return {"urls": urls, "width": result["width"], "height": result["height"]}
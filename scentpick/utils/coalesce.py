@@ -0,0 +1,67 @@
+# scentpick/utils/coalesce.py
+# SSE content 프레임 합치기 (chat_stream_api producer 단계)
+# - 토큰 단위 {"content": "..."} 프레임을 interval초 또는 max_bytes 중 먼저 도달하는 쪽에서 한 프레임으로 합침
+# - content 외 키가 있는 프레임(done, error, conversation_id, perfume_list 등)은 쌓인 content를 먼저 내보낸 뒤 즉시 통과
+# - 타이머는 이벤트 루프 call_later로 처리 (producer가 업스트림을 기다리는 동안 실행됨)
+# - interval <= 0이면 그대로 통과 (타이머 없이 max_bytes만으로 쌓으면 마지막 토큰들이 다음 프레임까지 멈춤)
+
+import asyncio
+import json
+
+
+def content_of(frame):
+    """순수 content 프레임이면 content 문자열, 아니면 None"""
+    if not frame.startswith("data: "):
+        return None
+    try:
+        data = json.loads(frame[6:])
+    except ValueError:
+        return None
+    if isinstance(data, dict) and data.keys() == {"content"} and isinstance(data["content"], str):
+        return data["content"]
+    return None
+
+
+class FrameCoalescer:
+    def __init__(self, sink, interval=0.05, max_bytes=2048):
+        self.sink = sink              # 합쳐진 프레임을 받는 함수 (예: StreamBuffer.append)
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.frames_in = 0
+        self.frames_out = 0
+        self._pending = []
+        self._pending_bytes = 0
+        self._timer = None
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    def push(self, frame):
+        self.frames_in += 1
+        content = content_of(frame) if self.enabled else None
+        if content is None:
+            self.flush()
+            self._emit(frame)
+            return
+        self._pending.append(content)
+        self._pending_bytes += len(content.encode("utf-8"))
+        if self.max_bytes > 0 and self._pending_bytes >= self.max_bytes:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.interval, self.flush)
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        content = "".join(self._pending)
+        self._pending = []
+        self._pending_bytes = 0
+        self._emit(f"data: {json.dumps({'content': content})}\n\n")
+
+    def _emit(self, frame):
+        self.frames_out += 1
+        self.sink(frame)
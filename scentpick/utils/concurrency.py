@@ -0,0 +1,287 @@
+# scentpick/utils/concurrency.py
+# 채팅 요청 동시 실행 제한 (FastAPI 용량 보호)
+# - 사용자별 동시 실행 CHAT_CONCURRENCY_PER_USER, 전체 CHAT_CONCURRENCY_GLOBAL
+# - 자리가 없으면 대기열에서 최대 CHAT_QUEUE_TIMEOUT초 대기, 대기열이 차면 바로 ConcurrencyLimited(→ 429 + Retry-After)
+# - 2단계: 사용자 슬롯을 먼저 잡고(사용자 자신의 요청끼리만 경쟁), 전체 슬롯은 번호표(ticket) 순서대로
+#   → 전체 대기열에는 사용자당 최대 PER_USER개만 들어가므로 한 사용자가 대기열/용량을 독점하지 못함
+# - 상태는 Django 캐시(CHAT_CONCURRENCY_CACHE 별칭)에 TTL 임대(lease) 키로 저장
+#   cache.add 원자성만 사용 → 워커 간 공유(Redis 등), 로컬/테스트는 LocMemCache로 대체 가능
+#   워커가 죽어도 임대는 TTL 후 자동 반환, 스트림이 길면 refresh로 연장
+# rejected/admitted 등 카운터는 워커 프로세스 단위, in_flight/queued는 공유 저장소 기준
+
+import asyncio
+import math
+import random
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+KEY_PREFIX = "chat-cc"
+
+
+class ConcurrencyLimited(Exception):
+    """대기열이 가득 찼거나 대기 시간을 넘김 → 429"""
+
+    def __init__(self, message, retry_after, reason):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class SlotPool:
+    """
+    크기 size의 임대 슬롯 묶음 (<prefix>:<name>:<i> 키, 값은 임대 토큰)
+    빈 슬롯은 get_many 1번으로 찾고 cache.add로 원자적으로 차지
+    """
+
+    def __init__(self, cache, name, size):
+        self.cache = cache
+        self.name = name
+        self.size = size
+
+    def keys(self):
+        return [f"{KEY_PREFIX}:{self.name}:{i}" for i in range(self.size)]
+
+    def held(self):
+        """{key: value} - 현재 임대 중인 슬롯"""
+        return self.cache.get_many(self.keys())
+
+    def try_acquire(self, value, ttl):
+        """빈 슬롯 하나를 차지하고 키 반환 (없으면 None)"""
+        keys = self.keys()
+        held = self.cache.get_many(keys)
+        free = [k for k in keys if k not in held]
+        random.shuffle(free)  # 동시에 들어온 요청끼리 같은 키를 두고 경쟁하지 않도록
+        for key in free:
+            if self.cache.add(key, value, ttl):
+                return key
+        return None
+
+    def release(self, key, value):
+        # 임대가 만료돼 다른 요청이 차지한 슬롯은 지우지 않음
+        if self.cache.get(key) == value:
+            self.cache.delete(key)
+
+
+class Lease:
+    """획득한 실행 슬롯 (사용자 + 전체). release는 여러 번 불러도 안전"""
+
+    def __init__(self, limiter, keys, token):
+        self.limiter = limiter
+        self.keys = keys
+        self.token = token
+        self.acquired_at = time.monotonic()
+        self._refreshed_at = self.acquired_at
+        self._released = False
+
+    def refresh(self):
+        """오래 걸리는 스트림: 임대 TTL의 1/3이 지날 때마다 연장"""
+        now = time.monotonic()
+        if self._released or now - self._refreshed_at < self.limiter.slot_ttl / 3:
+            return
+        self._refreshed_at = now
+        for key in self.keys:
+            self.limiter.cache.touch(key, self.limiter.slot_ttl)
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        cache = self.limiter.cache
+        for key in self.keys:
+            if cache.get(key) == self.token:
+                cache.delete(key)
+
+
+def _advance(steps):
+    """StopIteration은 Future로 넘길 수 없으므로 (끝났는지, 값)으로 변환"""
+    try:
+        return False, next(steps)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+class ConcurrencyLimiter:
+    def __init__(self, cache, per_user=2, global_limit=64, queue_max=128, queue_per_user=2,
+                 queue_timeout=10.0, slot_ttl=300.0, poll_interval=0.05, max_poll_interval=0.5):
+        self.cache = cache
+        self.per_user = per_user
+        self.global_limit = global_limit
+        self.queue_max = queue_max
+        self.queue_per_user = queue_per_user
+        self.queue_timeout = queue_timeout
+        self.slot_ttl = slot_ttl
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.global_slots = SlotPool(cache, "run", global_limit)
+        self.queue = SlotPool(cache, "queue", queue_max)
+        self._stats = {
+            "admitted": 0,
+            "admitted_after_wait": 0,
+            "rejected_user_queue_full": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "waiting": 0,
+        }
+        self._lock = threading.Lock()
+
+    # ---------- 풀 ----------
+    def user_slots(self, user_id):
+        return SlotPool(self.cache, f"user:{user_id}:run", self.per_user)
+
+    def user_queue(self, user_id):
+        return SlotPool(self.cache, f"user:{user_id}:queue", self.queue_per_user)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _waiting(self, delta):
+        with self._lock:
+            self._stats["waiting"] += delta
+
+    @property
+    def retry_after(self):
+        return max(1, math.ceil(self.queue_timeout))
+
+    def _reject(self, reason, message):
+        self._count(f"rejected_{reason}")
+        return ConcurrencyLimited(message, self.retry_after, reason)
+
+    def _queue_ttl(self):
+        return self.queue_timeout + 5   # 대기 중 죽은 워커의 번호표는 이 시간 뒤 사라짐
+
+    # ---------- 한 번 시도 (캐시 호출만, 대기 없음) ----------
+    def _try_user(self, user_id, token):
+        return self.user_slots(user_id).try_acquire(token, self.slot_ttl)
+
+    def _try_global(self, token, ticket=None):
+        """번호표가 있으면 앞선 대기자 수 < 빈 슬롯 수일 때만 시도 (FIFO), 없으면 대기열이 비어 있을 때만"""
+        free = self.global_limit - len(self.global_slots.held())
+        if free <= 0:
+            return None
+        ahead = [t for t in self.queue.held().values() if ticket is None or t < ticket]
+        if len(ahead) >= free:
+            return None
+        return self.global_slots.try_acquire(token, self.slot_ttl)
+
+    def _enqueue(self, pool, reason, message, value):
+        key = pool.try_acquire(value, self._queue_ttl())
+        if key is None:
+            raise self._reject(reason, message)
+        return key
+
+    def _next_ticket(self):
+        self.cache.add(f"{KEY_PREFIX}:ticket", 0, None)
+        return self.cache.incr(f"{KEY_PREFIX}:ticket")
+
+    # ---------- 획득 ----------
+    def _steps(self, user_id):
+        """
+        획득 절차 (캐시 호출만 하고 대기는 호출자에게 맡김): 기다릴 시간(초)을 yield, 끝나면 Lease를 return
+        동기/비동기 뷰가 같은 절차를 time.sleep / asyncio.sleep으로 구동
+        """
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.queue_timeout
+        delay = self.poll_interval
+        queued = []   # [(pool, key, value)] - 끝나면 반환할 대기열 자리
+
+        def wait():
+            nonlocal delay
+            if time.monotonic() >= deadline:
+                raise self._reject("timeout", "채팅 요청이 많아 대기 시간이 초과되었습니다.")
+            sleep = delay * random.uniform(0.5, 1.5)
+            delay = min(self.max_poll_interval, delay * 2)
+            return min(sleep, max(0.0, deadline - time.monotonic()))
+
+        self._waiting(1)
+        try:
+            # 1단계: 사용자 슬롯 (사용자 자신의 요청끼리만 대기)
+            user_key = self._try_user(user_id, token)
+            if user_key is None:
+                pool = self.user_queue(user_id)
+                queued.append((pool, self._enqueue(pool, "user_queue_full", "이미 진행 중인 채팅 요청이 많습니다.", token), token))
+                while user_key is None:
+                    yield wait()
+                    user_key = self._try_user(user_id, token)
+            # 2단계: 전체 슬롯 (번호표 순서)
+            try:
+                global_key = self._try_global(token)
+                if global_key is None:
+                    ticket = self._next_ticket()
+                    queued.append((self.queue, self._enqueue(self.queue, "queue_full", "채팅 요청이 많습니다. 잠시 후 다시 시도해주세요.", ticket), ticket))
+                    while global_key is None:
+                        yield wait()
+                        global_key = self._try_global(token, ticket)
+            except BaseException:
+                self.user_slots(user_id).release(user_key, token)
+                raise
+            self._count("admitted_after_wait" if queued else "admitted")
+            return Lease(self, [user_key, global_key], token)
+        finally:
+            self._waiting(-1)
+            for pool, key, value in queued:
+                pool.release(key, value)
+
+    def acquire(self, user_id):
+        """동기 뷰용 (chat_submit_api) - 대기 중에는 요청 스레드가 잠듦. Lease 반환, 자리가 없으면 ConcurrencyLimited"""
+        steps = self._steps(user_id)
+        try:
+            while True:
+                time.sleep(next(steps))
+        except StopIteration as done:
+            return done.value
+
+    async def aacquire(self, user_id):
+        """async 뷰용 - 캐시 호출은 스레드에서, 대기는 이벤트 루프에서"""
+        steps = self._steps(user_id)
+        step = sync_to_async(_advance, thread_sensitive=False)
+        try:
+            while True:
+                done, value = await step(steps)
+                if done:
+                    return value
+                await asyncio.sleep(value)
+        except asyncio.CancelledError:
+            try:
+                steps.close()   # 대기 중 클라이언트가 끊김 → 대기열/사용자 슬롯 반환
+            except ValueError:
+                pass            # 캐시 호출 도중 취소됨 - 남은 임대는 TTL 후 만료
+            raise
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            "in_flight": len(self.global_slots.held()),
+            "queued": len(self.queue.held()),
+            "global_limit": self.global_limit,
+            "per_user_limit": self.per_user,
+            "queue_max": self.queue_max,
+        })
+        return stats
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """settings 기반 프로세스 공용 ConcurrencyLimiter"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = ConcurrencyLimiter(
+                caches[getattr(settings, "CHAT_CONCURRENCY_CACHE", "default")],
+                per_user=getattr(settings, "CHAT_CONCURRENCY_PER_USER", 2),
+                global_limit=getattr(settings, "CHAT_CONCURRENCY_GLOBAL", 64),
+                queue_max=getattr(settings, "CHAT_QUEUE_MAX", 128),
+                queue_per_user=getattr(settings, "CHAT_QUEUE_PER_USER", 2),
+                queue_timeout=getattr(settings, "CHAT_QUEUE_TIMEOUT", 10.0),
+                slot_ttl=getattr(settings, "CHAT_CONCURRENCY_SLOT_TTL", 300.0),
+            )
+        return _limiter
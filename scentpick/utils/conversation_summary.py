@@ -0,0 +1,97 @@
+# scentpick/utils/conversation_summary.py
+# 사이드바용 대화 요약 필드(Conversation.title / last_message_preview / message_count / last_message_at) 유지
+# - Django에서 저장되는 메시지: post_save 시그널 → apply_message (UPDATE 1~2번, F() 증가)
+# - FastAPI가 DB에 직접 쓰는 메시지: 스트림/응답 완료 후 refresh_summary로 해당 대화만 재계산
+# - 기존 데이터: manage.py backfill_conversation_summaries
+
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+
+from ..models import Conversation, Message
+
+TITLE_LEN = 15      # 기존 사이드바 fallback과 동일 (첫 user 메시지 앞 15자)
+PREVIEW_LEN = 80
+
+
+def make_title(content):
+    return (content or "").strip()[:TITLE_LEN] or None
+
+
+def make_preview(content):
+    return " ".join((content or "").split())[:PREVIEW_LEN]
+
+
+def apply_message(message):
+    """새 메시지 1개를 요약에 반영 (조회 없이 UPDATE만)"""
+    if message.role not in (Message.Role.USER, Message.Role.ASSISTANT):
+        return
+    Conversation.objects.filter(id=message.conversation_id).update(
+        message_count=F("message_count") + 1,
+        last_message_at=message.created_at,
+        last_message_preview=make_preview(message.content),
+    )
+    if message.role == Message.Role.USER and make_title(message.content):
+        # 제목이 아직 없을 때만 첫 user 메시지로 채움
+        Conversation.objects.filter(
+            Q(title__isnull=True) | Q(title=""), id=message.conversation_id
+        ).update(title=make_title(message.content))
+
+
+def _summary_annotations():
+    visible = Message.objects.filter(
+        conversation=OuterRef("pk"), role__in=[Message.Role.USER, Message.Role.ASSISTANT]
+    )
+    return {
+        "_count": Count("messages", filter=Q(messages__role__in=[Message.Role.USER, Message.Role.ASSISTANT])),
+        "_last_at": Max("messages__created_at", filter=Q(messages__role__in=[Message.Role.USER, Message.Role.ASSISTANT])),
+        "_last_content": Subquery(visible.order_by("-created_at", "-id").values("content")[:1]),
+        "_first_user": Subquery(
+            visible.filter(role=Message.Role.USER).order_by("created_at", "id").values("content")[:1]
+        ),
+    }
+
+
+def _apply_annotations(conv):
+    conv.message_count = conv._count
+    conv.last_message_at = conv._last_at
+    conv.last_message_preview = make_preview(conv._last_content) if conv._last_content else None
+    if not conv.title:
+        conv.title = make_title(conv._first_user)
+    return conv
+
+
+SUMMARY_FIELDS = ["title", "message_count", "last_message_at", "last_message_preview"]
+
+
+def refresh_summary(conversation_id):
+    """대화 하나의 요약을 DB 기준으로 다시 계산 (외부에서 쓴 메시지 반영용). 없으면 None"""
+    conv = (
+        Conversation.objects.filter(id=conversation_id)
+        .annotate(**_summary_annotations())
+        .only("id", "title")
+        .first()
+    )
+    if conv is None:
+        return None
+    _apply_annotations(conv)
+    conv.save(update_fields=SUMMARY_FIELDS)
+    return conv
+
+
+def backfill_summaries(batch_size=500, stdout=None):
+    """전체 대화 요약 재계산 (id 순 배치, 배치당 SELECT 1번 + bulk_update). 처리 건수 반환"""
+    done = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Conversation.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .annotate(**_summary_annotations())
+            .only("id", "title")[:batch_size]
+        )
+        if not batch:
+            return done
+        Conversation.objects.bulk_update([_apply_annotations(c) for c in batch], SUMMARY_FIELDS)
+        done += len(batch)
+        last_id = batch[-1].id
+        if stdout:
+            stdout.write(f"  ... {done}건 (id ≤ {last_id})")
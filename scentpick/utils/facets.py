@@ -0,0 +1,54 @@
+# scentpick/utils/facets.py
+# /perfumes/ 좌측 필터(브랜드/농도/성별/메인어코드) 값 목록 + 값별 향수 수
+# - 카탈로그 버전(scentpick.utils.catalog_version)별로 캐시에 저장 → 평소 요청은 캐시 조회만 (카탈로그 스캔 없음)
+# - 버전이 바뀐 뒤 첫 요청에서만 다시 계산 (GROUP BY 4번, 어코드는 정규화 테이블 perfume_accords)
+# 수는 카탈로그 전체 기준 (현재 선택한 필터와 무관)
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from ..models import Accord, Perfume
+from .catalog_version import current_version
+
+FACETS_KEY = "perfume-facets"
+
+
+def parse_accords(raw):
+    """main_accords (리스트 또는 "['우디', '머스크']" 같은 문자열) → 어코드 리스트"""
+    if not raw:
+        return []
+    if isinstance(raw, list):
+        parts = [str(p).strip() for p in raw if p]
+    else:
+        cleaned = str(raw).strip("[]").replace("'", "").replace('"', "")
+        parts = [p.strip() for p in cleaned.split(",") if p.strip()]
+    return [p for p in parts if p and p not in ["/", "-", "_"]]
+
+
+def _grouped(field, exclude_empty=True):
+    qs = Perfume.objects.all()
+    if exclude_empty:
+        qs = qs.exclude(**{field: ""})
+    rows = qs.values_list(field).annotate(n=Count("id")).order_by(field)
+    return [{"value": value, "count": n} for value, n in rows]
+
+
+def compute_facets():
+    accords = Accord.objects.values_list("name").annotate(n=Count("perfume_id")).order_by("name")
+    return {
+        "brands": _grouped("brand", exclude_empty=False),
+        "concentrations": _grouped("concentration"),
+        "genders": _grouped("gender"),
+        "accords": [{"value": name, "count": n} for name, n in accords],
+    }
+
+
+def get_facets():
+    """현재 카탈로그 버전의 facet (없으면 계산해서 저장)"""
+    key = f"{FACETS_KEY}:{current_version()}"
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets()
+        cache.set(key, facets, getattr(settings, "PERFUME_FACETS_TTL", 24 * 3600))
+    return facets
@@ -0,0 +1,135 @@
+# scentpick/utils/fake_backend.py
+# 로컬 성능 측정용 FastAPI 챗봇 대역 (별도 스레드의 asyncio HTTP/1.1 서버)
+# - POST .../stream : chat_stream_api가 기대하는 SSE ({"content"} 프레임 … {"done", "conversation_id", "perfume_list"})
+# - POST 그 외 경로  : chat_submit_api가 기대하는 JSON ({"conversation_id", "final_answer", "perfume_list"})
+# - 토큰 속도 / 첫 토큰 지연 / 실패(HTTP 500) / 스트림 중간 끊김 비율 조절
+# manage.py run_fake_fastapi 로 단독 실행, loadtest_chat / bench_chat_stream에서 내장 실행
+
+import asyncio
+import itertools
+import json
+import random
+import re
+import threading
+
+WORDS = "시트러스 향이 상쾌하고 잔향은 우디하게 남아 데일리로 쓰기 좋은 향수입니다".split()
+
+
+class FakeChatBackend:
+    def __init__(self, tokens=40, token_interval=0.05, latency=0.0, fail_rate=0.0, drop_rate=0.0,
+                 host="127.0.0.1", port=0, seed=None):
+        self.tokens = tokens                  # 응답당 content 프레임(단어) 수
+        self.token_interval = token_interval  # 프레임 간격(초)
+        self.latency = latency                # 첫 토큰(JSON은 응답 전체) 전 대기(초)
+        self.fail_rate = fail_rate            # 바로 500 응답 비율
+        self.drop_rate = drop_rate            # 스트림 중간에 연결을 끊는 비율
+        self.host = host
+        self.port = port
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "streams": 0, "failed": 0, "dropped": 0}
+        self._conv_ids = itertools.count(100000)
+        self._ready = threading.Event()
+        self._loop = None
+
+    # ---------- 응답 내용 ----------
+    def _words(self):
+        return [WORDS[i % len(WORDS)] for i in range(self.tokens)]
+
+    def _done(self, payload):
+        return {
+            "done": True,
+            "conversation_id": payload.get("conversation_id") or next(self._conv_ids),
+            "perfume_list": [],
+        }
+
+    # ---------- HTTP ----------
+    async def _read_request(self, reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        path = head.split(b" ", 2)[1].decode()
+        m = re.search(rb"content-length:\s*(\d+)", head, re.IGNORECASE)
+        body = await reader.readexactly(int(m.group(1))) if m else b""
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            payload = {}
+        return path, payload
+
+    async def _handle(self, reader, writer):
+        try:
+            path, payload = await self._read_request(reader)
+            self.stats["requests"] += 1
+            if self.random.random() < self.fail_rate:
+                self.stats["failed"] += 1
+                body = b'{"detail": "injected failure"}'
+                writer.write(
+                    b"HTTP/1.1 500 Internal Server Error\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body
+                )
+                await writer.drain()
+                return
+            if path.rstrip("/").endswith("/stream"):
+                await self._stream(writer, payload)
+            else:
+                await self._json(writer, payload)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _stream(self, writer, payload):
+        self.stats["streams"] += 1
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nConnection: close\r\n\r\n")
+        await writer.drain()
+        await asyncio.sleep(self.latency)
+        drop_at = self.random.randrange(self.tokens) if self.tokens and self.random.random() < self.drop_rate else None
+        for i, word in enumerate(self._words()):
+            if i == drop_at:
+                self.stats["dropped"] += 1
+                return
+            writer.write(f"data: {json.dumps({'content': word + ' '})}\n\n".encode())
+            await writer.drain()
+            if self.token_interval:
+                await asyncio.sleep(self.token_interval)
+        writer.write(f"data: {json.dumps(self._done(payload))}\n\n".encode())
+        await writer.drain()
+
+    async def _json(self, writer, payload):
+        await asyncio.sleep(self.latency + self.tokens * self.token_interval)  # 전체 생성 시간 흉내
+        done = self._done(payload)
+        body = json.dumps({
+            "conversation_id": done["conversation_id"],
+            "final_answer": " ".join(self._words()),
+            "perfume_list": done["perfume_list"],
+        }).encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: "
+            + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body
+        )
+        await writer.drain()
+
+    # ---------- 실행 ----------
+    async def serve(self):
+        """현재 이벤트 루프에서 서버 시작 (run_fake_fastapi용). asyncio.Server 반환"""
+        server = await asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+        self.port = server.sockets[0].getsockname()[1]
+        return server
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self.serve())
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self):
+        """별도 스레드에서 시작하고 FASTAPI_CHAT_URL로 쓸 주소 반환"""
+        threading.Thread(target=self._run, daemon=True).start()
+        self._ready.wait()
+        return self.url
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/chat"
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,294 @@
+# scentpick/utils/filter_engine.py
+# /perfumes/ 그리드용 프로세스 내 필터 엔진 (브랜드 × 성별 × 농도 × 어코드 × 노트 × 용량)
+# - 향수마다 위치(0..n-1)를 (brand, name) 정렬 순서대로 부여 → 값마다 비트맵 1개 (Python int, 비트 i = 위치 i)
+# - 같은 facet 안은 OR, facet끼리는 AND → 비트 연산 몇 번 + bit_count()로 건수, 페이지는 set bit 위치 → id
+#   (COUNT + 다중 OR SQL 없이 페이지 행만 in_bulk로 조회)
+# - 카탈로그 버전(scentpick.utils.catalog_version)이 바뀌면 updated_at 워터마크 이후 행만 읽어 증분 반영
+#   새 향수 / 브랜드·이름 변경(정렬 위치가 바뀜) / 삭제가 있으면 백그라운드에서 전체 다시 빌드
+# - 조회 중인 엔진은 수정하지 않음 (증분 반영도 복사본을 만든 뒤 교체)
+
+import bisect
+import time
+from array import array
+
+from ..models import Perfume
+from .facets import parse_accords
+from .perfume_attributes import parse_sizes
+from .perfume_grid import seek_q
+from .versioned_index import VersionedIndex, changed_rows
+
+FACETS = ("brand", "gender", "conc", "accord", "note", "size")
+FIELDS = [
+    "id", "brand", "name", "gender", "concentration", "main_accords",
+    "top_notes", "middle_notes", "base_notes", "sizes", "updated_at",
+]
+CHUNK_BYTES = 512   # 페이지 위치 찾을 때 건너뛰는 단위 (4096비트)
+SEEK_ROWS = 100     # 커서 향수가 없을 때 DB에서 읽어 볼 다음 행 수
+
+
+def _attrs(row):
+    """행 → facet별 값 튜플 (perfumes()의 기존 필터 의미: 성별은 대소문자 무시, 농도는 부분 일치)"""
+    return {
+        "brand": (row["brand"],),
+        "gender": ((row["gender"] or "").lower(),),
+        "conc": (row["concentration"] or "",),
+        "accord": tuple(dict.fromkeys(parse_accords(row["main_accords"]))),
+        # 노트: 레이어 구분 없이 (perfume_attributes.note_filter와 같은 의미)
+        "note": tuple(dict.fromkeys(
+            name[:100] for field in ("top_notes", "middle_notes", "base_notes") for name in parse_accords(row.get(field))
+        )),
+        "size": tuple(parse_sizes(row["sizes"])),
+    }
+
+
+class FilterResult:
+    """Paginator에 그대로 넘길 수 있는 결과 (count() / 슬라이스 → 향수 id 리스트)"""
+
+    def __init__(self, engine, bits):
+        self.engine = engine
+        self.bits = bits
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.bits.bit_count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("FilterResult는 step 없는 슬라이스만 지원")
+        start = key.start or 0
+        stop = self.count() if key.stop is None else min(key.stop, self.count())
+        return self.engine.page(self.bits, start, max(0, stop - start))
+
+
+class FilterEngine:
+    def __init__(self):
+        self.ids = array("q")      # 위치 → 향수 id
+        self.positions = {}        # 향수 id → 위치
+        self.sort_keys = []        # 위치 → (brand, name) - 바뀌면 전체 다시 빌드
+        self.attrs = []            # 위치 → _attrs() (증분 반영 때 이전 값의 비트를 지우는 데 사용)
+        self.bitmaps = {facet: {} for facet in FACETS}
+        self.all_bits = 0
+        self.watermark = None
+        self.version = None
+        self.build_seconds = 0.0
+
+    # ---------- 빌드 / 증분 반영 ----------
+    @classmethod
+    def build(cls, rows, version=None):
+        """rows: FIELDS 키를 가진 dict, (brand, name) 정렬 순서"""
+        started = time.perf_counter()
+        engine = cls()
+        members = {facet: {} for facet in FACETS}   # 값 → 위치 리스트 (마지막에 한 번에 비트맵으로)
+        for pos, row in enumerate(rows):
+            engine.ids.append(row["id"])
+            engine.positions[row["id"]] = pos
+            engine.sort_keys.append((row["brand"], row["name"]))
+            attrs = _attrs(row)
+            engine.attrs.append(attrs)
+            for facet, values in attrs.items():
+                for value in values:
+                    members[facet].setdefault(value, []).append(pos)
+            if row["updated_at"] and (engine.watermark is None or row["updated_at"] > engine.watermark):
+                engine.watermark = row["updated_at"]
+        for facet, by_value in members.items():
+            engine.bitmaps[facet] = {value: _bits(positions) for value, positions in by_value.items()}
+        engine.all_bits = (1 << len(engine.ids)) - 1
+        engine.version = version
+        engine.build_seconds = time.perf_counter() - started
+        return engine
+
+    def copy(self):
+        clone = FilterEngine()
+        clone.ids, clone.positions, clone.sort_keys = self.ids, self.positions, self.sort_keys
+        clone.attrs = list(self.attrs)
+        clone.bitmaps = {facet: dict(by_value) for facet, by_value in self.bitmaps.items()}
+        clone.all_bits, clone.watermark, clone.version = self.all_bits, self.watermark, self.version
+        clone.build_seconds = self.build_seconds
+        return clone
+
+    def can_apply(self, rows, live_count):
+        """행들이 기존 위치의 속성 변경뿐인지 (새 향수/정렬 키 변경/삭제가 없으면 True)"""
+        if live_count != len(self.ids):
+            return False
+        for row in rows:
+            pos = self.positions.get(row["id"])
+            if pos is None or self.sort_keys[pos] != (row["brand"], row["name"]):
+                return False
+        return True
+
+    def apply(self, rows):
+        """can_apply()를 통과한 행들의 비트 갱신 (자기 자신을 수정 - copy()한 엔진에만 호출)"""
+        for row in rows:
+            pos = self.positions[row["id"]]
+            bit = 1 << pos
+            old, new = self.attrs[pos], _attrs(row)
+            for facet in FACETS:
+                by_value = self.bitmaps[facet]
+                for value in set(old[facet]) - set(new[facet]):
+                    by_value[value] &= ~bit
+                    if not by_value[value]:
+                        del by_value[value]
+                for value in set(new[facet]) - set(old[facet]):
+                    by_value[value] = by_value.get(value, 0) | bit
+            self.attrs[pos] = new
+            if row["updated_at"] and (self.watermark is None or row["updated_at"] > self.watermark):
+                self.watermark = row["updated_at"]
+
+    # ---------- 조회 ----------
+    def _union(self, facet, values):
+        by_value = self.bitmaps[facet]
+        bits = 0
+        for value in values:
+            bits |= by_value.get(value, 0)
+        return bits
+
+    def filter_bits(self, brand=(), gender=(), conc=(), accord=(), note=(), size=()):
+        """perfumes()의 선택값 → 결과 비트맵 (빈 facet은 조건 없음)"""
+        bits = self.all_bits
+        if brand:
+            bits &= self._union("brand", brand)
+        if gender:
+            bits &= self._union("gender", {g.lower() for g in gender})
+        if conc:
+            wanted = [c.lower() for c in conc]
+            bits &= self._union("conc", [v for v in self.bitmaps["conc"] if any(c in v.lower() for c in wanted)])
+        if accord:
+            bits &= self._union("accord", accord)
+        if note:
+            bits &= self._union("note", note)
+        if size:
+            bits &= self._union("size", parse_sizes(size))
+        return bits
+
+    def filter(self, **selection):
+        return FilterResult(self, self.filter_bits(**selection))
+
+    def page(self, bits, offset, limit):
+        """bits의 set bit 중 offset번째부터 limit개의 향수 id (정렬 순서)"""
+        return self._take(bits, offset, limit)
+
+    def after(self, bits, cursor, limit):
+        """
+        커서 (brand, name, id) 다음 위치부터 limit개 (커서가 없으면 처음부터) - 무한 스크롤 (OFFSET 없이 위치에서 바로 시작)
+        반환: (id 리스트, 더 있는지)
+        커서 향수가 그 사이 삭제/이름 변경됐으면 _seek()으로 DB에서 위치를 다시 찾음
+        """
+        pos = -1
+        if cursor:
+            brand, name, perfume_id = cursor
+            pos = self.positions.get(perfume_id)
+            if pos is None or self.sort_keys[pos] != (brand, name):
+                pos = self._seek(brand, name, perfume_id)
+        ids = self._take(bits, 0, limit + 1, base=pos + 1)
+        return ids[:limit], len(ids) > limit
+
+    def _seek(self, brand, name, perfume_id):
+        """
+        커서 바로 앞 위치 - 위치 순서는 DB 콜레이션(대소문자/악센트 무시 등) 기준이라 Python 비교(bisect)로는 못 찾음
+        DB에서 커서 다음 행들(perfume_grid.seek_q, 인덱스 범위 조회)을 읽어 엔진에 있는 첫 향수의 위치 - 1
+        """
+        rows = list(
+            Perfume.objects.filter(seek_q(brand, name, perfume_id))
+            .order_by("brand", "name", "id").values_list("id", flat=True)[:SEEK_ROWS]
+        )
+        for pid in rows:
+            pos = self.positions.get(pid)
+            if pos is not None:
+                return pos - 1
+        if len(rows) < SEEK_ROWS:
+            return len(self.ids) - 1     # 커서 뒤에 엔진이 아는 향수가 없음 (끝)
+        # 다음 행들이 모두 엔진 빌드 이후 추가된 향수 (곧 다시 빌드됨) - 문자열 비교로 근사
+        return bisect.bisect_right(self.sort_keys, (brand, name)) - 1
+
+    def _take(self, bits, skip, limit, base=0):
+        """위치 base 이후 set bit 중 skip개를 건너뛰고 limit개의 id"""
+        if base:
+            bits >>= base
+        if limit <= 0 or not bits:
+            return []
+        data = bits.to_bytes((len(self.ids) - base + 7) // 8 or 1, "little")
+        result = []
+        for start in range(0, len(data), CHUNK_BYTES):
+            chunk = data[start:start + CHUNK_BYTES]
+            n = int.from_bytes(chunk, "little").bit_count()
+            if n <= skip:
+                skip -= n
+                continue
+            for i, byte in enumerate(chunk):
+                if not byte:
+                    continue
+                n = byte.bit_count()
+                if n <= skip:
+                    skip -= n
+                    continue
+                for b in range(8):
+                    if byte >> b & 1:
+                        if skip:
+                            skip -= 1
+                            continue
+                        result.append(self.ids[base + (start + i) * 8 + b])
+                        if len(result) == limit:
+                            return result
+        return result
+
+    def keep(self, bits, perfume_ids):
+        """perfume_ids 중 bits에 속한 것만 (순서 유지) - 검색 결과에 필터 적용"""
+        data = bits.to_bytes((len(self.ids) + 7) // 8 or 1, "little")
+        kept = []
+        for pid in perfume_ids:
+            pos = self.positions.get(pid)
+            if pos is not None and data[pos >> 3] >> (pos & 7) & 1:
+                kept.append(pid)
+        return kept
+
+    def stats(self):
+        return {
+            "documents": len(self.ids),
+            "values": {facet: len(by_value) for facet, by_value in self.bitmaps.items()},
+            "version": self.version,
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "build_seconds": round(self.build_seconds, 3),
+        }
+
+
+def _bits(positions):
+    """정렬된 위치 리스트 → 비트맵 int (bytearray로 모아 한 번에 변환)"""
+    buf = bytearray((positions[-1] >> 3) + 1)
+    for pos in positions:
+        buf[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(buf, "little")
+
+
+# ---------- 프로세스 공용 엔진 ----------
+def load_rows():
+    return Perfume.objects.order_by("brand", "name", "id").values(*FIELDS).iterator(chunk_size=2000)
+
+
+def _refresh(engine, version):
+    """버전이 바뀐 엔진 갱신: 워터마크 이후 행이 속성 변경뿐이면 증분, 아니면 None (전체 다시 빌드 필요)"""
+    rows = changed_rows(engine.watermark, FIELDS)
+    if rows is None or not engine.can_apply(rows, Perfume.objects.count()):
+        return None
+    clone = engine.copy()
+    clone.apply(rows)
+    clone.version = version
+    return clone
+
+
+_engine = VersionedIndex(
+    "Perfume filter engine", "🧮", lambda version: FilterEngine.build(load_rows(), version=version), _refresh,
+)
+
+
+def get_filter_engine(wait=False):
+    """
+    현재 필터 엔진. 버전이 바뀌었으면
+    - 속성만 바뀐 경우: 이 요청에서 증분 반영 (인덱스 범위 조회 1번 + COUNT 1번)
+    - 새 향수/삭제/정렬 키 변경: 엔진이 없거나 wait=True면 이 요청에서, 아니면 백그라운드에서 다시 빌드
+    """
+    return _engine.get(wait)
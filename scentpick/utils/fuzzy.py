@@ -0,0 +1,254 @@
+# scentpick/utils/fuzzy.py
+# 브랜드/향수 이름 오타 허용 검색 ('Jo Malon' → Jo Malone, '딥디크' → 딥티크)
+# - 검색어 단위(term): 브랜드 / 이름 / "브랜드 이름" - 소문자, 공백·기호 제거, 한글은 자모로 풀어서 키로 사용
+#   (음절 trigram은 '딥디크'와 '딥티크'가 하나도 겹치지 않지만 자모로 풀면 절반 이상 겹침)
+# - 키 앞뒤에 '#'를 붙인 문자 trigram → term id 포스팅 (array) → 질의 trigram의 포스팅을 세어 공유 trigram 수
+#   유사도 = Dice (2 × 공유 / (질의 trigram + term trigram)), 하한으로 불가능한 term은 미리 제외하고
+#   공유 수 상위 MAX_CANDIDATES개만 점수 계산 → term 점수 순으로 향수 id
+# - 정확 검색(search_index / 이름 일치)이 비었을 때만 호출 (perfumes() 검색, 챗 perfume_list 향수명 해석)
+# - 카탈로그 버전(scentpick.utils.catalog_version)이 바뀌면 updated_at 워터마크 이후 행만 증분 반영
+#   삭제가 있으면 백그라운드에서 전체 다시 빌드 (filter_engine과 같은 방식, 조회 중인 인덱스는 수정하지 않음)
+
+import heapq
+import time
+from array import array
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+
+from ..models import Perfume
+from .typeahead import decompose, normalize
+from .versioned_index import VersionedIndex, changed_rows
+
+FIELDS = ["id", "brand", "name", "updated_at"]
+MIN_KEY_CHARS = 3        # 이보다 짧은 질의(자모 기준)는 오타 검색 안 함 ('조' = ㅈㅗ)
+MAX_KEY_CHARS = 60
+MAX_CANDIDATES = 200     # 점수를 계산할 term 수 상한 (공유 trigram 수 상위)
+MAX_RESULTS = 500
+EMPTY = array("l")
+
+
+def fuzzy_key(text):
+    """'Jo Malone' → 'jomalone', '딥 티크' → 'ㄷㅣㅂㅌㅣㅋㅡ' (공백/기호 제거, 한글은 자모)"""
+    return decompose("".join(ch for ch in normalize(text) if ch.isalnum()))[:MAX_KEY_CHARS]
+
+
+def trigrams(key):
+    padded = f"#{key}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _texts(row):
+    return (row["brand"], row["name"], f"{row['brand']} {row['name']}")
+
+
+class FuzzyIndex:
+    def __init__(self):
+        self.keys = []             # term id → 키
+        self.labels = []           # term id → 원문 (처음 본 표기)
+        self.sizes = array("l")    # term id → trigram 수
+        self.term_docs = []        # term id → 향수 id 튜플 (빌드 때는 (brand, name) 순)
+        self.term_ids = {}         # 키 → term id
+        self.postings = {}         # trigram → term id array
+        self.doc_terms = {}        # 향수 id → term id 튜플 (증분 반영 때 이전 term에서 빼는 데 사용)
+        self.watermark = None
+        self.version = None
+        self.build_seconds = 0.0
+
+    # ---------- 빌드 / 증분 반영 ----------
+    def _new_term(self, key, label):
+        tid = len(self.keys)
+        grams = trigrams(key)
+        self.keys.append(key)
+        self.labels.append(label)
+        self.sizes.append(len(grams))
+        self.term_ids[key] = tid
+        return tid, grams
+
+    def _track(self, row):
+        if row["updated_at"] and (self.watermark is None or row["updated_at"] > self.watermark):
+            self.watermark = row["updated_at"]
+
+    @classmethod
+    def build(cls, rows, version=None):
+        """rows: FIELDS 키를 가진 dict"""
+        started = time.perf_counter()
+        index = cls()
+        postings, docs = defaultdict(list), []
+        for row in rows:
+            tids = []
+            for text in _texts(row):
+                key = fuzzy_key(text)
+                if not key:
+                    continue
+                tid = index.term_ids.get(key)
+                if tid is None:
+                    tid, grams = index._new_term(key, text)
+                    docs.append([])
+                    for gram in grams:
+                        postings[gram].append(tid)
+                if tid not in tids:
+                    tids.append(tid)
+                    docs[tid].append(row["id"])
+            index.doc_terms[row["id"]] = tuple(tids)
+            index._track(row)
+        index.postings = {gram: array("l", tids) for gram, tids in postings.items()}
+        index.term_docs = [tuple(d) for d in docs]
+        index.version = version
+        index.build_seconds = time.perf_counter() - started
+        return index
+
+    def copy(self):
+        clone = FuzzyIndex()
+        clone.keys, clone.labels, clone.sizes = list(self.keys), list(self.labels), array("l", self.sizes)
+        clone.term_docs, clone.term_ids = list(self.term_docs), dict(self.term_ids)
+        clone.postings, clone.doc_terms = dict(self.postings), dict(self.doc_terms)
+        clone.watermark, clone.version, clone.build_seconds = self.watermark, self.version, self.build_seconds
+        return clone
+
+    def apply(self, rows):
+        """새 향수 / 브랜드·이름 변경 반영 (자기 자신을 수정 - copy()한 인덱스에만 호출, 포스팅 array는 새로 만들어 교체)"""
+        for row in rows:
+            pid = row["id"]
+            tids = []
+            for text in _texts(row):
+                key = fuzzy_key(text)
+                if not key:
+                    continue
+                tid = self.term_ids.get(key)
+                if tid is None:
+                    tid, grams = self._new_term(key, text)
+                    self.term_docs.append(())
+                    for gram in grams:
+                        self.postings[gram] = self.postings.get(gram, EMPTY) + array("l", (tid,))
+                if tid not in tids:
+                    tids.append(tid)
+            old = self.doc_terms.get(pid, ())
+            for tid in set(old) - set(tids):
+                self.term_docs[tid] = tuple(p for p in self.term_docs[tid] if p != pid)
+            for tid in tids:
+                if tid not in old:
+                    self.term_docs[tid] += (pid,)
+            self.doc_terms[pid] = tuple(tids)
+            self._track(row)
+
+    # ---------- 조회 ----------
+    def match(self, query, threshold=None):
+        """질의 → [(유사도, term id)] 유사도 내림차순 (향수가 남아 있는 term만)"""
+        if threshold is None:
+            threshold = getattr(settings, "PERFUME_FUZZY_THRESHOLD", 0.45)
+        key = fuzzy_key(query)
+        if len(key) < MIN_KEY_CHARS or not self.keys:
+            return []
+        grams = trigrams(key)
+        counts = Counter()
+        for gram in grams:
+            counts.update(self.postings.get(gram, EMPTY))
+        # Dice ≥ threshold 이려면 공유 수 s ≥ threshold × |질의| / (2 - threshold) (term이 s개뿐일 때가 최대)
+        need = threshold * len(grams) / (2 - threshold)
+        candidates = heapq.nlargest(
+            MAX_CANDIDATES, (item for item in counts.items() if item[1] >= need), key=itemgetter(1),
+        )
+        scored = []
+        for tid, shared in candidates:
+            score = 2 * shared / (len(grams) + self.sizes[tid])
+            if score >= threshold and self.term_docs[tid]:
+                scored.append((score, tid))
+        scored.sort(key=lambda s: (-s[0], self.keys[s[1]]))
+        return scored
+
+    def search(self, query, limit=MAX_RESULTS, threshold=None):
+        """오타 허용 검색 → 향수 id (가장 비슷한 term의 향수부터)"""
+        ranked = {}
+        for _, tid in self.match(query, threshold):
+            for pid in self.term_docs[tid]:
+                ranked.setdefault(pid, None)
+            if len(ranked) >= limit:
+                break
+        return list(ranked)[:limit]
+
+    def suggest(self, query, threshold=None):
+        """가장 비슷한 표기 ('이것을 찾으셨나요?'), 없으면 None"""
+        matched = self.match(query, threshold)
+        return self.labels[matched[0][1]] if matched else None
+
+    def resolve(self, name, brand=None, threshold=None):
+        """
+        향수명(+브랜드) → 향수 id 1개, 가장 비슷한 term이 여러 향수를 가리키거나 동점이면 None
+        (브랜드만 맞은 경우 / 같은 이름이 여러 브랜드에 있는 경우는 해석하지 않음)
+        """
+        if threshold is None:
+            threshold = getattr(settings, "PERFUME_FUZZY_RESOLVE_THRESHOLD", 0.55)
+        matched = self.match(f"{brand} {name}" if brand else name, threshold)
+        if not matched:
+            return None
+        best, tid = matched[0]
+        docs = set(self.term_docs[tid])
+        for score, other in matched[1:]:
+            if score < best:
+                break
+            docs.update(self.term_docs[other])
+        return next(iter(docs)) if len(docs) == 1 else None
+
+    def stats(self):
+        return {
+            "documents": len(self.doc_terms),
+            "terms": len(self.keys),
+            "trigrams": len(self.postings),
+            "postings": sum(len(p) for p in self.postings.values()),
+            "version": self.version,
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "build_seconds": round(self.build_seconds, 3),
+        }
+
+
+# ---------- 프로세스 공용 인덱스 ----------
+def load_rows():
+    return Perfume.objects.order_by("brand", "name", "id").values(*FIELDS).iterator(chunk_size=2000)
+
+
+def _refresh(index, version):
+    """버전이 바뀐 인덱스 갱신: 워터마크 이후 행(추가/변경)만 반영, 삭제가 있으면 None (전체 다시 빌드 필요)"""
+    rows = changed_rows(index.watermark, FIELDS)
+    if rows is None:
+        return None
+    added = sum(1 for row in rows if row["id"] not in index.doc_terms)
+    if Perfume.objects.count() != len(index.doc_terms) + added:
+        return None
+    clone = index.copy()
+    clone.apply(rows)
+    clone.version = version
+    return clone
+
+
+_index = VersionedIndex(
+    "Perfume fuzzy index", "🔎", lambda version: FuzzyIndex.build(load_rows(), version=version), _refresh,
+)
+
+
+def get_fuzzy_index(wait=False):
+    """
+    현재 오타 검색 인덱스. 버전이 바뀌었으면
+    - 추가/변경만 있는 경우: 이 요청에서 증분 반영
+    - 삭제가 있는 경우: 인덱스가 없거나 wait=True면 이 요청에서, 아니면 백그라운드에서 다시 빌드
+    """
+    return _index.get(wait)
+
+
+def resolve_perfume(name, brand=None):
+    """
+    챗 응답의 향수명(+브랜드) → (향수 id, "exact" | "fuzzy"), 못 찾거나 모호하면 None
+    이름(+브랜드) 대소문자 무시 일치가 없을 때만 오타 검색
+    """
+    name, brand = str(name or "").strip(), str(brand or "").strip()
+    if not name:
+        return None
+    qs = Perfume.objects.filter(name__iexact=name)
+    if brand:
+        qs = qs.filter(brand__iexact=brand)
+    ids = list(qs.values_list("id", flat=True)[:2])
+    if ids:
+        return (ids[0], "exact") if len(ids) == 1 else None
+    pid = get_fuzzy_index().resolve(name, brand or None)
+    return (pid, "fuzzy") if pid is not None else None
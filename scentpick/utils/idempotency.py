@@ -0,0 +1,114 @@
+# scentpick/utils/idempotency.py
+# 채팅 전송 멱등성 (Message.idempotency_key)
+# - 클라이언트는 전송마다 키 하나를 만들고 재시도/더블클릭에도 같은 키를 보냄 (Idempotency-Key 헤더 또는 idempotency_key 필드)
+# - 끝난 요청: 키가 찍힌 user 메시지 → 다음 assistant 메시지 + RecRun 추천으로 저장된 답변 재생
+# - 진행 중 요청: 같은 워커의 스트림은 리플레이 버퍼(ReplayRegistry)에 붙고,
+#   다른 워커에서 진행 중인 스트림과 chat_submit_api는 캐시 잠금으로 409 응답
+# FastAPI에도 키를 넘기고(payload["idempotency_key"]), 완료 후 Django가 user 메시지에 키를 다시 찍어 둠
+
+import json
+import re
+
+from django.core.cache import cache
+
+from ..models import Message, RecRun
+from .transcript import load_perfume_lists
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+KEY_RE = re.compile(r"^[A-Za-z0-9_.:-]{8,64}$")   # Message.idempotency_key max_length=64
+LOCK_PREFIX = "chat-idem"
+
+
+def clean_key(value):
+    """빈 값이면 None, 형식이 틀리면 ValueError"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    if not KEY_RE.match(value):
+        raise ValueError("잘못된 idempotency key입니다.")
+    return value
+
+
+def request_key(request, body=None):
+    """헤더 → JSON 본문 → POST 필드 순으로 키 조회"""
+    value = request.headers.get(IDEMPOTENCY_HEADER)
+    if not value and body is not None:
+        value = body.get("idempotency_key")
+    if not value and body is None:
+        value = request.POST.get("idempotency_key")
+    return clean_key(value)
+
+
+def find_answer(user_id, key):
+    """
+    키로 이미 끝난 턴을 찾아 {"conversation_id", "final_answer", "perfume_list"} 반환 (없거나 답변 전이면 None)
+    """
+    question = (
+        Message.objects.filter(idempotency_key=key, role=Message.Role.USER, conversation__user_id=user_id)
+        .only("id", "conversation_id", "created_at")
+        .order_by("-created_at")
+        .first()
+    )
+    if question is None:
+        return None
+    answer = (
+        Message.objects.filter(
+            conversation_id=question.conversation_id,
+            role=Message.Role.ASSISTANT,
+            created_at__gte=question.created_at,
+            id__gt=question.id,
+        )
+        .only("id", "content")
+        .order_by("created_at", "id")
+        .first()
+    )
+    if answer is None:
+        return None
+    run_id = (
+        RecRun.objects.filter(request_msg_id=question.id)
+        .order_by("-created_at")
+        .values_list("id", flat=True)
+        .first()
+    )
+    return {
+        "conversation_id": question.conversation_id,
+        "final_answer": answer.content,
+        "perfume_list": load_perfume_lists([run_id]).get(run_id, []) if run_id else [],
+    }
+
+
+def stamp_key(conversation_id, user_id, key):
+    """완료된 턴의 user 메시지(대화의 최신 user 메시지)에 키 기록. FastAPI가 이미 찍었으면 그대로"""
+    latest = (
+        Message.objects.filter(conversation_id=conversation_id, conversation__user_id=user_id, role=Message.Role.USER)
+        .order_by("-created_at", "-id")
+        .values_list("id", flat=True)
+        .first()
+    )
+    if latest:
+        Message.objects.filter(id=latest, idempotency_key__isnull=True).update(idempotency_key=key)
+
+
+async def answer_frames(answer):
+    """저장된 답변 → 스트림과 같은 모양의 SSE 프레임"""
+    yield f"data: {json.dumps({'content': answer['final_answer']})}\n\n"
+    done = {
+        "done": True,
+        "replayed": True,
+        "conversation_id": answer["conversation_id"],
+        "perfume_list": answer["perfume_list"],
+    }
+    yield f"data: {json.dumps(done)}\n\n"
+
+
+# ---------- 진행 중 잠금 (chat_submit_api / chat_stream_api, 멀티 워커는 공유 캐시 필요) ----------
+def _lock_name(user_id, key):
+    return f"{LOCK_PREFIX}:{user_id}:{key}"
+
+
+def acquire(user_id, key, timeout=120):
+    return cache.add(_lock_name(user_id, key), 1, timeout)
+
+
+def release(user_id, key):
+    cache.delete(_lock_name(user_id, key))
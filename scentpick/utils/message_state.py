@@ -0,0 +1,83 @@
+# scentpick/utils/message_state.py
+# Message.state(LangGraph 스냅샷) → MessageState(zlib 압축) 이동
+# - FastAPI는 계속 messages.state에 인라인으로 쓰므로 offload_message_states를 주기적으로 실행
+# - id 순 배치마다 짧은 트랜잭션 1개 (INSERT message_states + UPDATE messages SET state=NULL)
+#   → 테이블 전체를 오래 잠그지 않음
+
+import json
+import time
+import zlib
+
+from django.db import connection, transaction
+
+from ..models import Message, MessageState
+
+
+def encode_state(state):
+    raw = json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return zlib.compress(raw, 6), len(raw)
+
+
+def decode_state(blob):
+    if blob.codec != "zlib":
+        raise ValueError(f"알 수 없는 state codec: {blob.codec}")
+    return json.loads(zlib.decompress(bytes(blob.data)).decode("utf-8"))
+
+
+def save_blobs(blobs):
+    """
+    MessageState upsert (트랜잭션 안에서 호출)
+    MySQL은 ON DUPLICATE KEY UPDATE에 대상 컬럼을 지정할 수 없음(unique_fields 미지원) → 기존 행 삭제 후 INSERT
+    """
+    if connection.features.supports_update_conflicts_with_target:
+        MessageState.objects.bulk_create(
+            blobs, update_conflicts=True, unique_fields=["message"], update_fields=["codec", "data", "raw_size"]
+        )
+    else:
+        MessageState.objects.filter(message_id__in=[b.message_id for b in blobs]).delete()
+        MessageState.objects.bulk_create(blobs)
+
+
+def offload_batch(after_id=0, batch_size=200):
+    """
+    after_id 다음부터 인라인 state가 있는 메시지 batch_size개를 옮김
+    반환: (마지막 id 또는 None, 옮긴 수, 압축 전 바이트, 압축 후 바이트)
+    """
+    rows = list(
+        Message.objects.filter(id__gt=after_id, state__isnull=False)
+        .order_by("id")
+        .only("id", "state")[:batch_size]
+    )
+    if not rows:
+        return None, 0, 0, 0
+
+    blobs = []
+    raw_total = stored_total = 0
+    for m in rows:
+        data, raw_size = encode_state(m.state)
+        blobs.append(MessageState(message_id=m.id, data=data, raw_size=raw_size))
+        raw_total += raw_size
+        stored_total += len(data)
+
+    ids = [m.id for m in rows]
+    with transaction.atomic():
+        save_blobs(blobs)
+        Message.objects.filter(id__in=ids).update(state=None)
+    return ids[-1], len(rows), raw_total, stored_total
+
+
+def offload_all(batch_size=200, pause=0.0, stdout=None):
+    """인라인 state 전체 이동. pause초씩 쉬면서 배치 반복. 반환: (이동 수, 압축 전 바이트, 압축 후 바이트)"""
+    last_id = 0
+    moved = raw_total = stored_total = 0
+    while True:
+        last_id, n, raw, stored = offload_batch(last_id, batch_size)
+        if not n:
+            return moved, raw_total, stored_total
+        moved += n
+        raw_total += raw
+        stored_total += stored
+        if stdout:
+            stdout.write(f"  ... {moved}건 (id ≤ {last_id}, {raw_total:,}B → {stored_total:,}B)")
+        if pause:
+            time.sleep(pause)
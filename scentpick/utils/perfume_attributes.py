@@ -0,0 +1,108 @@
+# scentpick/utils/perfume_attributes.py
+# Perfume JSON 컬럼(main_accords / top·middle·base_notes / sizes) → Accord / Note / PerfumeSize 행 동기화
+# - 저장 시그널: 해당 향수 1개 (바뀐 JSON 필드가 없으면 건너뜀)
+# - bulk_create / queryset.update / 직접 SQL은 시그널이 없으므로 manage.py backfill_perfume_attributes
+# - 필터 조건(accord_filter / note_filter / size_filter)은 정규화 테이블 서브쿼리 → 인덱스 조인, 결과 중복 없음
+
+import re
+import time
+
+from django.db import transaction
+from django.db.models import Q
+
+from ..models import Accord, Note, Perfume, PerfumeSize
+from .facets import parse_accords
+
+SOURCE_FIELDS = {"main_accords", "top_notes", "middle_notes", "base_notes", "sizes"}
+NOTE_LAYERS = (("top_notes", Note.Layer.TOP), ("middle_notes", Note.Layer.MIDDLE), ("base_notes", Note.Layer.BASE))
+SIZE_RE = re.compile(r"\d+")
+
+
+def parse_sizes(raw):
+    """[30, 50] / ["50ml"] / "30, 100" → 중복 없는 int 리스트 (순서 유지)"""
+    if raw is None:
+        return []
+    values = raw if isinstance(raw, (list, tuple)) else SIZE_RE.findall(str(raw))
+    sizes = []
+    for v in values:
+        m = SIZE_RE.search(str(v))
+        if m and 0 < int(m.group()) < 100000 and int(m.group()) not in sizes:
+            sizes.append(int(m.group()))
+    return sizes
+
+
+def _names(raw, max_length):
+    return list(dict.fromkeys(name[:max_length] for name in parse_accords(raw)))
+
+
+def attribute_rows(perfume):
+    """Perfume 1개 → (Accord 리스트, Note 리스트, PerfumeSize 리스트) - 저장 전 인스턴스"""
+    accords = [
+        Accord(perfume_id=perfume.id, name=name, position=i)
+        for i, name in enumerate(_names(perfume.main_accords, 50))
+    ]
+    notes = [
+        Note(perfume_id=perfume.id, layer=layer, name=name)
+        for field, layer in NOTE_LAYERS
+        for name in _names(getattr(perfume, field), 100)
+    ]
+    sizes = [PerfumeSize(perfume_id=perfume.id, ml=ml) for ml in parse_sizes(perfume.sizes)]
+    return accords, notes, sizes
+
+
+def sync_perfumes(perfumes):
+    """향수들의 정규화 행을 JSON 컬럼 기준으로 다시 씀 (향수 수와 무관하게 DELETE 3번 + INSERT 3번)"""
+    perfumes = list(perfumes)
+    if not perfumes:
+        return 0
+    ids = [p.id for p in perfumes]
+    accords, notes, sizes = [], [], []
+    for p in perfumes:
+        a, n, s = attribute_rows(p)
+        accords += a
+        notes += n
+        sizes += s
+    with transaction.atomic():
+        for model, rows in ((Accord, accords), (Note, notes), (PerfumeSize, sizes)):
+            model.objects.filter(perfume_id__in=ids).delete()
+            model.objects.bulk_create(rows, batch_size=2000)
+    return len(perfumes)
+
+
+def sync_perfume(perfume, update_fields=None):
+    """Perfume post_save용 - update_fields가 JSON 컬럼을 건드리지 않으면 아무것도 안 함"""
+    if update_fields is not None and not SOURCE_FIELDS.intersection(update_fields):
+        return
+    sync_perfumes([perfume])
+
+
+def backfill_all(batch_size=1000, pause=0.0, stdout=None):
+    """전체 카탈로그를 id 순 배치로 동기화 (배치마다 짧은 트랜잭션). 여러 번 실행해도 결과는 같음"""
+    last_id = 0
+    done = 0
+    fields = ["id", *sorted(SOURCE_FIELDS)]
+    while True:
+        batch = list(Perfume.objects.filter(id__gt=last_id).order_by("id").only(*fields)[:batch_size])
+        if not batch:
+            return done
+        done += sync_perfumes(batch)
+        last_id = batch[-1].id
+        if stdout:
+            stdout.write(f"  ... {done}건 (id ≤ {last_id})")
+        if pause:
+            time.sleep(pause)
+
+
+def accord_filter(names):
+    """메인 어코드 중 하나라도 names에 있는 향수 (Perfume.objects.filter(accord_filter(...)))"""
+    return Q(id__in=Accord.objects.filter(name__in=list(names)).values("perfume_id"))
+
+
+def note_filter(names):
+    """탑/미들/베이스 노트 중 하나라도 names에 있는 향수 (자동완성 노트 선택 → /perfumes/?note=)"""
+    return Q(id__in=Note.objects.filter(name__in=list(names)).values("perfume_id"))
+
+
+def size_filter(sizes):
+    """용량(ml) 중 하나라도 sizes에 있는 향수"""
+    return Q(id__in=PerfumeSize.objects.filter(ml__in=list(sizes)).values("perfume_id"))
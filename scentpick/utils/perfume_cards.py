@@ -0,0 +1,110 @@
+# scentpick/utils/perfume_cards.py
+# 채팅 추천 향수 카드 데이터 (id 목록 → 이미지/어코드/농도/용량 + 사용자 즐겨찾기·좋아요 상태)
+# - 향수 수와 무관하게 최대 3번의 쿼리 (향수, 즐겨찾기, 좋아요/싫어요)
+# - /api/perfumes/cards 와 스트림 done 프레임 perfume_list 인라인(CHAT_STREAM_INLINE_CARDS)에서 공용
+# - perfume_list 항목에 id 없이 이름(+브랜드)만 있으면 이름 일치 → 오타 검색(scentpick.utils.fuzzy) 순으로 해석
+
+import json
+
+from ..models import Favorite, FeedbackEvent, Perfume
+from .fuzzy import resolve_perfume
+
+IMAGE_BASE = "https://scentpick-images.s3.ap-northeast-2.amazonaws.com/perfumes"
+MAX_CARDS = 50
+CARD_FIELDS = ["id", "brand", "name", "concentration", "gender", "sizes", "main_accords", "detail_url"]
+
+
+def _as_list(value):
+    """JSON 리스트 필드가 문자열로 저장된 행도 있음 (product_detail과 같은 규칙)"""
+    if not value:
+        return []
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+            return parsed if isinstance(parsed, list) else []
+        except ValueError:
+            return value.split()
+    return []
+
+
+def parse_ids(values):
+    """'1,2,3' 또는 리스트 → 중복 없는 int id 리스트 (순서 유지, 최대 MAX_CARDS개). 형식이 틀리면 ValueError"""
+    if isinstance(values, str):
+        values = [v for v in values.split(",") if v.strip()]
+    ids = []
+    for v in values or []:
+        try:
+            pid = int(v)
+        except (TypeError, ValueError):
+            raise ValueError("잘못된 향수 id입니다.") from None
+        if pid not in ids:
+            ids.append(pid)
+    if len(ids) > MAX_CARDS:
+        raise ValueError(f"한 번에 최대 {MAX_CARDS}개까지 조회할 수 있습니다.")
+    return ids
+
+
+def build_cards(perfume_ids, user=None):
+    """요청한 순서대로 카드 dict 리스트 (없는 id는 빠짐)"""
+    if not perfume_ids:
+        return []
+    perfumes = {p.id: p for p in Perfume.objects.filter(id__in=perfume_ids).only(*CARD_FIELDS)}
+
+    favorites = set()
+    feedback = {}
+    if user is not None and user.is_authenticated and perfumes:
+        favorites = set(
+            Favorite.objects.filter(user=user, perfume_id__in=list(perfumes)).values_list("perfume_id", flat=True)
+        )
+        rows = (
+            FeedbackEvent.objects.filter(user=user, perfume_id__in=list(perfumes), action__in=["like", "dislike"])
+            .order_by("perfume_id", "-created_at")
+            .values_list("perfume_id", "action")
+        )
+        for perfume_id, action in rows:
+            feedback.setdefault(perfume_id, action)   # 향수별 최신 1건
+
+    cards = []
+    for pid in perfume_ids:
+        p = perfumes.get(pid)
+        if p is None:
+            continue
+        cards.append({
+            "id": p.id,
+            "brand": p.brand,
+            "name": p.name,
+            "image_url": f"{IMAGE_BASE}/{p.id}.jpg",
+            "main_accords": _as_list(p.main_accords),
+            "concentration": p.concentration,
+            "gender": p.gender,
+            "sizes": p.sizes or [],
+            "detail_url": p.detail_url,
+            "is_favorite": p.id in favorites,
+            "feedback_status": feedback.get(p.id),
+        })
+    return cards
+
+
+def enrich_perfume_list(perfume_list, user=None):
+    """
+    FastAPI perfume_list 항목에 카드 필드를 합침 (rank/score 등 원래 필드는 유지)
+    id 없이 name(+brand)만 있는 항목은 향수를 찾으면 id와 resolved("exact" | "fuzzy")를 붙여 카드로 합침
+    찾지 못했거나 DB에 없는 항목은 그대로 둠
+    """
+    items, ids = [], []
+    for item in perfume_list or []:
+        if isinstance(item, dict) and not isinstance(item.get("id"), int) and isinstance(item.get("name"), str) \
+                and len(ids) < MAX_CARDS:
+            resolved = resolve_perfume(item["name"], item.get("brand"))
+            if resolved:
+                item = {**item, "id": resolved[0], "resolved": resolved[1]}
+        if isinstance(item, dict) and isinstance(item.get("id"), int) and item["id"] not in ids:
+            ids.append(item["id"])
+        items.append(item)
+    cards = {c["id"]: c for c in build_cards(ids[:MAX_CARDS], user)}
+    return [
+        {**item, **cards[item["id"]]} if isinstance(item, dict) and item.get("id") in cards else item
+        for item in items
+    ]
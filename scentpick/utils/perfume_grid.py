@@ -0,0 +1,102 @@
+# scentpick/utils/perfume_grid.py
+# /perfumes/ 그리드 페이지네이션
+# - Keyset(커서): (brand, name, id) 정렬 기준 마지막 향수 다음부터 → OFFSET 없이 무한 스크롤 (ajax=1&after=커서)
+#   ORM은 uq_perfume_brand_name 인덱스 범위 조회, 필터 엔진/검색은 메모리에서 커서 다음 위치부터
+# - 페이지 번호 위젯의 전체 건수는 (카탈로그 버전, 필터)별로 캐시 → 같은 필터로 페이지를 넘길 때 COUNT(*) 반복 없음
+
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .catalog_version import current_version
+
+COUNT_KEY = "perfume-grid:count"
+
+
+def encode_cursor(perfume):
+    """(brand, name, id) → 불투명 커서 문자열"""
+    raw = json.dumps([perfume.brand, perfume.name, perfume.id], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """불투명 커서 → (brand, name, id). 잘못된 값이면 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        brand, name, perfume_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        return str(brand), str(name), int(perfume_id)
+    except Exception as e:
+        raise ValueError("잘못된 커서입니다.") from e
+
+
+def after_q(cursor):
+    """
+    ORDER BY brand, name, id 에서 커서 다음 행들
+    앞의 brand >= 조건은 의미상 중복이지만 (brand, name) 인덱스 범위 탐색을 가능하게 함 (OR만 있으면 앞에서부터 스캔)
+    """
+    return seek_q(*decode_cursor(cursor))
+
+
+def seek_q(brand, name, perfume_id):
+    """after_q의 디코드된 커서 버전 - 비교는 DB 콜레이션 기준 (필터 엔진의 위치 순서와 같음)"""
+    return Q(brand__gte=brand) & (
+        Q(brand__gt=brand) | Q(name__gt=name) | Q(name=name, id__gt=perfume_id)
+    )
+
+
+def page_after(qs, cursor=None, limit=24):
+    """
+    (brand, name, id) 순으로 커서 다음 limit개
+    반환: (향수 리스트, 다음 페이지 커서 또는 None)
+    """
+    if cursor:
+        qs = qs.filter(after_q(cursor))
+    rows = list(qs.order_by("brand", "name", "id")[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]) if has_more and rows else None
+
+
+def ids_after(ordered_ids, cursor=None, limit=24):
+    """
+    메모리의 정렬된 id 리스트(검색 결과 등)에서 커서 id 다음 limit개
+    커서 향수가 목록에 없으면(그 사이 카탈로그 변경) 빈 결과
+    """
+    start = 0
+    if cursor:
+        perfume_id = decode_cursor(cursor)[2]
+        try:
+            start = ordered_ids.index(perfume_id) + 1
+        except ValueError:
+            return [], False
+    page = ordered_ids[start:start + limit + 1]
+    return page[:limit], len(page) > limit
+
+
+def cached_count(qs, params):
+    """필터 결과 건수 - (카탈로그 버전, 필터 파라미터)별 캐시 (PERFUME_GRID_COUNT_TTL초)"""
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    key = f"{COUNT_KEY}:{current_version()}:{digest}"
+    count = cache.get(key)
+    if count is None:
+        count = qs.count()
+        cache.set(key, count, getattr(settings, "PERFUME_GRID_COUNT_TTL", 300))
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """COUNT(*) 대신 cached_count() 값을 쓰는 Paginator"""
+
+    def __init__(self, object_list, per_page, params, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.params = params
+
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list, self.params)
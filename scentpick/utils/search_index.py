@@ -0,0 +1,202 @@
+# scentpick/utils/search_index.py
+# 향수 카탈로그 검색용 프로세스 내 역색인 (perfumes() 검색창)
+# - 영문/숫자는 단어 단위, 한글은 공백을 무시한 2-gram (1글자 질의는 이름/브랜드/어코드/노트의 1-gram)
+# - 질의의 모든 term을 포함하는 향수만 (AND), 마지막 영문 단어는 접두어로 매칭 (입력 중 AJAX 검색)
+# - 필드 가중치(이름 > 브랜드 > 어코드 > 노트 > 설명) × idf 점수로 정렬
+# - postings는 term → (id array, 점수 array)로 압축 저장, 빌드 후에는 읽기 전용
+# - 카탈로그 버전(scentpick.utils.catalog_version)이 바뀌면 각 워커가 다음 검색 때 백그라운드로 다시 빌드
+#   (scentpick.utils.versioned_index)
+
+import bisect
+import math
+import re
+import sys
+import time
+import unicodedata
+from array import array
+from collections import defaultdict
+
+from django.conf import settings
+
+from ..models import Perfume
+from .versioned_index import VersionedIndex
+
+MAX_PREFIX_TERMS = 64        # 접두어 확장 상한
+PREFIX_PENALTY = 0.8         # 접두어로만 맞은 term은 완전 일치보다 낮게
+FIELD_WEIGHTS = {
+    "name": 5.0,
+    "brand": 4.0,
+    "main_accords": 3.0,
+    "notes": 2.0,
+    "description": 1.0,
+}
+UNIGRAM_FIELDS = {"name", "brand", "main_accords", "notes"}
+
+LATIN_RE = re.compile(r"[a-z0-9]+")
+HANGUL_RE = re.compile(r"[가-힣]+(?:\s+[가-힣]+)*")
+
+
+def normalize(text):
+    return unicodedata.normalize("NFKC", str(text or "")).lower()
+
+
+def hangul_grams(text, unigrams=False):
+    """공백으로 나뉜 한글 구간은 붙여서 2-gram ('조 말론' == '조말론')"""
+    grams = []
+    for run in HANGUL_RE.findall(text):
+        run = "".join(run.split())
+        if len(run) == 1 or unigrams:
+            grams.extend(run)
+        grams.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+def tokenize(text, unigrams=False):
+    text = normalize(text)
+    return LATIN_RE.findall(text) + hangul_grams(text, unigrams)
+
+
+def _field_text(value):
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value if v)
+    if isinstance(value, dict):
+        return " ".join(str(k) for k in value)
+    return str(value or "")
+
+
+def document_fields(p):
+    """Perfume(또는 같은 키의 dict) → {필드: 텍스트}"""
+    get = p.get if isinstance(p, dict) else (lambda k: getattr(p, k))
+    return {
+        "name": get("name"),
+        "brand": get("brand"),
+        "main_accords": _field_text(get("main_accords")),
+        "notes": " ".join(_field_text(get(k)) for k in ("top_notes", "middle_notes", "base_notes")),
+        # 설명은 앞부분만 색인 (메모리 상한, 0이면 설명 제외) - 설명 2-gram이 postings의 대부분
+        "description": (get("description") or "")[:getattr(settings, "PERFUME_SEARCH_DESCRIPTION_CHARS", 1000)],
+    }
+
+
+class SearchIndex:
+    def __init__(self):
+        self.postings = {}     # term → (array 'q' ids, array 'f' 점수)
+        self.vocab = []        # 영문 term 정렬 목록 (접두어 검색용)
+        self.doc_count = 0
+        self.version = None
+        self.built_at = None
+        self.build_seconds = 0.0
+        self.memory_bytes = 0
+
+    @classmethod
+    def build(cls, rows, version=None):
+        """rows: document_fields에 넘길 수 있는 향수들 (id 포함)"""
+        started = time.perf_counter()
+        ids = defaultdict(lambda: array("q"))
+        scores = defaultdict(lambda: array("f"))
+        count = 0
+        for p in rows:
+            pid = p["id"] if isinstance(p, dict) else p.id
+            weights = defaultdict(float)
+            for field, text in document_fields(p).items():
+                w = FIELD_WEIGHTS[field]
+                for term in tokenize(text, unigrams=field in UNIGRAM_FIELDS):
+                    weights[term] += w
+            for term, w in weights.items():
+                ids[term].append(pid)
+                scores[term].append(1.0 + math.log(w))   # 같은 필드에 반복돼도 완만하게 증가
+            count += 1
+
+        index = cls()
+        index.postings = {term: (ids[term], scores[term]) for term in ids}
+        index.vocab = sorted(t for t in index.postings if t[0].isascii())
+        index.doc_count = count
+        index.version = version
+        index.built_at = time.time()
+        index.build_seconds = time.perf_counter() - started
+        index.memory_bytes = index.estimate_memory()
+        return index
+
+    def estimate_memory(self):
+        """postings/vocab 대략 메모리 (dict·리스트 슬롯 + term 문자열 + (ids, 점수) 튜플과 array 버퍼, 바이트)"""
+        total = sys.getsizeof(self.postings) + sys.getsizeof(self.vocab)
+        for term, posting in self.postings.items():
+            total += sys.getsizeof(term) + sys.getsizeof(posting) + sum(sys.getsizeof(a) for a in posting)
+        return total
+
+    def _idf(self, df):
+        return math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def _term_scores(self, term):
+        """term 하나 → {id: 점수}"""
+        posting = self.postings.get(term)
+        if posting is None:
+            return {}
+        ids, scores = posting
+        idf = self._idf(len(ids))
+        return {pid: s * idf for pid, s in zip(ids, scores)}
+
+    def _prefix_scores(self, prefix):
+        """영문 접두어 → 매칭되는 term 중 향수별 최고 점수 (완전 일치 외에는 PREFIX_PENALTY)"""
+        start = bisect.bisect_left(self.vocab, prefix)
+        result = {}
+        for term in self.vocab[start:start + MAX_PREFIX_TERMS]:
+            if not term.startswith(prefix):
+                break
+            factor = 1.0 if term == prefix else PREFIX_PENALTY
+            for pid, s in self._term_scores(term).items():
+                if s * factor > result.get(pid, 0.0):
+                    result[pid] = s * factor
+        return result
+
+    def search(self, query, limit=None):
+        """관련도 순 향수 id 리스트 (같은 점수는 id 순)"""
+        text = normalize(query)
+        latin = LATIN_RE.findall(text)
+        hangul = hangul_grams(text)
+        if not latin and not hangul:
+            return []
+
+        groups = [self._term_scores(t) for t in dict.fromkeys(latin[:-1] + hangul)]
+        if latin:
+            groups.append(self._prefix_scores(latin[-1]))   # 입력 중인 마지막 단어
+
+        # 가장 짧은 postings부터 교집합
+        groups.sort(key=len)
+        total = dict(groups[0])
+        for group in groups[1:]:
+            if not total:
+                break
+            total = {pid: s + group[pid] for pid, s in total.items() if pid in group}
+
+        ranked = sorted(total.items(), key=lambda kv: (-kv[1], kv[0]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [pid for pid, _ in ranked]
+
+    def stats(self):
+        return {
+            "documents": self.doc_count,
+            "terms": len(self.postings),
+            "postings": sum(len(ids) for ids, _ in self.postings.values()),
+            "memory_mb": round(self.memory_bytes / 2**20, 1),
+            "version": self.version,
+            "build_seconds": round(self.build_seconds, 3),
+        }
+
+
+# ---------- 프로세스 공용 인덱스 ----------
+def load_rows():
+    fields = ["id", "name", "brand", "main_accords", "top_notes", "middle_notes", "base_notes", "description"]
+    return Perfume.objects.values(*fields).iterator(chunk_size=2000)
+
+
+_index = VersionedIndex("Perfume search index", "🔎", lambda version: SearchIndex.build(load_rows(), version=version))
+
+
+def get_search_index(wait=False):
+    """
+    현재 인덱스 반환. 버전이 바뀌었으면
+    - 인덱스가 아직 없거나 wait=True: 이 요청에서 빌드 (5만 건 기준 수 초)
+    - 이미 있으면: 백그라운드 스레드에서 다시 빌드하고 그동안은 이전 인덱스로 응답
+    """
+    return _index.get(wait)
@@ -0,0 +1,208 @@
+# scentpick/utils/stream_buffer.py
+# 채팅 SSE 스트림 재개(Last-Event-ID)용 프로세스 내 리플레이 버퍼
+# - 업스트림(FastAPI) 읽기는 producer 태스크가 버퍼에 쌓고, 응답은 버퍼를 구독만 한다
+# - 클라이언트가 끊겨도 생성은 버퍼에 계속 쌓이므로 재접속 시 마지막으로 받은 프레임 다음부터 이어서 전송
+# - 스트림별 프레임 수/바이트 상한, 스트림 수 상한(LRU), TTL로 메모리 사용량 제한
+#   단, 생성 중인 스트림은 LRU/TTL로 취소하지 않음 (끝난 버퍼와 구독자가 떠난 지 grace가 지난 producer만 정리)
+#   생성 중인 스트림 수는 동시 실행 제한(scentpick.utils.concurrency)이 막으므로 상한을 잠시 넘을 수 있음
+# - 구독자가 모두 끊기고 grace초 안에 재접속이 없으면 producer를 취소 → 업스트림 요청도 즉시 닫힘
+# 버퍼는 워커 프로세스 메모리에 있으므로 다른 워커로 재접속하면 재개할 수 없음 (resume 실패 응답)
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from django.conf import settings
+
+
+class StreamGone(Exception):
+    """재개할 스트림이 없거나(만료/다른 워커) 요청한 위치의 프레임이 이미 버려짐"""
+
+
+def format_event_id(stream_id, seq):
+    return f"{stream_id}:{seq}"
+
+
+def parse_event_id(value):
+    """'<stream_id>:<seq>' → (stream_id, seq). 형식이 틀리면 StreamGone"""
+    try:
+        stream_id, seq = (value or "").strip().rsplit(":", 1)
+        return stream_id, int(seq)
+    except ValueError as e:
+        raise StreamGone("잘못된 Last-Event-ID") from e
+
+
+class StreamBuffer:
+    def __init__(self, user_id, max_frames=4000, max_bytes=512 * 1024, clock=time.monotonic, key=None):
+        self.stream_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.key = key          # 클라이언트 idempotency key (같은 키의 중복 요청은 이 버퍼에 붙음)
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.frames = deque()   # (seq, frame)
+        self.size = 0
+        self.last_seq = 0
+        self.closed = False
+        self.updated_at = clock()
+        self.task = None        # 이 버퍼를 채우는 producer 태스크
+        self.subscribers = 0
+        self.cancelled = False
+        self.detached = False   # 구독자가 있다가 모두 떠남 (재접속하면 False)
+        self._cancel_handle = None
+        self._event = asyncio.Event()
+
+    def append(self, frame):
+        self.last_seq += 1
+        self.frames.append((self.last_seq, frame))
+        self.size += len(frame)
+        # 오래된 프레임부터 버림 (너무 늦은 재개만 실패)
+        while len(self.frames) > self.max_frames or (self.size > self.max_bytes and len(self.frames) > 1):
+            _, old = self.frames.popleft()
+            self.size -= len(old)
+        self._touch()
+
+    def close(self):
+        self.closed = True
+        self._touch()
+
+    def _touch(self):
+        self.updated_at = self.clock()
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    def attach(self):
+        """구독 시작 - 대기 중인 취소 예약이 있으면 해제 (재접속)"""
+        self.subscribers += 1
+        self.detached = False
+        if self._cancel_handle:
+            self._cancel_handle.cancel()
+            self._cancel_handle = None
+
+    def detach(self, grace=0.0):
+        """구독 종료 - 마지막 구독자가 떠났는데 아직 생성 중이면 grace초 뒤 producer 취소"""
+        self.subscribers -= 1
+        if self.subscribers == 0:
+            self.detached = True
+        if self.subscribers > 0 or self.closed or self.task is None:
+            return
+        if grace <= 0:
+            self.cancel()
+        else:
+            self._cancel_handle = asyncio.get_running_loop().call_later(grace, self.cancel)
+
+    def cancel(self):
+        self._cancel_handle = None
+        if self.subscribers == 0 and self.task is not None and not self.task.done():
+            self.cancelled = True
+            self.task.cancel()
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    @property
+    def orphaned(self):
+        """구독자가 모두 떠났고 grace 취소 예약도 없는데 producer가 남아 있음 (재접속을 기다리지 않아도 됨)"""
+        return self.running and self.subscribers == 0 and self.detached and self._cancel_handle is None
+
+    def _frames_after(self, seq):
+        if self.frames and self.frames[0][0] > seq + 1:
+            raise StreamGone("재개 위치의 프레임이 이미 버려졌습니다.")
+        return [(s, f) for s, f in self.frames if s > seq]
+
+    async def subscribe(self, after=0, heartbeat=None):
+        """
+        after 다음 프레임부터 (seq, frame)을 순서대로. 스트림이 끝나면 종료
+        heartbeat초 동안 새 프레임이 없으면 (None, None)을 내보냄 (SSE 주석 ping용)
+        """
+        seq = after
+        while True:
+            event = self._event
+            for s, frame in self._frames_after(seq):
+                yield s, frame
+                seq = s
+            if self.closed and seq >= self.last_seq:
+                return
+            try:
+                await asyncio.wait_for(event.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None, None
+
+
+class ReplayRegistry:
+    def __init__(self, ttl=300.0, max_streams=1000, max_frames=4000, max_bytes=512 * 1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_streams = max_streams
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._streams = OrderedDict()
+        self._keys = {}   # (user_id, idempotency key) → stream_id
+
+    def create(self, user_id, key=None):
+        self.evict(reserve=1)   # 새 버퍼는 producer를 붙이기 전이므로 정리 대상에서 제외
+        buf = StreamBuffer(user_id, self.max_frames, self.max_bytes, clock=self.clock, key=key)
+        self._streams[buf.stream_id] = buf
+        if key:
+            self._keys[(user_id, key)] = buf.stream_id
+        return buf
+
+    def find(self, user_id, key):
+        """같은 idempotency key로 만든 스트림 (진행 중이거나 아직 만료되지 않은 것). 없으면 None"""
+        self.evict()
+        stream_id = self._keys.get((user_id, key))
+        if stream_id is None:
+            return None
+        self._streams.move_to_end(stream_id)
+        return self._streams[stream_id]
+
+    def get(self, stream_id, user_id):
+        self.evict()
+        buf = self._streams.get(stream_id)
+        if buf is None or buf.user_id != user_id:
+            raise StreamGone("재개할 스트림이 없습니다.")
+        self._streams.move_to_end(stream_id)
+        return buf
+
+    def evict(self, reserve=0):
+        """만료(TTL) → 스트림 수 상한(LRU, reserve개 자리 확보) 순으로 정리. 생성 중인 스트림은 건드리지 않음"""
+        now = self.clock()
+        for sid, buf in list(self._streams.items()):
+            if now - buf.updated_at > self.ttl and self._evictable(buf):
+                self._drop(sid)
+        excess = len(self._streams) + reserve - self.max_streams
+        if excess > 0:
+            for sid in [sid for sid, buf in self._streams.items() if self._evictable(buf)][:excess]:
+                self._drop(sid)
+
+    @staticmethod
+    def _evictable(buf):
+        return not buf.running or buf.orphaned
+
+    def _drop(self, stream_id):
+        buf = self._streams.pop(stream_id)
+        if buf.key and self._keys.get((buf.user_id, buf.key)) == stream_id:
+            del self._keys[(buf.user_id, buf.key)]
+        if buf.orphaned:
+            buf.cancelled = True
+            buf.task.cancel()
+
+    def __len__(self):
+        return len(self._streams)
+
+
+_registry = None
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        _registry = ReplayRegistry(
+            ttl=getattr(settings, "CHAT_STREAM_REPLAY_TTL", 300.0),
+            max_streams=getattr(settings, "CHAT_STREAM_REPLAY_MAX_STREAMS", 1000),
+            max_frames=getattr(settings, "CHAT_STREAM_REPLAY_MAX_FRAMES", 4000),
+            max_bytes=getattr(settings, "CHAT_STREAM_REPLAY_MAX_BYTES", 512 * 1024),
+        )
+    return _registry
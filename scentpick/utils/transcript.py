@@ -0,0 +1,127 @@
+# scentpick/utils/transcript.py
+# 대화 기록(메시지 + 추천 향수 리스트)을 고정된 쿼리 수로 조립하는 유틸
+
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+from ..models import RecRun, RecCandidate
+
+
+def _pick_runs(messages, runs):
+    """
+    assistant 메시지마다 "request_msg가 이 메시지 이전에 작성된 RecRun 중 가장 최근 것"을 고른다.
+    기존 뷰의 RecRun.objects.filter(request_msg__created_at__lte=m.created_at).order_by('-created_at').first()
+    와 동일한 규칙을 메모리에서 한 번의 스윕으로 처리한다.
+    반환: {message.id: run_id}
+    """
+    runs = sorted(runs, key=lambda r: r["request_msg__created_at"])
+    picked = {}
+    best = None  # (created_at, id)
+    i = 0
+    for m in sorted(messages, key=lambda m: (m.created_at, m.id)):
+        while i < len(runs) and runs[i]["request_msg__created_at"] <= m.created_at:
+            key = (runs[i]["created_at"], runs[i]["id"])
+            if best is None or key > best:
+                best = key
+            i += 1
+        if m.role == "assistant" and best is not None:
+            picked[m.id] = best[1]
+    return picked
+
+
+def load_perfume_lists(run_ids):
+    """run_id 목록 → {run_id: [perfume dict, ...]} (rank 순, 쿼리 1회)"""
+    if not run_ids:
+        return {}
+    candidates = (
+        RecCandidate.objects.filter(run_rec_id__in=set(run_ids))
+        .select_related("perfume")
+        .only("run_rec_id", "rank", "score", "perfume__id", "perfume__brand", "perfume__name")
+        .order_by("run_rec_id", "rank")
+    )
+    result = {}
+    for c in candidates:
+        result.setdefault(c.run_rec_id, []).append({
+            "id": c.perfume.id,
+            "brand": c.perfume.brand,
+            "name": c.perfume.name,
+            "rank": c.rank,
+            "score": c.score,
+        })
+    return result
+
+
+def build_transcript(conversation, messages=None):
+    """
+    대화의 메시지 목록을 추천 데이터와 함께 조립한다.
+
+    메시지 수와 무관하게 최대 3번의 쿼리(메시지, RecRun, RecCandidate+Perfume)만 사용한다.
+    messages를 넘기면 해당 메시지들(예: 페이지 단위)만 조립한다.
+    반환 항목: role, content, created_at(datetime), chat_image, chat_image_thumb, perfume_list(없으면 빈 리스트)
+    """
+    if messages is None:
+        messages = conversation.messages.order_by("created_at")
+    messages = list(messages)
+
+    picked = {}
+    if any(m.role == "assistant" for m in messages):
+        runs = (
+            RecRun.objects.filter(conversation=conversation, request_msg__isnull=False)
+            .values("id", "created_at", "request_msg__created_at")
+        )
+        picked = _pick_runs(messages, list(runs))
+
+    perfume_lists = load_perfume_lists(picked.values())
+
+    items = []
+    for m in messages:
+        items.append({
+            "id": m.id,
+            "role": m.role,
+            "content": m.content,
+            "created_at": m.created_at,
+            "chat_image": getattr(m, "chat_image", None),
+            "chat_image_thumb": ((getattr(m, "chat_image_variants", None) or {}).get("urls") or {}).get("thumb"),
+            "perfume_list": perfume_lists.get(picked.get(m.id), []),
+        })
+    return items
+
+
+# -----------------------------
+# Keyset(커서) 페이지네이션
+# -----------------------------
+def encode_cursor(message):
+    """(created_at, id) → 불투명 커서 문자열"""
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """불투명 커서 → (created_at, id). 잘못된 값이면 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        ts, msg_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(msg_id)
+    except Exception as e:
+        raise ValueError("잘못된 커서입니다.") from e
+
+
+def page_messages(conversation, before=None, limit=30):
+    """
+    최신 메시지부터 limit개를 (conversation, created_at) 인덱스로 잘라온다.
+    before: 이전 페이지가 돌려준 커서 (이 메시지보다 오래된 것만 조회)
+    반환: (시간순으로 정렬된 메시지 리스트, 더 오래된 페이지용 커서 또는 None)
+    """
+    qs = conversation.messages.all()
+    if before:
+        ts, msg_id = decode_cursor(before)
+        qs = qs.filter(Q(created_at__lt=ts) | Q(created_at=ts, id__lt=msg_id))
+    rows = list(qs.order_by("-created_at", "-id")[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_before = encode_cursor(rows[-1]) if has_more else None
+    rows.reverse()
+    return rows, next_before
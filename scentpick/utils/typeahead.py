@@ -0,0 +1,227 @@
+# scentpick/utils/typeahead.py
+# 향수 검색창 자동완성용 프로세스 내 prefix 인덱스 (브랜드 / 향수 이름 / 노트)
+# - 키는 정렬된 배열 + bisect (trie 대신): 단어 시작 위치마다 공백을 뺀 문자열을 키로 등록
+# - 한글은 자모로 풀어서 저장 ('말론' → 'ㅁㅏㄹㄹㅗㄴ') → 입력 중인 '조마'도 '조말론'의 prefix로 매칭
+# - 초성만 입력('ㅈㅁㄹ')하면 별도 초성 키 배열에서 매칭
+# - 노트는 NOTE_TRANSLATIONS / KOREAN_TO_ENGLISH로 한/영 별칭도 키로 등록 ('berg' → 베르가못)
+#   선택하면 /perfumes/?note= (노트 필터 - perfume_notes / filter_engine 노트 비트맵)
+# - 순위: 단어 시작이 아닌 이름 시작에서 맞은 것 우선 → 브랜드 > 노트 > 향수 → 향수 수/즐겨찾기 수
+#   짧은 prefix(SHORT_PREFIX자 이하)는 빌드 때 상위 결과를 미리 계산 → 질의당 bisect 몇 번 + 작은 리스트 병합
+# - 카탈로그 버전(scentpick.utils.catalog_version)이 바뀌면 백그라운드에서 다시 빌드 (search_index와 같은 방식)
+
+import bisect
+import heapq
+import time
+import unicodedata
+from array import array
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from django.db.models import Count
+from django.urls import reverse
+
+from ..models import Favorite, Note, Perfume
+from .note_translations import KOREAN_TO_ENGLISH, NOTE_TRANSLATIONS
+from .versioned_index import VersionedIndex
+
+CHOSUNG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+JUNGSUNG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+JONGSUNG = ["", "ㄱ", "ㄲ", "ㄳ", "ㄴ", "ㄵ", "ㄶ", "ㄷ", "ㄹ", "ㄺ", "ㄻ", "ㄼ", "ㄽ", "ㄾ", "ㄿ", "ㅀ",
+            "ㅁ", "ㅂ", "ㅄ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
+# 겹자모는 기본 자모로 ('닭' = ㄷㅏㄹㄱ → '달ㄱ' 입력 중에도 매칭)
+COMPOUND = {
+    "ㄳ": "ㄱㅅ", "ㄵ": "ㄴㅈ", "ㄶ": "ㄴㅎ", "ㄺ": "ㄹㄱ", "ㄻ": "ㄹㅁ", "ㄼ": "ㄹㅂ", "ㄽ": "ㄹㅅ", "ㄾ": "ㄹㅌ",
+    "ㄿ": "ㄹㅍ", "ㅀ": "ㄹㅎ", "ㅄ": "ㅂㅅ", "ㅘ": "ㅗㅏ", "ㅙ": "ㅗㅐ", "ㅚ": "ㅗㅣ", "ㅝ": "ㅜㅓ", "ㅞ": "ㅜㅔ",
+    "ㅟ": "ㅜㅣ", "ㅢ": "ㅡㅣ",
+}
+KIND_ORDER = {"brand": 0, "note": 1, "perfume": 2}
+SHORT_PREFIX = 3          # 자모/영문 기준 이 길이 이하 prefix는 상위 결과를 미리 계산
+PRECOMPUTED = 20          # prefix별로 미리 계산해 두는 결과 수 (같은 항목의 키 중복 대비 limit보다 넉넉히)
+MAX_KEY_CHARS = 40
+MAX_LIMIT = 20
+
+
+def normalize(text):
+    # NFKC는 호환 자모(ㅈ)를 조합용 자모로 바꾸므로 NFC만 (macOS 입력의 NFD 음절 → 완성형)
+    return unicodedata.normalize("NFC", str(text or "")).lower()
+
+
+def decompose(text):
+    """완성형 한글 → 기본 자모열, 나머지 문자는 그대로"""
+    out = []
+    for ch in text:
+        code = ord(ch) - 0xAC00
+        if 0 <= code < 11172:
+            out.append(CHOSUNG[code // 588])
+            out.append(COMPOUND.get(JUNGSUNG[code % 588 // 28], JUNGSUNG[code % 588 // 28]))
+            out.append(COMPOUND.get(JONGSUNG[code % 28], JONGSUNG[code % 28]))
+        else:
+            out.append(COMPOUND.get(ch, ch))
+    return "".join(out)
+
+
+def chosung(text):
+    """완성형 한글은 초성만, 영문/숫자는 그대로 (공백/기호 제외)"""
+    out = []
+    for ch in text:
+        code = ord(ch) - 0xAC00
+        if 0 <= code < 11172:
+            out.append(CHOSUNG[code // 588])
+        elif ch.isalnum():
+            out.append(ch)
+    return "".join(out)
+
+
+def is_chosung_query(text):
+    return bool(text) and all(ch in CHOSUNG for ch in text)
+
+
+def word_starts(text):
+    """'wood sage & sea salt' → ['woodsage&seasalt', 'sage&seasalt', ...] (이름 시작 여부 포함)"""
+    words = normalize(text).split()
+    return [("".join(words[i:])[:MAX_KEY_CHARS], i == 0) for i in range(len(words))]
+
+
+def note_aliases():
+    """노트명(공백 제거, 소문자) → 다른 언어 이름"""
+    aliases = {}
+    for en, ko in NOTE_TRANSLATIONS.items():
+        aliases.setdefault(normalize(en).replace(" ", ""), ko)
+        aliases.setdefault(normalize(ko).replace(" ", ""), en)
+    for ko, en in KOREAN_TO_ENGLISH.items():
+        aliases.setdefault(normalize(ko).replace(" ", ""), en)
+    return aliases
+
+
+class TypeaheadIndex:
+    def __init__(self):
+        self.entries = []                 # 순위 순 결과 dict
+        # 참조 = 순위 (이름 시작 매칭은 0..n-1, 단어 중간 매칭은 n..2n-1) → 작을수록 앞
+        self.keys, self.refs = [], array("l")              # 자모 키 (정렬) / 참조
+        self.cho_keys, self.cho_refs = [], array("l")      # 초성 키 (정렬) / 참조
+        self.top = {}                     # 짧은 자모 prefix → 미리 계산한 참조 리스트
+        self.cho_top = {}
+        self.version = None
+        self.build_seconds = 0.0
+
+    @classmethod
+    def build(cls, items, version=None):
+        """
+        items: (kind, label, 키로 쓸 텍스트 리스트, weight, 결과 dict)
+        kind 순서 → weight 내림차순 → label 순으로 순위를 매김
+        """
+        started = time.perf_counter()
+        items = sorted(items, key=lambda it: (KIND_ORDER[it[0]], -it[3], it[1]))
+        index = cls()
+        index.entries = [it[4] for it in items]
+        n = len(items)
+        pairs, cho_pairs = [], []
+        for rank, (_, _, texts, _, _) in enumerate(items):
+            seen, cho_seen = set(), set()
+            for text in texts:
+                for key, is_start in word_starts(text):
+                    ref = rank if is_start else n + rank
+                    jamo = decompose(key)
+                    if jamo and jamo not in seen:
+                        seen.add(jamo)
+                        pairs.append((jamo, ref))
+                    cho = chosung(key)
+                    if cho and cho != key and cho not in cho_seen:   # 한글이 있는 키만
+                        cho_seen.add(cho)
+                        cho_pairs.append((cho, ref))
+        pairs.sort()
+        cho_pairs.sort()
+        index.keys = [k for k, _ in pairs]
+        index.refs = array("l", (r for _, r in pairs))
+        index.cho_keys = [k for k, _ in cho_pairs]
+        index.cho_refs = array("l", (r for _, r in cho_pairs))
+        index.top = _precompute(pairs)
+        index.cho_top = _precompute(cho_pairs)
+        index.version = version
+        index.build_seconds = time.perf_counter() - started
+        return index
+
+    def _lookup(self, keys, refs, top, prefix):
+        if len(prefix) <= SHORT_PREFIX:
+            return top.get(prefix, [])
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + "\U0010ffff", lo)
+        return heapq.nsmallest(PRECOMPUTED, refs[lo:hi])
+
+    def search(self, query, limit=8):
+        text = normalize(query).replace(" ", "")
+        if not text or not self.entries:
+            return []
+        refs = self._lookup(self.keys, self.refs, self.top, decompose(text))
+        if is_chosung_query(text):
+            refs = list(refs) + list(self._lookup(self.cho_keys, self.cho_refs, self.cho_top, text))
+        n = len(self.entries)
+        results, seen = [], set()
+        for ref in sorted(refs):
+            if ref % n in seen:
+                continue
+            seen.add(ref % n)
+            results.append(self.entries[ref % n])
+            if len(results) == limit:
+                break
+        return results
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "keys": len(self.keys),
+            "chosung_keys": len(self.cho_keys),
+            "precomputed_prefixes": len(self.top) + len(self.cho_top),
+            "version": self.version,
+            "build_seconds": round(self.build_seconds, 3),
+        }
+
+
+def _precompute(pairs):
+    """정렬된 (키, 참조) → 길이 SHORT_PREFIX 이하 prefix마다 가장 작은 참조 PRECOMPUTED개"""
+    buckets = defaultdict(list)
+    for key, ref in pairs:
+        for size in range(1, min(len(key), SHORT_PREFIX) + 1):
+            bucket = buckets[key[:size]]
+            if len(bucket) < PRECOMPUTED:
+                heapq.heappush(bucket, -ref)
+            elif -bucket[0] > ref:
+                heapq.heapreplace(bucket, -ref)
+    return {prefix: sorted(-r for r in bucket) for prefix, bucket in buckets.items()}
+
+
+def load_items():
+    """카탈로그 → TypeaheadIndex.build()용 항목 (쿼리 4번)"""
+    perfumes_url = reverse("scentpick:perfumes")
+    items = []
+    brands = Perfume.objects.values_list("brand").annotate(n=Count("id"))
+    for brand, n in brands:
+        items.append(("brand", brand, [brand], n, {
+            "type": "brand", "label": brand, "count": n, "url": f"{perfumes_url}?{urlencode({'brand': brand})}",
+        }))
+
+    aliases = note_aliases()
+    for name, n in Note.objects.values_list("name").annotate(n=Count("perfume_id", distinct=True)):
+        alias = aliases.get(normalize(name).replace(" ", ""))
+        items.append(("note", name, [name, alias] if alias else [name], n, {
+            "type": "note", "label": name, "alias": alias, "count": n, "url": f"{perfumes_url}?{urlencode({'note': name})}",
+        }))
+
+    favorites = dict(Favorite.objects.values_list("perfume_id").annotate(n=Count("id")))
+    for pid, brand, name in Perfume.objects.values_list("id", "brand", "name").iterator(chunk_size=2000):
+        items.append(("perfume", name, [name, f"{brand} {name}"], favorites.get(pid, 0), {
+            "type": "perfume", "id": pid, "label": name, "brand": brand,
+            "url": reverse("scentpick:product_detail", args=[pid]),
+        }))
+    return items
+
+
+# ---------- 프로세스 공용 인덱스 ----------
+_index = VersionedIndex(
+    "Perfume typeahead index", "🔤", lambda version: TypeaheadIndex.build(load_items(), version=version),
+)
+
+
+def get_typeahead_index(wait=False):
+    """현재 인덱스 (버전이 바뀌었으면 인덱스가 없거나 wait=True일 때만 이 요청에서 빌드, 아니면 백그라운드)"""
+    return _index.get(wait)
@@ -0,0 +1,287 @@
+# scentpick/utils/upstream.py
+# FastAPI 챗봇 백엔드 호출용 프로세스 공용 클라이언트
+# - 커넥션 풀 + keep-alive (메시지마다 TCP/TLS 새로 열지 않음)
+# - 라우트별 타임아웃 (chat / stream)
+# - 연결 단계 오류만 지터 포함 지수 백오프로 재시도 (요청이 전송되지 않았으므로 POST도 안전)
+# - 서킷 브레이커: 연속 실패 시 즉시 실패 → 뷰가 타임아웃까지 기다리지 않고 바로 mock/에러 응답
+# 모든 수치는 워커 프로세스 단위
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+from django.conf import settings
+
+
+class UpstreamUnavailable(httpx.TransportError):
+    """서킷 브레이커가 열려 있어 요청을 보내지 않고 바로 실패"""
+
+
+# 재시도 대상: 요청 본문이 전송되기 전에 실패한 경우만
+# PoolTimeout(이 워커의 커넥션 풀 대기 초과)은 업스트림 장애가 아니라 로컬 포화 → 재시도하면 대기열만 길어지고
+# 브레이커 실패로 세면 정상 업스트림을 차단하게 되므로 재시도/실패 집계 모두 제외
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class CircuitBreaker:
+    """
+    closed → (연속 실패 threshold회) → open → (reset_timeout초 경과) → half_open
+    half_open에서는 요청 1개만 통과시키고 성공하면 closed, 실패하면 다시 open
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_count = 0
+        self.rejected = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # 결과를 보고하지 못한 probe가 있으면 reset_timeout 후 다시 허용
+            probe_stale = self.clock() - self._probe_started >= self.reset_timeout
+            if self._state == self.HALF_OPEN and (not self._probe_in_flight or probe_stale):
+                self._probe_in_flight = True
+                self._probe_started = self.clock()
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._state = self.CLOSED
+            self._probe_in_flight = False
+
+    def cancel_probe(self):
+        """결과 없이 끝난 probe (로컬 풀 대기 초과 등) → 다음 요청이 바로 다시 probe"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self._state != self.OPEN:
+                    self.opened_count += 1
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+                self._probe_in_flight = False
+
+
+class UpstreamClient:
+    def __init__(
+        self,
+        max_connections=100,
+        max_keepalive=20,
+        keepalive_expiry=30.0,
+        timeouts=None,
+        retries=2,
+        backoff=0.2,
+        breaker=None,
+        transport=None,
+        async_transport=None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeouts = timeouts or {
+            "chat": httpx.Timeout(60.0, connect=3.0, pool=5.0),
+            "stream": httpx.Timeout(120.0, connect=3.0, pool=5.0),
+        }
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._transport = transport
+        self._async_transport = async_transport
+        self._sync_client = None
+        # AsyncClient는 이벤트 루프에 묶이므로 루프별로 하나씩 (UvicornWorker는 워커당 루프 1개)
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+            "pool_timeouts": 0,
+        }
+
+    # ---------- 내부 유틸 ----------
+    def _client(self):
+        with self._lock:
+            if self._sync_client is None:
+                self._sync_client = httpx.Client(limits=self.limits, transport=self._transport)
+            return self._sync_client
+
+    def _aclient(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(limits=self.limits, transport=self._async_transport)
+                self._async_clients[loop] = client
+            return client
+
+    def _bump(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+            if key == "in_flight":
+                self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._stats["in_flight"])
+
+    @contextmanager
+    def _track(self):
+        self._bump("requests")
+        self._bump("in_flight")
+        try:
+            yield
+        finally:
+            self._bump("in_flight", -1)
+
+    def _check_breaker(self, url):
+        if not self.breaker.allow():
+            raise UpstreamUnavailable(f"FastAPI 서킷 브레이커 open: {url}")
+
+    def _delay(self, attempt):
+        """지수 백오프 + full jitter"""
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def _on_error(self, exc):
+        if isinstance(exc, httpx.PoolTimeout):
+            self._bump("pool_timeouts")
+            self.breaker.cancel_probe()
+            return
+        if isinstance(exc, httpx.TransportError):
+            self._bump("failures")
+            self.breaker.record_failure()
+
+    def _on_response(self, response):
+        if response.status_code >= 500:
+            self._bump("failures")
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    # ---------- 공개 API ----------
+    def post_json(self, url, payload, headers=None, route="chat"):
+        """동기 JSON POST (chat_submit_api용). 2xx가 아니면 httpx.HTTPStatusError"""
+        self._check_breaker(url)
+        with self._track():
+            for attempt in range(self.retries + 1):
+                try:
+                    response = self._client().post(
+                        url, json=payload, headers=headers, timeout=self.timeouts[route]
+                    )
+                    break
+                except RETRYABLE_ERRORS as e:
+                    if attempt < self.retries:
+                        self._bump("retries")
+                        time.sleep(self._delay(attempt))
+                        continue
+                    self._on_error(e)
+                    raise
+                except httpx.HTTPError as e:
+                    self._on_error(e)
+                    raise
+            self._on_response(response)
+            response.raise_for_status()
+            return response.json()
+
+    @asynccontextmanager
+    async def stream(self, url, payload, headers=None, route="stream"):
+        """비동기 스트리밍 POST (chat_stream_api용). 응답 헤더까지 받은 httpx.Response를 넘겨줌"""
+        self._check_breaker(url)
+        client = self._aclient()
+        with self._track():
+            for attempt in range(self.retries + 1):
+                try:
+                    request = client.build_request(
+                        "POST", url, json=payload, headers=headers, timeout=self.timeouts[route]
+                    )
+                    response = await client.send(request, stream=True)
+                    break
+                except RETRYABLE_ERRORS as e:
+                    if attempt < self.retries:
+                        self._bump("retries")
+                        await asyncio.sleep(self._delay(attempt))
+                        continue
+                    self._on_error(e)
+                    raise
+                except httpx.HTTPError as e:
+                    self._on_error(e)
+                    raise
+            try:
+                self._on_response(response)
+                response.raise_for_status()
+                yield response
+            finally:
+                await response.aclose()
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        max_conn = self.limits.max_connections
+        stats.update({
+            "max_connections": max_conn,
+            "pool_saturation": round(stats["in_flight"] / max_conn, 3) if max_conn else None,
+            "breaker_state": self.breaker.state,
+            "breaker_failures": self.breaker.failures,
+            "breaker_opened": self.breaker.opened_count,
+            "breaker_rejected": self.breaker.rejected,
+        })
+        return stats
+
+
+_upstream = None
+_upstream_lock = threading.Lock()
+
+
+def get_upstream():
+    """settings 기반 프로세스 공용 UpstreamClient"""
+    global _upstream
+    with _upstream_lock:
+        if _upstream is None:
+            connect = getattr(settings, "FASTAPI_CONNECT_TIMEOUT", 3.0)
+            pool = getattr(settings, "FASTAPI_POOL_TIMEOUT", 5.0)
+            _upstream = UpstreamClient(
+                max_connections=getattr(settings, "FASTAPI_POOL_MAX_CONNECTIONS", 100),
+                max_keepalive=getattr(settings, "FASTAPI_POOL_MAX_KEEPALIVE", 20),
+                timeouts={
+                    "chat": httpx.Timeout(getattr(settings, "FASTAPI_CHAT_TIMEOUT", 60.0), connect=connect, pool=pool),
+                    "stream": httpx.Timeout(getattr(settings, "FASTAPI_STREAM_TIMEOUT", 120.0), connect=connect, pool=pool),
+                },
+                retries=getattr(settings, "FASTAPI_RETRIES", 2),
+                backoff=getattr(settings, "FASTAPI_RETRY_BACKOFF", 0.2),
+                breaker=CircuitBreaker(
+                    threshold=getattr(settings, "FASTAPI_BREAKER_THRESHOLD", 5),
+                    reset_timeout=getattr(settings, "FASTAPI_BREAKER_RESET", 30.0),
+                ),
+            )
+        return _upstream
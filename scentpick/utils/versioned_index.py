@@ -0,0 +1,94 @@
+# scentpick/utils/versioned_index.py
+# 카탈로그 버전(scentpick.utils.catalog_version)을 따라가는 프로세스 공용 인덱스
+# (search_index / filter_engine / typeahead / fuzzy가 같은 방식으로 사용)
+# - 버전이 같으면 현재 인덱스 그대로
+# - 버전이 바뀌면 refresh_fn(증분 반영)을 먼저 시도 → None이면 전체 다시 빌드 필요
+# - 다시 빌드: 인덱스가 없거나 wait=True면 이 요청에서 (동시에 들어온 요청은 기다림),
+#   아니면 백그라운드 스레드에서 빌드하고 그동안은 이전 인덱스로 응답
+# 조회 중인 인덱스는 수정하지 않고 새 객체로 교체 (refresh_fn은 copy()한 인덱스에만 반영)
+# 만든 인덱스는 REGISTRY에 등록 → loaded_stats()로 이 워커에 올라온 인덱스 상태 조회 (metrics_api)
+
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from ..models import Perfume
+from .catalog_version import current_version
+
+REGISTRY = []
+
+
+class VersionedIndex:
+    def __init__(self, label, emoji, build_fn, refresh_fn=None):
+        """
+        build_fn(version) → 새 인덱스 (version 속성, stats() 필요)
+        refresh_fn(index, version) → 증분 반영한 새 인덱스, 전체 다시 빌드가 필요하면 None
+        """
+        self.label = label
+        self.emoji = emoji
+        self.build_fn = build_fn
+        self.refresh_fn = refresh_fn
+        self.current = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()   # 동기 빌드는 한 번에 하나
+        self._rebuilding = threading.Event()
+        REGISTRY.append(self)
+
+    def rebuild(self, version):
+        index = self.build_fn(version)
+        with self._lock:
+            if self.current is None or (self.current.version or 0) <= version:
+                self.current = index
+        print(f"{self.emoji} {self.label} built: {index.stats()}")
+        return index
+
+    def _rebuild_in_background(self, version):
+        try:
+            self.rebuild(version)
+        except Exception as e:
+            print(f"❌ {self.label} rebuild failed: {e}")
+        finally:
+            connection.close()
+            self._rebuilding.clear()
+
+    def get(self, wait=False):
+        version = current_version()
+        index = self.current
+        if index is not None and index.version == version:
+            return index
+        if index is not None:
+            if self.refresh_fn is not None:
+                refreshed = self.refresh_fn(index, version)
+                if refreshed is not None:
+                    with self._lock:
+                        if self.current is index:
+                            self.current = refreshed
+                    return refreshed
+            if not wait:
+                if not self._rebuilding.is_set():
+                    self._rebuilding.set()
+                    threading.Thread(target=self._rebuild_in_background, args=(version,), daemon=True).start()
+                return index
+        with self._build_lock:
+            index = self.current
+            if index is not None and index.version == current_version():
+                return index
+            return self.rebuild(current_version())
+
+
+def changed_rows(watermark, fields):
+    """
+    증분 반영용: updated_at 워터마크 이후 추가/변경된 향수 행 (dict)
+    PERFUME_INDEX_REFRESH_MAX_ROWS개 이상이면 None (증분보다 전체 다시 빌드가 나음)
+    """
+    limit = getattr(settings, "PERFUME_INDEX_REFRESH_MAX_ROWS", 5000)
+    changed = Q(updated_at__gte=watermark) if watermark else Q()
+    rows = list(Perfume.objects.filter(changed).values(*fields)[:limit])
+    return None if len(rows) >= limit else rows
+
+
+def loaded_stats():
+    """이 워커에 빌드돼 있는 인덱스별 stats() (아직 빌드 전인 인덱스는 None, 빌드를 유발하지 않음)"""
+    return {v.label: v.current.stats() if v.current is not None else None for v in REGISTRY}
@@ -1,16 +1,20 @@
 # --- Python 표준 라이브러리 ---
 import os
+import asyncio
 import uuid
 import json
 import re
 import random
+import time
 import imghdr
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
 # --- 외부 라이브러리 ---
 import requests
+import httpx
 import boto3
+from asgiref.sync import sync_to_async
 
 # --- Django 기본 ---
 from django.conf import settings
@@ -43,6 +47,25 @@ from uauth.models import UserDetail
 from uauth.utils import process_profile_image, upload_to_s3_and_get_url
 
 from .utils.note_translations import get_korean_note_name, get_english_note_name
+from .utils.transcript import build_transcript, page_messages
+from .utils.upstream import get_upstream, UpstreamUnavailable
+from .utils.stream_buffer import get_registry, format_event_id, parse_event_id, StreamGone
+from .utils.coalesce import FrameCoalescer
+from .utils.chat_image import check_upload, object_url, store_variants, upload_original, variant_keys
+from .utils.conversation_summary import refresh_summary
+from .utils import idempotency
+from .utils.archive import rehydrate, ensure_rehydrated
+from .utils.concurrency import get_limiter, ConcurrencyLimited
+from .utils import answer_cache
+from .utils.perfume_cards import build_cards, enrich_perfume_list, parse_ids
+from .utils.search_index import get_search_index
+from .utils.facets import get_facets
+from .utils.perfume_attributes import accord_filter, note_filter, size_filter, parse_sizes
+from .utils.filter_engine import FilterResult, get_filter_engine
+from .utils.typeahead import get_typeahead_index, MAX_LIMIT as TYPEAHEAD_MAX_LIMIT
+from .utils.fuzzy import get_fuzzy_index
+from .utils.versioned_index import loaded_stats as index_stats
+from .utils.perfume_grid import CachedCountPaginator, decode_cursor, encode_cursor, ids_after, page_after
 
 # S3 클라이언트 전역 설정
 s3_client = boto3.client(
@@ -61,6 +84,31 @@ def login_view(request):
 def register(request):
     return render(request, "scentpick/register.html")
 
+# 채팅 기록 한 페이지당 메시지 수
+CHAT_PAGE_SIZE = 30
+CHAT_PAGE_SIZE_MAX = 100
+
+
+def _remember_conversation(request, conversation_id):
+    """세션의 현재 대화 id 갱신 - 값이 바뀔 때만 modified 처리 (SessionMiddleware가 바뀐 경우만 저장)"""
+    if request.session.get("conversation_id") != conversation_id:
+        request.session["conversation_id"] = conversation_id
+
+
+async def _aremember_conversation(session, conversation_id):
+    """
+    스트림 종료 후 1회 호출 - 스트리밍 응답은 SessionMiddleware와 별개로 끝나므로 직접 저장
+    request.session을 건드리면 미들웨어 응답 처리와 겹칠 때 한 번 더 저장되므로 같은 키의 별도 store 사용
+    (대화 id는 클라이언트도 들고 다니므로 세션은 새로고침 시 복원용)
+    """
+    if not session.session_key:
+        return
+    store = session.__class__(session.session_key)
+    if await store.aget("conversation_id") != conversation_id:
+        await store.aset("conversation_id", conversation_id)
+        await store.asave()
+
+
 @login_required
 def chat(request):
     """
@@ -75,6 +123,7 @@ def chat(request):
     current_conversation_id = request.GET.get('conversation_id') or request.session.get('conversation_id')
     current_conversation = None
     messages = []
+    messages_before = None
     
     if current_conversation_id:
         try:
@@ -82,47 +131,13 @@ def chat(request):
                 id=current_conversation_id, 
                 user=request.user
             )
-            # 해당 대화의 메시지들 가져오기 (추천 데이터 포함)
-            messages_raw = current_conversation.messages.order_by('created_at')
-            messages = []
-            
-            for m in messages_raw:
-                message_data = {
-                    'role': m.role,
-                    'content': m.content,
-                    'created_at': m.created_at,
-                    'chat_image': getattr(m, 'chat_image', None),  # 안전한 이미지 URL 접근
-                    'perfume_list': []
-                }
-                
-                # assistant 메시지인 경우 관련된 추천 데이터 찾기
-                if m.role == 'assistant':
-                    rec_runs = RecRun.objects.filter(
-                        conversation=current_conversation,
-                        request_msg__created_at__lte=m.created_at
-                    ).order_by('-created_at')
-                    
-                    if rec_runs.exists():
-                        latest_run = rec_runs.first()
-                        candidates = latest_run.candidates.select_related('perfume').order_by('rank')
-                        
-                        perfume_list = []
-                        for candidate in candidates:
-                            perfume_list.append({
-                                'id': candidate.perfume.id,
-                                'brand': candidate.perfume.brand,
-                                'name': candidate.perfume.name,
-                                'rank': candidate.rank,
-                                'score': candidate.score
-                            })
-                        
-                        if perfume_list:
-                            message_data['perfume_list'] = perfume_list
-                
-                messages.append(message_data)
+            rehydrate(current_conversation)  # 아카이브된 대화면 복원
+            # 최신 한 페이지만 가져오기 (이전 메시지는 스크롤 시 API로 로드)
+            page, messages_before = page_messages(current_conversation, limit=CHAT_PAGE_SIZE)
+            messages = build_transcript(current_conversation, page)
             
-            # 세션에 저장
-            request.session['conversation_id'] = current_conversation.id
+            # 세션에 저장 (바뀐 경우만 → 새로고침마다 세션 DB 쓰기 방지)
+            _remember_conversation(request, current_conversation.id)
         except Conversation.DoesNotExist:
             current_conversation_id = None
             messages = []
@@ -132,44 +147,22 @@ def chat(request):
         "current_conversation": current_conversation,
         "current_conversation_id": current_conversation_id,
         "chat_messages": json.dumps(messages, default=str, ensure_ascii=False),  # JSON으로 직렬화
+        "messages_before": messages_before,  # 더 오래된 메시지 페이지 커서
         "SERVICE_TOKEN": SERVICE_TOKEN,
     })
 
-@login_required
-def perfumes(request):
-    q = (request.GET.get("q") or "").strip()
-    brand_sel = request.GET.getlist("brand")
-    size_sel = request.GET.getlist("size")
-    gender_sel = request.GET.getlist("gender")
-    conc_sel = request.GET.getlist("conc")
-    accord_sel = request.GET.getlist("accord")
-
+def _perfume_filter_queryset(brand_sel, size_sel, gender_sel, conc_sel, accord_sel, note_sel=()):
+    """perfumes() 필터의 ORM 버전 (PERFUME_FILTER_ENGINE=0일 때)"""
     qs = Perfume.objects.all()
 
-    if q:
-        qs = qs.filter(
-            Q(name__icontains=q)
-            | Q(brand__icontains=q)
-            | Q(description__icontains=q)
-            | Q(main_accords__icontains=q)
-            | Q(top_notes__icontains=q)
-            | Q(middle_notes__icontains=q)
-            | Q(base_notes__icontains=q)
-        )
-
     if brand_sel:
         qs = qs.filter(brand__in=brand_sel)
 
+    # 용량/어코드: 정규화 테이블(perfume_sizes / perfume_accords) 인덱스 서브쿼리
     if size_sel:
-        size_q = Q()
-        for s in size_sel:
-            try:
-                s_int = int(s)
-                size_q |= Q(sizes__contains=s_int)
-            except ValueError:
-                pass
-        if size_q:
-            qs = qs.filter(size_q)
+        sizes = parse_sizes(size_sel)
+        if sizes:
+            qs = qs.filter(size_filter(sizes))
 
     if gender_sel:
         gq = Q()
@@ -186,17 +179,106 @@ def perfumes(request):
             qs = qs.filter(cq)
 
     if accord_sel:
-        aq = Q()
-        for a in accord_sel:
-            aq |= Q(main_accords__icontains=a)
-        if aq:
-            qs = qs.filter(aq)
+        qs = qs.filter(accord_filter(accord_sel))
+
+    # 노트: 정규화 테이블(perfume_notes) 서브쿼리 (자동완성에서 노트 선택)
+    if note_sel:
+        qs = qs.filter(note_filter(note_sel))
+    return qs
 
-    qs = qs.order_by("brand", "name")
 
-    paginator = Paginator(qs, 24)
+def _decorate_grid_rows(perfumes):
+    """그리드 카드용 accord_list(최대 6개) / image_url 속성 부여"""
+    for p in perfumes:
+        raw = p.main_accords or ""
+        if isinstance(raw, list):
+            toks = [str(t).strip() for t in raw]
+        elif isinstance(raw, str):
+            if "," in raw:
+                toks = [t.strip() for t in raw.split(",")]
+            else:
+                toks = [t.strip() for t in raw.split()]
+        else:
+            toks = []
+        p.accord_list = [t for t in toks if t][:6]
+        p.image_url = f"https://scentpick-images.s3.ap-northeast-2.amazonaws.com/perfumes/{p.id}.jpg"
+
+
+@login_required
+def perfumes(request):
+    q = (request.GET.get("q") or "").strip()
+    brand_sel = request.GET.getlist("brand")
+    size_sel = request.GET.getlist("size")
+    gender_sel = request.GET.getlist("gender")
+    conc_sel = request.GET.getlist("conc")
+    accord_sel = request.GET.getlist("accord")
+    note_sel = request.GET.getlist("note")
+
     page_number = request.GET.get("page")
+    has_filters = bool(brand_sel or size_sel or gender_sel or conc_sel or accord_sel or note_sel)
+    engine = get_filter_engine() if getattr(settings, "PERFUME_FILTER_ENGINE", True) else None
+    if engine is not None:
+        # 필터: 프로세스 내 비트맵 엔진(scentpick.utils.filter_engine) - 건수/페이지 id까지 SQL 없이, 페이지 행만 조회
+        bits = engine.filter_bits(
+            brand=brand_sel, gender=gender_sel, conc=conc_sel, accord=accord_sel, note=note_sel, size=size_sel,
+        )
+    else:
+        qs = _perfume_filter_queryset(brand_sel, size_sel, gender_sel, conc_sel, accord_sel, note_sel)
+
+    ranked = None
+    fuzzy_suggestion = None
+    if q:
+        # 검색어: 역색인(scentpick.utils.search_index)에서 관련도 순 id → 필터 교집합, 페이지 행만 조회
+        ranked = get_search_index().search(q)
+        if not ranked:
+            # 정확 검색 결과가 없으면 브랜드/이름 오타 허용 검색 ('Jo Malon', '딥디크') - scentpick.utils.fuzzy
+            fuzzy = get_fuzzy_index()
+            ranked = fuzzy.search(q)
+            fuzzy_suggestion = fuzzy.suggest(q) if ranked else None
+        if has_filters and engine is not None:
+            ranked = engine.keep(bits, ranked)
+        elif has_filters:
+            allowed = set(qs.filter(id__in=ranked).values_list("id", flat=True)) if len(ranked) <= 1000 \
+                else set(qs.values_list("id", flat=True))
+            ranked = [pid for pid in ranked if pid in allowed]
+
+    # 무한 스크롤 (ajax=1&after=커서): 커서 다음 카드만, OFFSET/COUNT 없음 (scentpick.utils.perfume_grid)
+    after = request.GET.get("after")
+    if after is not None and request.GET.get("ajax") == "1":
+        try:
+            cursor = decode_cursor(after) if after else None
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        if ranked is not None:
+            ids, has_more = ids_after(ranked, after or None, 24)
+        elif engine is not None:
+            ids, has_more = engine.after(bits, cursor, 24)
+        else:
+            ids = None
+            items, next_cursor = page_after(qs, after or None, 24)
+        if ids is not None:
+            rows = Perfume.objects.in_bulk(ids)
+            items = [rows[pid] for pid in ids if pid in rows]
+            next_cursor = encode_cursor(items[-1]) if has_more and items else None
+        _decorate_grid_rows(items)
+        return render(request, "scentpick/perfumes_grid_items.html", {"perfumes": items, "next_cursor": next_cursor})
+
+    if ranked is not None:
+        paginator = Paginator(ranked, 24)
+    elif engine is not None:
+        paginator = Paginator(FilterResult(engine, bits), 24)
+    else:
+        # 전체 건수는 (카탈로그 버전, 필터)별 캐시 → 페이지를 넘길 때마다 COUNT(*) 하지 않음
+        paginator = CachedCountPaginator(qs.order_by("brand", "name", "id"), 24, params={
+            "brand": brand_sel, "size": size_sel, "gender": gender_sel, "conc": conc_sel, "accord": accord_sel,
+            "note": note_sel,
+        })
     page_obj = paginator.get_page(page_number)
+    if ranked is not None or engine is not None:
+        rows = Perfume.objects.in_bulk(page_obj.object_list)
+        page_obj.object_list = [rows[pid] for pid in page_obj.object_list if pid in rows]
+    else:
+        page_obj.object_list = list(page_obj.object_list)
 
     current = page_obj.number
     total = paginator.num_pages
@@ -212,48 +294,7 @@ def perfumes(request):
         else:
             page_range_custom = [1, "..."] + list(range(current - 2, current + 3)) + ["...", total]
 
-    for p in page_obj.object_list:
-        raw = p.main_accords or ""
-        if isinstance(raw, list):
-            toks = [str(t).strip() for t in raw]
-        elif isinstance(raw, str):
-            if "," in raw:
-                toks = [t.strip() for t in raw.split(",")]
-            else:
-                toks = [t.strip() for t in raw.split()]
-        else:
-            toks = []
-        p.accord_list = [t for t in toks if t][:6]
-        p.image_url = f"https://scentpick-images.s3.ap-northeast-2.amazonaws.com/perfumes/{p.id}.jpg"
-
-    brands = Perfume.objects.values_list("brand", flat=True).distinct().order_by("brand")
-    concentrations = (
-        Perfume.objects.exclude(concentration="")
-        .values_list("concentration", flat=True)
-        .distinct()
-        .order_by("concentration")
-    )
-    genders = (
-        Perfume.objects.exclude(gender="")
-        .values_list("gender", flat=True)
-        .distinct()
-        .order_by("gender")
-    )
-
-    raw_accords = Perfume.objects.exclude(main_accords="").values_list("main_accords", flat=True)
-    accord_set = set()
-    for raw in raw_accords:
-        if not raw:
-            continue
-        if isinstance(raw, list):
-            parts = [str(p).strip() for p in raw if p]
-        else:
-            cleaned = str(raw).strip("[]").replace("'", "").replace('"', "")
-            parts = [p.strip() for p in cleaned.split(",") if p.strip()]
-        for p in parts:
-            if p and p not in ["/", "-", "_"]:
-                accord_set.add(p)
-    accords = sorted(accord_set)
+    _decorate_grid_rows(page_obj.object_list)
 
     base_qd = request.GET.copy()
     base_qd.pop("page", True)
@@ -262,23 +303,32 @@ def perfumes(request):
     ctx = {
         "page_obj": page_obj,
         "page_range_custom": page_range_custom,
-        "brands": brands,
-        "concentrations": concentrations,
-        "genders": genders,
-        "accords": accords,
         "selected": {
             "q": q,
             "brand": brand_sel,
             "gender": gender_sel,
             "conc": conc_sel,
             "accord": accord_sel,
+            "note": note_sel,
         },
         "base_qs": base_qs,
+        # 오타 검색으로 찾은 경우 가장 비슷한 브랜드/이름 ('~ 검색 결과' 안내)
+        "fuzzy_suggestion": fuzzy_suggestion,
+        # 무한 스크롤 시작 커서 (이 페이지 마지막 향수 다음부터)
+        "next_cursor": encode_cursor(page_obj.object_list[-1]) if page_obj.has_next() and page_obj.object_list else None,
     }
 
     if request.GET.get("ajax") == "1":
         return render(request, "scentpick/perfumes_grid.html", ctx)
-    
+
+    # 좌측 필터 값 목록 + 값별 향수 수 (카탈로그 버전별 캐시, scentpick.utils.facets) - AJAX 그리드 응답에는 불필요
+    facets = get_facets()
+    ctx.update({
+        "brands": facets["brands"],
+        "concentrations": facets["concentrations"],
+        "genders": facets["genders"],
+        "accords": facets["accords"],
+    })
     return render(request, "scentpick/perfumes.html", ctx)
 
 @login_required
@@ -474,13 +524,6 @@ def fetch_weather_simple(city="Seoul", lat=None, lon=None):
 # DB 조회 / 이미지 URL 부여
 # =======================
 def query_perfumes_by_accords(accords, limit=8, gender=None):
-    from django.db.models import Q
-    
-    # 어코드 조건 구성
-    accord_q = Q()
-    for a in accords:
-        accord_q |= Q(main_accords__contains=[a])
-    
     # 성별 조건 추가
     def apply_gender_filter(base_query):
         if gender and gender in ['Male', 'Female']:
@@ -493,24 +536,10 @@ def query_perfumes_by_accords(accords, limit=8, gender=None):
             # gender가 None이면 성별 필터링 없음
             return base_query
     
-    try:
-        # JSONField 방식으로 시도
-        base_qs = Perfume.objects.filter(accord_q)
-        qs = apply_gender_filter(base_qs)[:limit]
-        
-        if qs.exists():
-            return list(qs)
-    except Exception:
-        pass  # TextField(JSON 문자열) fallback
-    
-    # TextField fallback
-    accord_q = Q()
-    for a in accords:
-        accord_q |= Q(main_accords__icontains=f'"{a}"')
-    
-    base_qs = Perfume.objects.filter(accord_q)
+    # 어코드 조건: perfume_accords 인덱스 서브쿼리 (JSON/TEXT 저장 방식과 무관)
+    base_qs = Perfume.objects.filter(accord_filter(accords))
     qs = apply_gender_filter(base_qs)[:limit]
-    
+
     return list(qs)
 
 def attach_image_urls(perfumes_iter):
@@ -574,7 +603,7 @@ def filter_worldcup_candidates(gender_ko: str, accord_ko: str, time_pref: str, n
     """
     성별/메인어코드/낮밤 선택으로 Perfume 후보 8개 뽑기
     - 성별: 남성→Male+Unisex, 여성→Female+Unisex, 남녀공용→Unisex
-    - 메인어코드: JSONField or TEXT(JSON문자열) 모두 대응
+    - 메인어코드: perfume_accords 정규화 테이블 (JSON 저장 방식과 무관)
     - 낮/밤: 점수 높은 순으로 정렬 후 상위 need개
     """
     # 성별 매핑
@@ -587,16 +616,8 @@ def filter_worldcup_candidates(gender_ko: str, accord_ko: str, time_pref: str, n
         g_filter = ["Unisex"]
 
     # 메인어코드 조건
-    q = Q(gender__in=g_filter)
-    try:
-        q &= Q(main_accords__contains=[accord_ko])
-        base = Perfume.objects.filter(q)[:200]
-        if not base:
-            raise ValueError
-    except Exception:
-        # TEXT 저장 fallback (JSON 문자열)
-        q &= (Q(main_accords__icontains=f'"{accord_ko}"') | Q(main_accords__icontains=accord_ko))
-        base = Perfume.objects.filter(q)[:200]
+    q = Q(gender__in=g_filter) & accord_filter([accord_ko])
+    base = Perfume.objects.filter(q)[:200]
 
     # 낮/밤 점수로 정렬
     key = "day" if time_pref == "day" else "night"
@@ -748,15 +769,28 @@ FASTAPI_CHAT_URL = os.environ.get("FASTAPI_CHAT_URL")
 SERVICE_TOKEN = os.environ.get("SERVICE_TOKEN")
 
 
+def _limited_response(e):
+    """동시 실행 제한 초과 → 429 + Retry-After"""
+    response = JsonResponse({"error": str(e), "reason": e.reason, "retry_after": e.retry_after}, status=429)
+    response["Retry-After"] = str(e.retry_after)
+    return response
+
+
 @login_required 
 @require_POST
 def chat_submit_api(request):
     """
     사용자가 메세지 전송 시 user_id와 query만 fastapi로 전송하고,
     chatbot.py로 fastapi에서 conversations db를 작성해서 django가 db를 읽어서 띄워주는 방식
+    Idempotency-Key(또는 idempotency_key)가 같은 재요청은 FastAPI를 다시 부르지 않음
+    사용자별/전체 동시 실행 제한을 넘으면 잠시 대기 후 429
+    새 대화의 첫 질문은 답변 캐시(CHAT_ANSWER_CACHE_ENABLED)에서 바로 응답할 수 있음
     """
+    idem_key = None
+    lease = None
     try:
         # JSON 요청 처리
+        body = None
         if request.content_type == 'application/json':
             body = json.loads(request.body.decode("utf-8"))
             content = (body.get("content") or body.get("query") or "").strip()
@@ -769,31 +803,75 @@ def chat_submit_api(request):
         if not content:
             return JsonResponse({"error": "내용이 비었습니다."}, status=400)
 
+        try:
+            key = idempotency.request_key(request, body)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        # 멱등성: 이미 끝난 요청이면 저장된 답변 재생, 아직 처리 중이면 409 (클라이언트가 잠시 후 재시도)
+        if key:
+            answer = idempotency.find_answer(request.user.id, key)
+            if answer:
+                return JsonResponse({**answer, "success": True, "replayed": True})
+            timeout = getattr(settings, "FASTAPI_CHAT_TIMEOUT", 60.0) * 2
+            if not idempotency.acquire(request.user.id, key, timeout=timeout):
+                response = JsonResponse({"error": "같은 요청을 처리하고 있습니다."}, status=409)
+                response["Retry-After"] = "1"
+                return response
+            idem_key = key
+
+        # 답변 캐시: 같은 질문 + 같은 프로필이면 FastAPI 호출 없이 저장된 답변으로 새 대화 기록
+        cache_key = answer_cache.lookup_key(request.user, content, conversation_id)
+        cached = answer_cache.get_answer_cache().get(cache_key) if cache_key else None
+        if cached:
+            cached_conversation_id = answer_cache.record_turn(request.user.id, content, cached, idem_key)
+            _remember_conversation(request, cached_conversation_id)
+            return JsonResponse({
+                "conversation_id": cached_conversation_id,
+                "final_answer": cached["final_answer"],
+                "perfume_list": cached["perfume_list"],
+                "success": True,
+                "cached": True,
+            })
+
         # FastAPI로 user_id와 query만 전송
         payload = {
             "user_id": request.user.id,
             "query": content
         }
+        if idem_key:
+            payload["idempotency_key"] = idem_key
         
         if conversation_id:
             try:
                 payload["conversation_id"] = int(conversation_id)
+                ensure_rehydrated(payload["conversation_id"], request.user.id)  # FastAPI가 이전 메시지를 읽을 수 있도록
             except ValueError:
                 pass  # 잘못된 conversation_id는 무시
 
         headers = {
-            "X-Service-Token": SERVICE_TOKEN,
+            "X-Service-Token": SERVICE_TOKEN or "",
             "Content-Type": "application/json",
         }
         
-        # FastAPI 호출
-        r = requests.post(FASTAPI_CHAT_URL, json=payload, headers=headers, timeout=60)
-        r.raise_for_status()
-        data = r.json()
+        # FastAPI 호출 (동시 실행 슬롯 확보 후, 공용 커넥션 풀 + 서킷 브레이커)
+        lease = get_limiter().acquire(request.user.id)
+        started = time.monotonic()
+        data = get_upstream().post_json(FASTAPI_CHAT_URL, payload, headers=headers, route="chat")
+        if cache_key and data.get("final_answer"):
+            answer_cache.get_answer_cache().put(
+                cache_key, data["final_answer"], data.get("perfume_list"), time.monotonic() - started
+            )
 
         # 세션에 conversation_id 업데이트 (다음 메시지에서 사용)
         if data.get("conversation_id"):
-            request.session["conversation_id"] = data["conversation_id"]
+            _remember_conversation(request, data["conversation_id"])
+            try:
+                if idem_key:
+                    idempotency.stamp_key(data["conversation_id"], request.user.id, idem_key)
+                refresh_summary(data["conversation_id"])
+            except Exception as e:
+                print(f"❌ Failed to refresh conversation summary: {e}")
 
         # FastAPI가 conversations DB를 작성했으므로 응답만 반환 + 추천 향수 리스트 포함
         response_data = {
@@ -805,121 +883,418 @@ def chat_submit_api(request):
         print("💾 Django API Response:", response_data)  # 서버 콘솔에 출력
         return JsonResponse(response_data)
         
-    except requests.HTTPError as e:
+    except ConcurrencyLimited as e:
+        return _limited_response(e)
+    except httpx.HTTPStatusError as e:
         return JsonResponse({"error": f"FastAPI 오류: {e.response.text}"}, status=502)
+    except UpstreamUnavailable:
+        return JsonResponse({"error": "챗봇 서버가 일시적으로 응답하지 않습니다. 잠시 후 다시 시도해주세요."}, status=503)
     except Exception as e:
         return JsonResponse({"error": f"서버 오류: {str(e)}"}, status=500)
+    finally:
+        if lease is not None:
+            lease.release()
+        if idem_key:
+            idempotency.release(request.user.id, idem_key)
+
+
+# 채팅 이미지 (S3) - 브라우저 직접 업로드용 presigned POST
+CHAT_IMAGE_PREFIX = "chat_images"
+CHAT_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+CHAT_IMAGE_UPLOAD_EXPIRES = 300
+CHAT_IMAGE_TYPES = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
 
 
 @login_required
 @require_POST
-def chat_stream_api(request):
+def chat_image_upload_url_api(request):
+    """
+    채팅 이미지 업로드용 presigned POST 발급
+    - 브라우저가 S3에 직접 업로드 → 채팅 요청에는 image_key만 전송 (앱 서버가 이미지 본문을 받지 않음)
+    - 키는 chat_images/{user_id}/{conversation_id|new}/{timestamp}_{uuid}.{ext}
+    - 정책 조건으로 Content-Type 고정, 크기 1B~5MB 제한
+    """
+    try:
+        body = json.loads(request.body.decode("utf-8") or "{}")
+    except ValueError:
+        return JsonResponse({"error": "잘못된 요청입니다."}, status=400)
+
+    content_type = (body.get("content_type") or "").lower()
+    ext = CHAT_IMAGE_TYPES.get(content_type)
+    if not ext:
+        return JsonResponse({"error": "이미지 형식은 JPG/PNG/GIF/WEBP 만 지원합니다"}, status=400)
+
+    conversation_id = body.get("conversation_id")
+    conv_path = str(int(conversation_id)) if str(conversation_id or "").isdigit() else "new"
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    key = f"{CHAT_IMAGE_PREFIX}/{request.user.id}/{conv_path}/{timestamp}_{uuid.uuid4().hex[:12]}.{ext}"
+
+    post = s3_client.generate_presigned_post(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+        Key=key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", 1, CHAT_IMAGE_MAX_BYTES],
+        ],
+        ExpiresIn=CHAT_IMAGE_UPLOAD_EXPIRES,
+    )
+    return JsonResponse({
+        "url": post["url"],
+        "fields": post["fields"],
+        "key": key,
+        "image_url": object_url(key),
+        "expires_in": CHAT_IMAGE_UPLOAD_EXPIRES,
+    })
+
+
+# 요청이 끝나도 계속 돌아야 하는 태스크 (이미지 변환 등) - 참조를 잡아 두어 GC로 사라지지 않게 함
+_background_tasks = set()
+
+
+def _spawn(coro):
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _build_image_variants(key, data=None):
+    """정규화본/썸네일 생성 + S3 업로드 (스레드에서), 실패하면 None - 메시지는 원본 URL 유지"""
+    try:
+        return await sync_to_async(store_variants, thread_sensitive=False)(s3_client, key, data)
+    except Exception as e:
+        print(f"❌ Failed to build image variants for {key}: {e}")
+        return None
+
+
+async def _save_image_variants(variants_task, message_id):
+    """변환이 끝나면 메시지의 이미지를 정규화본으로 교체 (그 전까지 히스토리는 원본 URL)"""
+    variants = await variants_task
+    if variants:
+        await Message.objects.filter(id=message_id).aupdate(
+            chat_image=variants["urls"]["image"], chat_image_variants=variants,
+        )
+        print(f"✅ Image variants saved to message {message_id}")
+
+
+async def _discard_chat_image(key, variants_task=None):
+    """요청 실패 시 원본/변환본 삭제 - 진행 중인 변환이 끝난 뒤에 지워야 남는 객체가 없음"""
+    if variants_task is not None:
+        await variants_task
+    try:
+        await sync_to_async(s3_client.delete_objects, thread_sensitive=False)(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+            Delete={"Objects": [{"Key": k} for k in variant_keys(key)]},
+        )
+    except Exception as e:
+        print(f"❌ Failed to delete chat image {key}: {e}")
+
+
+def _sse_response(frames):
+    response = StreamingHttpResponse(frames, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['Access-Control-Allow-Origin'] = '*'
+    response['Access-Control-Allow-Headers'] = 'Cache-Control, Last-Event-ID'
+    response['X-Accel-Buffering'] = 'no'   # Nginx 버퍼링 비활성화
+    return response
+
+
+async def _fill_stream_buffer(buffer, frames, lease=None):
+    """
+    producer: 업스트림 프레임을 리플레이 버퍼에 쌓음 (구독자가 모두 끊기면 취소됨)
+    content 델타는 CHAT_STREAM_COALESCE_MS / CHAT_STREAM_COALESCE_BYTES 단위로 합쳐서 쌓음
+    lease: 동시 실행 슬롯 - 스트림 동안 임대 연장, 끝나면 반환
+    """
+    coalescer = FrameCoalescer(
+        buffer.append,
+        interval=getattr(settings, "CHAT_STREAM_COALESCE_MS", 50) / 1000,
+        max_bytes=getattr(settings, "CHAT_STREAM_COALESCE_BYTES", 2048),
+    )
+    try:
+        async for frame in frames:
+            coalescer.push(frame)
+            if lease is not None:
+                lease.refresh()
+    except asyncio.CancelledError:
+        print(f"🛑 Chat stream {buffer.stream_id} cancelled (client disconnected) after {buffer.last_seq} frames")
+        raise
+    finally:
+        coalescer.flush()
+        await frames.aclose()  # 업스트림 응답/커넥션 즉시 정리
+        buffer.close()
+        if lease is not None:
+            await sync_to_async(lease.release, thread_sensitive=False)()
+
+
+async def _replay_frames(buffer, after=0):
+    """
+    consumer: 버퍼의 after 다음 프레임부터 id를 붙여 전송
+    - 프레임이 없는 동안 주기적으로 SSE 주석(': ping')을 보내 프록시 idle 타임아웃 방지
+    - 클라이언트 연결이 끊기면(ASGI disconnect → 태스크 취소) 구독 해제 → grace 후 업스트림 취소
+    """
+    heartbeat = getattr(settings, "CHAT_STREAM_HEARTBEAT", 15.0)
+    grace = getattr(settings, "CHAT_STREAM_RESUME_GRACE", 10.0)
+    buffer.attach()
+    try:
+        async for seq, frame in buffer.subscribe(after, heartbeat=heartbeat):
+            if frame is None:
+                yield ": ping\n\n"
+                continue
+            yield f"id: {format_event_id(buffer.stream_id, seq)}\n{frame}"
+    except StreamGone as e:
+        yield f"data: {json.dumps({'error': str(e), 'resume_failed': True})}\n\n"
+    finally:
+        buffer.detach(grace)
+
+
+async def _resume_stream(last_event_id, user):
+    try:
+        stream_id, seq = parse_event_id(last_event_id)
+        buffer = get_registry().get(stream_id, user.id)
+    except StreamGone as e:
+        yield f"data: {json.dumps({'error': str(e), 'resume_failed': True})}\n\n"
+        return
+    async for frame in _replay_frames(buffer, after=seq):
+        yield frame
+
+
+@login_required
+@require_POST
+async def chat_stream_api(request):
     """
     스트리밍 채팅 API - Server-Sent Events 방식으로 실시간 응답 (멀티모달 지원)
+    - ASGI(UvicornWorker) 이벤트 루프에서 동작하는 async 뷰
+    - FastAPI SSE 스트림은 httpx.AsyncClient로 논블로킹 프록시 (스트림당 스레드 점유 없음)
+    - 모든 프레임에 id(<stream_id>:<seq>)를 붙이고, 끊긴 클라이언트가 Last-Event-ID 헤더로
+      다시 요청하면 새 생성 없이 리플레이 버퍼에서 이어서 전송
+    - 같은 Idempotency-Key 재요청은 진행 중 스트림에 처음부터 붙거나, 끝났으면 저장된 답변 재생
+    - 사용자별/전체 동시 스트림 제한: 자리가 없으면 대기열에서 기다리고, 대기열이 차면 429 + Retry-After
     """
+    user = await request.auser()
+
+    # 재접속: 같은 워커의 리플레이 버퍼에서 이어받기
+    last_event_id = request.headers.get("Last-Event-ID") or request.POST.get("last_event_id")
+    if last_event_id:
+        return _sse_response(_resume_stream(last_event_id, user))
+
+    filename = None
+    buffer = None
+    lease = None
+    idem_key = None
+    idem_locked = False
+    image_variants_task = None
+
+    async def release_idem_lock():
+        if idem_locked:
+            await sync_to_async(idempotency.release)(user.id, idem_key)
+
     try:
         # JSON 요청 처리
+        body = None
         if request.content_type == 'application/json':
             body = json.loads(request.body.decode("utf-8"))
             content = (body.get("content") or body.get("query") or "").strip()
             conversation_id = body.get("conversation_id")
+            image_key = body.get("image_key")
             image_file = None
         else:
             # FormData 요청 처리 (이미지 + 텍스트)
             content = request.POST.get("content", "").strip()
-            conversation_id = request.POST.get("conversation_id") or request.session.get("conversation_id")
+            conversation_id = request.POST.get("conversation_id") or await request.session.aget("conversation_id")
+            image_key = request.POST.get("image_key")
             image_file = request.FILES.get("image")
 
          # 텍스트도 없고 이미지도 없으면 에러
-        if not content and not image_file:
-            def error_generator():
+        if not content and not image_file and not image_key:
+            async def error_generator():
                 yield f"data: {json.dumps({'error': '내용이 비었습니다.'})}\n\n"
             return StreamingHttpResponse(error_generator(), content_type='text/event-stream')
 
         # 이미지만 있을 경우 기본 query 채워주기
-        if not content and image_file:
+        if not content and (image_file or image_key):
             content = "이미지 기반 추천 요청"
 
+        if image_key:
+            # 브라우저가 presigned POST로 올린 원본: 키 소유 + head_object로 크기/형식을 정책 한도와 대조 (본문은 받지 않음)
+            try:
+                if not image_key.startswith(f"{CHAT_IMAGE_PREFIX}/{user.id}/"):
+                    raise ValueError("잘못된 이미지 키입니다.")
+                await sync_to_async(check_upload, thread_sensitive=False)(
+                    s3_client, image_key, CHAT_IMAGE_MAX_BYTES, CHAT_IMAGE_TYPES,
+                )
+            except ValueError as e:
+                return JsonResponse({"error": str(e)}, status=400)
+
+        # 멱등성: 업로드/업스트림 호출 전에 중복 요청 차단
+        try:
+            idem_key = idempotency.request_key(request, body)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        if idem_key:
+            existing = get_registry().find(user.id, idem_key)
+            if existing is None:
+                answer = await sync_to_async(idempotency.find_answer)(user.id, idem_key)
+                if answer:
+                    return _sse_response(idempotency.answer_frames(answer))
+                # DB 조회(await) 사이에 같은 키 요청이 버퍼를 만들었을 수 있음
+                existing = get_registry().find(user.id, idem_key)
+            if existing is not None:
+                return _sse_response(_replay_frames(existing))
+            # 다른 워커에서 진행 중인 같은 키 스트림은 리플레이 버퍼로 보이지 않음 → 공유 캐시 잠금 (chat_submit_api와 같은 잠금)
+            timeout = getattr(settings, "FASTAPI_CHAT_TIMEOUT", 60.0) * 2
+            idem_locked = await sync_to_async(idempotency.acquire)(user.id, idem_key, timeout=timeout)
+            if not idem_locked:
+                existing = get_registry().find(user.id, idem_key)   # 이 워커에서 잠금을 잡고 시작하는 중이었음
+                if existing is not None:
+                    return _sse_response(_replay_frames(existing))
+                response = JsonResponse({"error": "같은 요청을 처리하고 있습니다."}, status=409)
+                response["Retry-After"] = "1"
+                return response
+
+        # 답변 캐시: 새 대화의 첫 질문(이미지 없음)이 적중하면 업스트림/동시 실행 슬롯 없이 바로 재생
+        cache_key = await sync_to_async(answer_cache.lookup_key)(
+            user, content, conversation_id, bool(image_file or image_key)
+        )
+        cached = answer_cache.get_answer_cache().get(cache_key) if cache_key else None
+        if cached:
+            cached_conversation_id = await sync_to_async(answer_cache.record_turn)(user.id, content, cached, idem_key)
+            if getattr(settings, "CHAT_STREAM_INLINE_CARDS", True):
+                # 캐시에는 사용자별 상태가 없는 원본 목록만 있으므로 재생할 때 카드 정보를 붙임
+                cached = {**cached, "perfume_list": await sync_to_async(enrich_perfume_list)(cached["perfume_list"], user)}
+            if await request.session.aget("conversation_id") != cached_conversation_id:
+                await request.session.aset("conversation_id", cached_conversation_id)
+            await release_idem_lock()   # 답변이 DB에 기록됐으므로 이후 재요청은 find_answer()로 재생
+            return _sse_response(answer_cache.replay_frames(cached, cached_conversation_id))
+
+        # 동시 실행 슬롯 (대기 후에도 자리가 없으면 429). 재생 요청은 슬롯을 쓰지 않음
+        try:
+            lease = await get_limiter().aacquire(user.id)
+        except ConcurrencyLimited as e:
+            await release_idem_lock()
+            return _limited_response(e)
+        if idem_key:
+            # 대기하는 동안 같은 키 요청이 먼저 시작했으면 그 스트림에 붙음
+            existing = get_registry().find(user.id, idem_key)
+            if existing is not None:
+                await sync_to_async(lease.release, thread_sensitive=False)()
+                await release_idem_lock()
+                return _sse_response(_replay_frames(existing))
+
+        # 버퍼를 먼저 만들어 같은 키의 요청이 이후 await 구간에서도 여기에 붙도록 함
+        buffer = get_registry().create(user.id, idem_key)
+
         # FastAPI로 스트리밍 요청 준비
         payload = {
-            "user_id": request.user.id,
+            "user_id": user.id,
             "query": content,
             "stream": True  # 스트리밍 요청임을 표시
         }
+        if idem_key:
+            payload["idempotency_key"] = idem_key
 
         # 이미지 첨부 시 S3 업로드 (체계적인 경로 구조)
+        # 모델에는 원본 URL을 바로 넘기고, 축소/EXIF 제거한 정규화본과 히스토리용 썸네일은 백그라운드에서 생성
         uploaded_image_url = None
-        if image_file:
+        if image_key:
+            # 브라우저가 presigned POST로 이미 버킷에 올린 경우 (위에서 check_upload 통과): 버킷의 원본으로 처리
+            filename = image_key
+            original_file = None
+        elif image_file:
+            # presigned POST 정책과 같은 한도 (디코드 검증은 백그라운드 변환에서)
+            if image_file.content_type not in CHAT_IMAGE_TYPES:
+                raise ValueError("이미지 형식은 JPG/PNG/GIF/WEBP 만 지원합니다")
+            if image_file.size > CHAT_IMAGE_MAX_BYTES:
+                raise ValueError(f"이미지 크기는 {CHAT_IMAGE_MAX_BYTES // (1024 * 1024)}MB 이하여야 합니다.")
+
             # 체계적인 경로: chat_images/user_id/conversation_id/message_id_timestamp_filename
-            from datetime import datetime
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
 
             # conversation_id가 있으면 사용, 없으면 'new'로 임시 처리
             conv_path = str(conversation_id) if conversation_id else 'new'
-            filename = f"chat_images/{request.user.id}/{conv_path}/{timestamp}_{image_file.name}"
-
-            s3_client.upload_fileobj(
-                image_file,
-                settings.AWS_STORAGE_BUCKET_NAME,
-                filename,
-                ExtraArgs={"ContentType": image_file.content_type},
-            )
-            uploaded_image_url = f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.{settings.AWS_S3_REGION_NAME}.amazonaws.com/{filename}"
+            filename = f"chat_images/{user.id}/{conv_path}/{timestamp}_{image_file.name}"
+            original_file = image_file
+
+        if filename:
+            original_data = None
+            if original_file is not None:
+                original_data = original_file.read()
+                await sync_to_async(upload_original, thread_sensitive=False)(
+                    s3_client, filename, original_data, original_file.content_type,
+                )
+            # 디코드/인코딩 + S3 put은 첫 토큰을 늦추지 않도록 요청과 별개로 (presigned 원본 다운로드도 여기서)
+            image_variants_task = _spawn(_build_image_variants(filename, original_data))
+            uploaded_image_url = object_url(filename)
             payload["image_url"] = uploaded_image_url
 
         if conversation_id:
             try:
                 payload["conversation_id"] = int(conversation_id)
+                # 아카이브된 대화를 이어가면 FastAPI가 이전 메시지를 읽을 수 있도록 먼저 복원
+                await sync_to_async(ensure_rehydrated, thread_sensitive=False)(payload["conversation_id"], user.id)
             except ValueError:
                 pass
 
         headers = {
-            "X-Service-Token": SERVICE_TOKEN,
+            "X-Service-Token": SERVICE_TOKEN or "",  # httpx는 None 헤더 값을 허용하지 않음
             "Content-Type": "application/json",
             "Accept": "text/event-stream"  # SSE 요청
         }
 
-        def stream_generator():
+        inline_cards = getattr(settings, "CHAT_STREAM_INLINE_CARDS", True)
+
+        async def stream_generator():
             final_conversation_id = None
+            answer_parts = []       # 답변 캐시 저장용
+            perfume_list = None
+            upstream_failed = False
+            started = time.monotonic()
             try:
                 # FastAPI 서버가 없을 때 임시 mock 응답
                 if not FASTAPI_CHAT_URL:
                     mock_response = f"안녕하세요! '{content}'에 대한 응답입니다. 현재 FastAPI 서버가 연결되지 않아 임시 응답을 제공합니다."
-                    import time
                     for chunk in mock_response.split():
                         yield f"data: {json.dumps({'content': chunk + ' '})}\n\n"
-                        time.sleep(0.1)  # 스트리밍 효과
+                        await asyncio.sleep(0.1)  # 스트리밍 효과
                     yield f"data: {json.dumps({'done': True, 'conversation_id': conversation_id or 1, 'perfume_list': []})}\n\n"
                     return
 
-                # FastAPI로 스트리밍 요청
-                response = requests.post(
-                    FASTAPI_CHAT_URL + "/stream" if not FASTAPI_CHAT_URL.endswith("/stream") else FASTAPI_CHAT_URL,
-                    json=payload,
-                    headers=headers,
-                    stream=True,
-                    timeout=120
-                )
-                response.raise_for_status()
-
-                # 스트리밍 응답 처리
-                for line in response.iter_lines(decode_unicode=True):
-                    if line:
-                        # FastAPI에서 오는 SSE 데이터를 그대로 전달
-                        if line.startswith("data: "):
-                            try:
-                                # conversation_id 추출 시도
-                                data = json.loads(line[6:])
-                                if data.get('conversation_id'):
-                                    # conversation_id가 있으면 세션과 변수에 저장
-                                    request.session["conversation_id"] = data["conversation_id"]
-                                    final_conversation_id = data['conversation_id']
-                            except:
-                                pass
-                            yield f"{line}\n\n"
-                        else:
-                            # 일반 텍스트라면 SSE 형식으로 감싸기
-                            yield f"data: {json.dumps({'content': line})}\n\n"
+                # FastAPI로 스트리밍 요청 (논블로킹, 공용 커넥션 풀 + 서킷 브레이커)
+                stream_url = FASTAPI_CHAT_URL + "/stream" if not FASTAPI_CHAT_URL.endswith("/stream") else FASTAPI_CHAT_URL
+                async with get_upstream().stream(stream_url, payload, headers=headers) as response:
+                    # 스트리밍 응답 처리
+                    async for line in response.aiter_lines():
+                        if line:
+                            # FastAPI에서 오는 SSE 데이터를 그대로 전달
+                            if line.startswith("data: "):
+                                try:
+                                    # conversation_id 추출 시도
+                                    data = json.loads(line[6:])
+                                    if data.get('conversation_id'):
+                                        # 세션 반영은 스트림이 끝난 뒤 한 번만
+                                        final_conversation_id = data['conversation_id']
+                                    if cache_key:
+                                        if data.get('error'):
+                                            upstream_failed = True
+                                        if isinstance(data.get('content'), str):
+                                            answer_parts.append(data['content'])
+                                        if data.get('perfume_list') is not None:
+                                            perfume_list = data['perfume_list']
+                                    if inline_cards and data.get('perfume_list'):
+                                        # 추천 카드에 필요한 이미지/어코드/즐겨찾기 상태를 done 프레임에 바로 포함
+                                        data['perfume_list'] = await sync_to_async(enrich_perfume_list)(data['perfume_list'], user)
+                                        line = f"data: {json.dumps(data)}"
+                                except Exception:
+                                    pass
+                                yield f"{line}\n\n"
+                            else:
+                                # 일반 텍스트라면 SSE 형식으로 감싸기
+                                yield f"data: {json.dumps({'content': line})}\n\n"
 
                 # 스트림 종료 신호
                 yield f"data: {json.dumps({'done': True})}\n\n"
@@ -928,43 +1303,126 @@ def chat_stream_api(request):
                 if uploaded_image_url and final_conversation_id:
                     try:
                         # 해당 conversation의 가장 최근 user 메시지 찾기
-                        conv = Conversation.objects.get(id=final_conversation_id, user=request.user)
-                        user_message = conv.messages.filter(role='user').order_by('-created_at').first()
+                        conv = await Conversation.objects.aget(id=final_conversation_id, user=user)
+                        user_message = await conv.messages.filter(role='user').order_by('-created_at').afirst()
                         if user_message:
+                            # 우선 원본 URL, 정규화본/썸네일은 준비되면 교체
                             user_message.chat_image = uploaded_image_url
-                            user_message.save()
+                            await user_message.asave(update_fields=["chat_image"])
                             print(f"✅ Image URL saved to message {user_message.id}: {uploaded_image_url}")
+                            if image_variants_task is not None:
+                                _spawn(_save_image_variants(image_variants_task, user_message.id))
                     except Exception as e:
                         print(f"❌ Failed to save image URL: {e}")
 
-            except requests.RequestException as e:
+                # 끝까지 정상으로 받은 답변만 캐시
+                if cache_key and answer_parts and not upstream_failed:
+                    answer_cache.get_answer_cache().put(
+                        cache_key, "".join(answer_parts).strip(), perfume_list, time.monotonic() - started
+                    )
+
+                # FastAPI가 DB에 직접 쓴 이번 턴 메시지를 사이드바 요약에 반영 (+ 재요청 재생용 키 기록)
+                if final_conversation_id:
+                    try:
+                        await _aremember_conversation(request.session, final_conversation_id)
+                    except Exception as e:
+                        print(f"❌ Failed to save conversation_id to session: {e}")
+                    try:
+                        if idem_key:
+                            await sync_to_async(idempotency.stamp_key)(final_conversation_id, user.id, idem_key)
+                        await sync_to_async(refresh_summary)(final_conversation_id)
+                    except Exception as e:
+                        print(f"❌ Failed to refresh conversation summary: {e}")
+
+            except httpx.HTTPError as e:
                 # FastAPI 서버가 없을 때 mock 응답
                 print(f"FastAPI 연결 실패, mock 응답 사용: {e}")
                 mock_response = f"안녕하세요! '{content}'에 대한 응답입니다. FastAPI 서버 연결에 실패하여 임시 응답을 제공합니다."
-                import time
                 for chunk in mock_response.split():
                     yield f"data: {json.dumps({'content': chunk + ' '})}\n\n"
-                    time.sleep(0.1)
+                    await asyncio.sleep(0.1)
                 yield f"data: {json.dumps({'done': True, 'conversation_id': conversation_id or 1, 'perfume_list': []})}\n\n"
 
             except Exception as e:
                 yield f"data: {json.dumps({'error': f'서버 오류: {str(e)}'})}\n\n"
 
-        response = StreamingHttpResponse(stream_generator(), content_type='text/event-stream')
-        response['Cache-Control'] = 'no-cache'
-        response['Access-Control-Allow-Origin'] = '*'
-        response['Access-Control-Allow-Headers'] = 'Cache-Control'
-        response['X-Accel-Buffering'] = 'no'   # Nginx 버퍼링 비활성화
-        return response
+            finally:
+                # 생성이 끝나거나 취소되면 다른 워커의 같은 키 요청도 (저장된 답변 재생 또는 새 생성으로) 진행 가능
+                await release_idem_lock()
 
-    except Exception as e:
-        # Fast API 실패 시 업로드 취소
-        s3_client.delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=filename)
+        # 업스트림 읽기는 별도 태스크 → 응답은 버퍼 구독 (끊겨도 생성 결과 보존)
+        buffer.task = asyncio.create_task(_fill_stream_buffer(buffer, stream_generator(), lease))
+        return _sse_response(_replay_frames(buffer))
 
-        def error_generator():
-            yield f"data: {json.dumps({'error': f'서버 오류: {str(e)}'})}\n\n"
+    except Exception as e:
+        # Fast API 실패 시 업로드 취소 (변환 중이면 끝난 뒤 삭제)
+        if filename:
+            _spawn(_discard_chat_image(filename, image_variants_task))
+
+        # producer 태스크가 시작되지 않았으면 슬롯/멱등성 잠금은 여기서 반환
+        if buffer is None or buffer.task is None:
+            if lease is not None:
+                await sync_to_async(lease.release, thread_sensitive=False)()
+            await release_idem_lock()
+
+        # except 블록을 벗어나면 e가 지워지므로 메시지를 먼저 잡아둠
+        error_message = f'서버 오류: {str(e)}'
+
+        # 같은 키로 이미 붙어 있는 요청에도 오류 전달
+        if buffer is not None and buffer.task is None:
+            buffer.append(f"data: {json.dumps({'error': error_message})}\n\n")
+            buffer.close()
+
+        async def error_generator():
+            yield f"data: {json.dumps({'error': error_message})}\n\n"
         return StreamingHttpResponse(error_generator(), content_type='text/event-stream')
 
+@login_required
+@require_GET
+def perfume_cards_api(request):
+    """
+    추천 향수 카드 일괄 조회 - ?ids=1,2,3 (최대 50개, 요청 순서 유지)
+    이미지/어코드/농도/용량 + 사용자의 즐겨찾기·좋아요 상태, 쿼리 최대 3번 (로그인 필요 - 카탈로그 일괄 수집 방지)
+    """
+    try:
+        ids = parse_ids(request.GET.get("ids", ""))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"cards": build_cards(ids, request.user)})
+
+
+@login_required
+@require_GET
+def perfume_typeahead_api(request):
+    """
+    검색창 자동완성 - ?q=조말&limit=8 (로그인 필요 - perfumes 페이지와 같음)
+    브랜드 / 노트(한·영 별칭) / 향수 이름 prefix + 초성('ㅈㅁㄹ') 매칭, 프로세스 내 인덱스(scentpick.utils.typeahead)
+    """
+    q = (request.GET.get("q") or "").strip()
+    try:
+        limit = min(max(int(request.GET.get("limit", 8)), 1), TYPEAHEAD_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({"error": "잘못된 limit입니다."}, status=400)
+    results = get_typeahead_index().search(q, limit) if q else []
+    return JsonResponse({"query": q, "results": results})
+
+
+@require_GET
+def metrics_api(request):
+    """
+    운영 지표 API (워커 프로세스 단위) - staff 또는 X-Service-Token 필요
+    """
+    token = request.headers.get("X-Service-Token")
+    if not (request.user.is_staff or (SERVICE_TOKEN and token == SERVICE_TOKEN)):
+        return JsonResponse({"error": "권한이 없습니다."}, status=403)
+    return JsonResponse({
+        "pid": os.getpid(),
+        "upstream": get_upstream().metrics(),
+        "chat_concurrency": get_limiter().metrics(),
+        "answer_cache": answer_cache.get_answer_cache().metrics(),
+        "indexes": index_stats(),
+    })
+
 def get_note_image_url(note_name):
     """노트명으로 이미지 URL 가져오기 - 개선된 버전"""
     try:
@@ -1338,34 +1796,6 @@ def mypage(request):
 
     return render(request, "scentpick/mypage.html", context)
 
-@login_required
-@require_GET
-def conversations_api(request):
-    """
-    대화 목록 API - AJAX로 대화 목록 로드
-    """
-    items = []
-    qs = Conversation.objects.filter(user=request.user).order_by('-updated_at')[:100]
-    for c in qs:
-        title = c.title
-        if not title:
-            # Fallback: derive from first user message
-            try:
-                first_user = c.messages.filter(role='user').order_by('created_at').first()
-                if first_user and first_user.content:
-                    title = first_user.content[:15]
-            except Exception:
-                pass
-        if not title:
-            title = f"대화 {c.id}"
-        items.append({
-            'id': c.id,
-            'title': title,
-            'updated_at': c.updated_at.isoformat(),
-        })
-    return JsonResponse({'items': items})
-
-
 @login_required
 @require_POST
 def chat_new_api(request):
@@ -1373,7 +1803,7 @@ def chat_new_api(request):
     새 대화 시작 API - 세션 초기화
     """
     # 세션에서 현재 대화 ID 제거
-    request.session['conversation_id'] = None
+    _remember_conversation(request, None)
     return JsonResponse({'ok': True, 'message': '새 대화가 시작되었습니다.'})
 
 
@@ -1442,26 +1872,21 @@ def update_feedback_api(request):
 def conversations_api(request):
     """
     대화 목록 API - AJAX로 대화 목록 로드
+    요약 필드(title/last_message_*/message_count)를 Conversation에 저장해 두므로 (user, -updated_at) 인덱스 쿼리 1번
     """
-    items = []
-    qs = Conversation.objects.filter(user=request.user).order_by('-updated_at')[:100]
-    for c in qs:
-        title = c.title
-        if not title:
-            # Fallback: derive from first user message
-            try:
-                first_user = c.messages.filter(role='user').order_by('created_at').first()
-                if first_user and first_user.content:
-                    title = first_user.content[:15]
-            except Exception:
-                pass
-        if not title:
-            title = f"대화 {c.id}"
-        items.append({
-            'id': c.id,
-            'title': title,
-            'updated_at': c.updated_at.isoformat(),
-        })
+    qs = (
+        Conversation.objects.filter(user=request.user)
+        .order_by('-updated_at')
+        .only('id', 'title', 'updated_at', 'last_message_preview', 'message_count', 'last_message_at')[:100]
+    )
+    items = [{
+        'id': c.id,
+        'title': c.title or f"대화 {c.id}",
+        'updated_at': c.updated_at.isoformat(),
+        'last_message_preview': c.last_message_preview,
+        'message_count': c.message_count,
+        'last_message_at': c.last_message_at.isoformat() if c.last_message_at else None,
+    } for c in qs]
     return JsonResponse({'items': items})
 
 @login_required
@@ -1469,48 +1894,45 @@ def conversations_api(request):
 def conversation_messages_api(request, conv_id: int):
     """
     특정 대화의 메시지 목록 API - AJAX로 메시지 로드 (추천 데이터 포함)
+    - 최신 메시지부터 limit개씩 (created_at, id) 커서로 페이지네이션
+    - before: 이전 응답의 before 값 → 그보다 오래된 페이지 반환
+    - items는 페이지 내에서 시간순 정렬
+    - 콜드 아카이브된 대화는 먼저 messages로 복원
     """
     conv = get_object_or_404(Conversation, id=conv_id, user=request.user)
-    msgs = conv.messages.order_by('created_at')
+    rehydrate(conv)
+    try:
+        limit = int(request.GET.get('limit') or CHAT_PAGE_SIZE)
+    except ValueError:
+        limit = CHAT_PAGE_SIZE
+    limit = max(1, min(limit, CHAT_PAGE_SIZE_MAX))
+
+    try:
+        page, before = page_messages(conv, before=request.GET.get('before'), limit=limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
     data = []
     
-    for m in msgs:
+    for item in build_transcript(conv, page):
         message_data = {
-            'role': m.role,
-            'content': m.content,
-            'created_at': m.created_at.isoformat(),
-            'chat_image': getattr(m, 'chat_image', None),  # 안전한 이미지 URL 접근
+            'role': item['role'],
+            'content': item['content'],
+            'created_at': item['created_at'].isoformat(),
+            'chat_image': item['chat_image'],
+            'chat_image_thumb': item['chat_image_thumb'],
         }
-        
-        # assistant 메시지인 경우 관련된 추천 데이터 찾기
-        if m.role == 'assistant':
-            # 이 메시지와 연관된 RecRun 찾기
-            rec_runs = RecRun.objects.filter(
-                conversation=conv,
-                request_msg__created_at__lte=m.created_at
-            ).order_by('-created_at')
-            
-            if rec_runs.exists():
-                latest_run = rec_runs.first()
-                # 추천 후보들 가져오기
-                candidates = latest_run.candidates.select_related('perfume').order_by('rank')
-                
-                perfume_list = []
-                for candidate in candidates:
-                    perfume_list.append({
-                        'id': candidate.perfume.id,
-                        'brand': candidate.perfume.brand,
-                        'name': candidate.perfume.name,
-                        'rank': candidate.rank,
-                        'score': candidate.score
-                    })
-                
-                if perfume_list:
-                    message_data['perfume_list'] = perfume_list
-        
+        if item['perfume_list']:
+            message_data['perfume_list'] = item['perfume_list']
         data.append(message_data)
     
-    return JsonResponse({'conversation_id': conv.id, 'title': conv.title, 'items': data})
+    return JsonResponse({
+        'conversation_id': conv.id,
+        'title': conv.title,
+        'items': data,
+        'before': before,
+        'has_more': before is not None,
+    })
 
 @login_required
 @require_POST
@@ -1519,5 +1941,5 @@ def chat_new_api(request):
     새 대화 시작 API - 세션 초기화
     """
     # 세션에서 현재 대화 ID 제거
-    request.session['conversation_id'] = None
+    _remember_conversation(request, None)
     return JsonResponse({'ok': True, 'message': '새 대화가 시작되었습니다.'})
\ No newline at end of file